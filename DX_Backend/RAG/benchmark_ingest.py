@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+# =========================================
+# 적재 파이프라인 오프라인 벤치마크 (API 할당량/DB 없이)
+#   python benchmark_ingest.py "통돌이 설명서.pdf" [--runs 2] [--llm-ms 1500] [--embed-ms 300]
+#                              [--vision-ms 4000] [--db-ms 30] [--rps 5] [--tracemalloc] [--json out.json]
+#   - process_manual_pdf를 처음부터 끝까지 실행하되 Gemini/Supabase는 fake_services.py 대역 사용
+#   - 로컬 캐시(.ingest_cache)는 임시 폴더로 분리 (--cache-dir로 지정 가능) → 실제 캐시를 건드리지 않음
+#   - runs > 1 이면 같은 model_id/version으로 다시 실행 (재실행: 해시 재사용/페이지 캐시 효과 측정)
+#     --new-version 이면 실행마다 버전을 바꿔서 "새 버전 업로드" 경로 측정
+#   - 출력: 단계별 시간(겹치지 않게 안쪽 단계 시간은 빼고 계산), 처리량, API/DB 호출 수, 최대 메모리
+# =========================================
+STAGES = ("extract", "vision", "chunk", "dedup", "classify", "embed", "db", "other")
+
+
+class StageTimer:
+    """
+    단계별 경과 시간 (exclusive): 단계 안에서 다른 단계를 부르면 그 시간은 안쪽 단계에만 더함.
+    제너레이터 단계(추출/청크/중복 제거)는 next() 한 번마다 측정.
+    """
+
+    def __init__(self):
+        self.totals: Counter = Counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        now = time.perf_counter()
+        if stack:
+            parent, since = stack[-1]
+            self._add(parent, now - since)
+        stack.append((name, now))
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            current, since = stack.pop()
+            self._add(current, now - since)
+            if stack:
+                stack[-1] = (stack[-1][0], now)
+
+    def _add(self, name: str, seconds: float):
+        with self._lock:
+            self.totals[name] += seconds
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = getattr(fn, "__name__", name)
+        return wrapper
+
+    def wrap_gen(self, name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            it = iter(fn(*args, **kwargs))
+            while True:
+                with self.stage(name):
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        return
+                yield item
+        wrapper.__name__ = getattr(fn, "__name__", name)
+        return wrapper
+
+
+def instrument(upload_manual, store, timer: StageTimer):
+    """upload_manual 안에서 전역 이름으로 부르는 단계 함수들을 측정용 래퍼로 교체"""
+    upload_manual.iter_pages = timer.wrap_gen("extract", upload_manual.iter_pages)
+    upload_manual.error_rows_for_page = timer.wrap("vision", upload_manual.error_rows_for_page)
+    upload_manual.iter_manual_sections = timer.wrap_gen("chunk", upload_manual.iter_manual_sections)
+    upload_manual.classify_sections_meta = timer.wrap("classify", upload_manual.classify_sections_meta)
+    upload_manual.embed_sections = timer.wrap("embed", upload_manual.embed_sections)
+    upload_manual.process_manual_pdf = timer.wrap("other", upload_manual.process_manual_pdf)
+    store.run = timer.wrap("db", store.run)
+
+    base = upload_manual.NearDuplicateFilter
+
+    class TimedNearDuplicateFilter(base):
+        load_stored = timer.wrap("dedup", base.load_stored)
+        filter = timer.wrap_gen("dedup", base.filter)
+
+    upload_manual.NearDuplicateFilter = TimedNearDuplicateFilter
+
+
+def max_rss_mb(who: int) -> float:
+    # Linux ru_maxrss 단위는 KB (macOS는 bytes)
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_once(upload_manual, args, store, fake, version: str, trace: bool) -> Dict:
+    timer = StageTimer()
+    instrumented = {name: getattr(upload_manual, name) for name in (
+        "iter_pages", "error_rows_for_page", "iter_manual_sections", "classify_sections_meta",
+        "embed_sections", "process_manual_pdf", "NearDuplicateFilter",
+    )}
+    store_run = store.run
+    instrument(upload_manual, store, timer)
+    fake_before, db_before = Counter(fake.calls), Counter(store.calls)
+    if trace:
+        tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    try:
+        report = upload_manual.process_manual_pdf(
+            pdf_path=args.pdf,
+            model_id=args.model_id,
+            manual_title=f"{args.model_id} 벤치마크",
+            manual_version=version,
+            file_url="",
+            text_backend=args.backend,
+        )
+    finally:
+        for name, fn in instrumented.items():
+            setattr(upload_manual, name, fn)
+        store.run = store_run
+    wall = time.perf_counter() - started
+
+    stages = {name: timer.totals.get(name, 0.0) for name in STAGES}
+    pages = report.counters.get("pages", 0)
+    return {
+        "version": version,
+        "wall_seconds": wall,
+        "pages": pages,
+        "sections": report.sections,
+        "failed": report.failed,
+        "pages_per_sec": pages / wall if wall else 0.0,
+        "sections_per_sec": report.sections / wall if wall else 0.0,
+        "stages": stages,
+        "pipeline_counters": dict(report.counters),
+        "fake_api_calls": dict(fake.calls - fake_before),
+        "db_calls": dict(store.calls - db_before),
+        "tracemalloc_peak_mb": tracemalloc.get_traced_memory()[1] / 1e6 if trace else None,
+    }
+
+
+def print_run(index: int, result: Dict):
+    print(f"\n📊 run {index} (version={result['version']}): {result['wall_seconds']:.2f}s, "
+          f"pages {result['pages']} ({result['pages_per_sec']:.2f}/s), "
+          f"sections {result['sections']} ({result['sections_per_sec']:.2f}/s), failed {result['failed']}")
+    wall = max(result["wall_seconds"], 1e-9)
+    print(f"  {'stage':<10}{'sec':>9}{'%':>7}")
+    for name, seconds in result["stages"].items():
+        print(f"  {name:<10}{seconds:>9.3f}{seconds / wall * 100:>6.1f}%")
+    counters = result["pipeline_counters"]
+    keys = ("llm_calls", "embed_calls", "vision_calls", "insert_calls", "retries",
+            "local_classified", "reused_sections", "journal_resumed", "page_cache_hits", "dedup_collapsed")
+    print("  파이프라인: " + ", ".join(f"{k}={counters.get(k, 0)}" for k in keys))
+    print("  대역 API : " + (", ".join(f"{k}={v}" for k, v in sorted(result["fake_api_calls"].items())) or "-"))
+    print("  대역 DB  : " + (", ".join(f"{k}={v}" for k, v in sorted(result["db_calls"].items())) or "-"))
+    if result["tracemalloc_peak_mb"] is not None:
+        print(f"  Python 할당 최대: {result['tracemalloc_peak_mb']:.1f}MB (tracemalloc)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gemini/Supabase 대역으로 적재 파이프라인 벤치마크")
+    parser.add_argument("pdf")
+    parser.add_argument("--model-id", default="BENCH")
+    parser.add_argument("--version", default="bench-v1")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--new-version", action="store_true", help="실행마다 버전을 바꿈 (새 버전 업로드 경로)")
+    parser.add_argument("--embed-ms", type=float, default=300, help="임베딩 요청 1회 지연")
+    parser.add_argument("--embed-item-ms", type=float, default=2, help="임베딩 입력 1개당 추가 지연")
+    parser.add_argument("--llm-ms", type=float, default=1500, help="분류 요청 1회 지연")
+    parser.add_argument("--llm-item-ms", type=float, default=40, help="배치 분류 섹션 1개당 추가 지연")
+    parser.add_argument("--vision-ms", type=float, default=4000, help="Vision 요청 1회 지연")
+    parser.add_argument("--db-ms", type=float, default=30, help="DB 요청 1회 지연")
+    parser.add_argument("--rps", type=float, default=None, help="Gemini 초당 호출 한도 (기본 GEMINI_RPS)")
+    parser.add_argument("--backend", default=None, help="PDF 텍스트 백엔드")
+    parser.add_argument("--cache-dir", default=None, help="로컬 캐시 폴더 (기본: 임시 폴더, 실행 후 삭제)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Python 메모리 할당 최대치 측정 (느려짐)")
+    parser.add_argument("--json", default=None, help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.pdf):
+        print(f"❌ 파일을 찾을 수 없습니다: {args.pdf}")
+        return 1
+
+    tmp = None
+    if args.cache_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="ingest_bench_")
+        args.cache_dir = tmp.name
+    # 캐시 경로는 모듈 import 시점에 정해지므로 import 전에 지정 (PDF 워커 프로세스에도 전달됨)
+    os.environ["INGEST_CACHE_DIR"] = args.cache_dir
+
+    import upload_manual
+    from fake_services import FakeGenAI, FakeTableStore
+    from ingest_utils import RateLimiter
+
+    store = FakeTableStore(latency_ms=args.db_ms)
+    fake = FakeGenAI(
+        embed_ms=args.embed_ms,
+        embed_item_ms=args.embed_item_ms,
+        llm_ms=args.llm_ms,
+        llm_item_ms=args.llm_item_ms,
+        vision_ms=args.vision_ms,
+    )
+    upload_manual.use_clients(supabase_client=store, genai_module=fake)
+    if args.rps:
+        upload_manual.gemini_limiter = RateLimiter(args.rps)
+
+    print(f"🧪 오프라인 벤치마크: {args.pdf} (캐시 {args.cache_dir}, "
+          f"Gemini {upload_manual.gemini_limiter.rate:g} req/s, llm {args.llm_ms:g}ms / embed {args.embed_ms:g}ms / "
+          f"vision {args.vision_ms:g}ms / db {args.db_ms:g}ms)")
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    results = []
+    try:
+        for i in range(max(1, args.runs)):
+            version = f"{args.version}.{i + 1}" if args.new_version else args.version
+            results.append(run_once(upload_manual, args, store, fake, version, args.tracemalloc))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    for i, result in enumerate(results, start=1):
+        print_run(i, result)
+    memory = {
+        "max_rss_mb": max_rss_mb(resource.RUSAGE_SELF),
+        "max_rss_children_mb": max_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    print(f"\n🧠 최대 RSS: 메인 {memory['max_rss_mb']:.1f}MB / PDF 워커 중 최대 {memory['max_rss_children_mb']:.1f}MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pdf": args.pdf, "runs": results, "memory": memory}, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장 → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
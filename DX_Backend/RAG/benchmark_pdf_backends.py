@@ -0,0 +1,92 @@
+import re
+import sys
+import time
+import argparse
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+from page_extraction import BACKENDS, open_backend, resolve_backend, is_error_table_page
+
+
+# =========================================
+# PDF 텍스트 백엔드 벤치마크
+#   python benchmark_pdf_backends.py "통돌이 설명서.pdf" [다른.pdf ...] [--pages 50]
+#   - 백엔드별 pages/sec
+#   - 기준 백엔드(pdfplumber) 대비 텍스트 유사도 (공백 정규화 후 비교)
+#   - 에러코드 표 페이지 판별 결과가 다른 페이지 수
+#   결과를 보고 문서별로 PDF_TEXT_BACKEND / process_manual_pdf(text_backend=...)를 고르면 됨
+# =========================================
+REFERENCE_BACKEND = "pdfplumber"
+
+
+def normalize(text: str) -> str:
+    """비교용: 공백/개행 차이는 무시 (어차피 page_to_markdown에서 평탄화됨)"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def extract_all(backend: str, pdf_path: str, max_pages: Optional[int]) -> Dict:
+    start = time.perf_counter()
+    with open_backend(backend, pdf_path) as doc:
+        total = len(doc) if max_pages is None else min(len(doc), max_pages)
+        texts = [doc.text(i) for i in range(total)]
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    return {"texts": texts, "elapsed": elapsed, "pages_per_sec": len(texts) / elapsed}
+
+
+def compare(reference: List[str], candidate: List[str]) -> Dict:
+    ratios = []
+    table_mismatch = 0
+    for ref, cand in zip(reference, candidate):
+        a, b = normalize(ref), normalize(cand)
+        ratios.append(1.0 if a == b else SequenceMatcher(None, a, b, autojunk=False).ratio())
+        if is_error_table_page(ref) != is_error_table_page(cand):
+            table_mismatch += 1
+    if not ratios:
+        return {"mean": 1.0, "min": 1.0, "identical": 0, "table_mismatch": 0}
+    return {
+        "mean": sum(ratios) / len(ratios),
+        "min": min(ratios),
+        "identical": sum(1 for r in ratios if r == 1.0),
+        "table_mismatch": table_mismatch,
+    }
+
+
+def benchmark(pdf_path: str, backends: List[str], max_pages: Optional[int] = None):
+    print(f"\n📄 {pdf_path}")
+    results = {name: extract_all(name, pdf_path, max_pages) for name in backends}
+    reference = results.get(REFERENCE_BACKEND)
+
+    print(f"  {'backend':<12}{'pages':>7}{'sec':>9}{'pages/sec':>11}{'sim(mean)':>11}{'sim(min)':>10}{'same':>7}{'표판별차':>8}")
+    for name, res in results.items():
+        pages = len(res["texts"])
+        line = f"  {name:<12}{pages:>7}{res['elapsed']:>9.2f}{res['pages_per_sec']:>11.1f}"
+        if reference is not None and name != REFERENCE_BACKEND:
+            cmp = compare(reference["texts"], res["texts"])
+            line += f"{cmp['mean']:>11.3f}{cmp['min']:>10.3f}{cmp['identical']:>7}{cmp['table_mismatch']:>8}"
+        print(line)
+
+    if reference is not None:
+        fastest = max(results, key=lambda n: results[n]["pages_per_sec"])
+        speedup = results[fastest]["pages_per_sec"] / reference["pages_per_sec"]
+        print(f"  → 가장 빠른 백엔드: {fastest} ({speedup:.1f}x vs {REFERENCE_BACKEND})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF 텍스트 백엔드 속도/동등성 비교")
+    parser.add_argument("pdfs", nargs="+", help="비교할 PDF 파일들")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="쉼표로 구분 (기본: 전부)")
+    parser.add_argument("--pages", type=int, default=None, help="문서당 앞에서부터 N페이지만")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    # 대체된 백엔드를 요청한 이름으로 찍으면 pdfplumber 결과가 다른 백엔드 행으로 나옴 → 아예 중단
+    unavailable = [b for b in backends if resolve_backend(b) != b]
+    if unavailable:
+        parser.error(", ".join(f"{b} 백엔드를 쓸 수 없음 ({BACKENDS[b].requires} 설치 필요)" for b in unavailable))
+    for pdf_path in args.pdfs:
+        benchmark(pdf_path, backends, args.pages)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from embedding_batch import estimate_tokens
+
+
+# =========================================
+# 페이지 경계를 넘는 토큰 기준 청커
+#   - 문단 단위로 max_tokens까지 채움 (글자 수가 아니라 토큰 추정치 기준)
+#   - 페이지가 바뀌어도 이어서 채움 → 섹션에 시작/끝 페이지(page_number, page_end) 기록
+#   - 새 청크 앞에 직전 청크 끝 문단을 overlap_tokens만큼 겹쳐 넣음
+#   - min_tokens보다 작은 청크는 만들지 않음: 조금 넘치더라도(hard max) 붙이고,
+#     마지막 자투리는 앞 청크에 합침
+#   에러코드 표 섹션은 따로 만들어지므로, 그 페이지에서는 청크를 끊음(flush)
+# =========================================
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "600"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "150"))
+
+
+def split_long_paragraph(para: str, max_tokens: int) -> List[str]:
+    """max_tokens보다 긴 문단은 줄 → 문장 단위로 잘라서 max_tokens 이하 조각들로"""
+    if estimate_tokens(para) <= max_tokens:
+        return [para]
+    units = [u for u in re.split(r"(?<=\n)|(?<=[.!?。])\s+", para) if u and u.strip()]
+    pieces, current = [], ""
+    for unit in units:
+        candidate = (current + " " + unit.strip()).strip() if current else unit.strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            current = unit.strip()
+        else:
+            current = candidate
+        # 구분자 없이 긴 덩어리는 글자 수로 강제 분할
+        while estimate_tokens(current) > max_tokens:
+            cut = max_tokens * 2
+            pieces.append(current[:cut])
+            current = current[cut:]
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class CrossPageChunker:
+    """
+    사용법:
+        chunker = CrossPageChunker()
+        for page in pages:
+            yield from chunker.add_page(page_number, markdown)
+        yield from chunker.flush()
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        min_tokens: int = CHUNK_MIN_TOKENS,
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.min_tokens = min(min_tokens, max_tokens)
+        self.hard_max = max_tokens + self.min_tokens
+        self.parts: List[Tuple[int, str, int, bool]] = []   # (page, text, tokens, is_overlap)
+        self.held: Optional[Dict] = None                    # 마지막 자투리를 합칠 수 있게 하나 붙잡아 둠
+
+    @property
+    def _tokens(self) -> int:
+        return sum(p[2] for p in self.parts)
+
+    @property
+    def _has_fresh(self) -> bool:
+        return any(not p[3] for p in self.parts)
+
+    def _build(self, parts) -> Dict:
+        return {
+            "page_number": parts[0][0],
+            "page_end": parts[-1][0],
+            "content_markdown": "\n\n".join(p[1] for p in parts),
+            "force_category": None,
+            "force_title": None,
+            "tokens": sum(p[2] for p in parts),
+        }
+
+    def _close(self) -> Iterator[Dict]:
+        chunk = self._build(self.parts)
+        # 다음 청크 앞에 겹쳐 넣을 끝 문단들 (문단 통째로만)
+        tail, used = [], 0
+        for page, text, tokens, _ in reversed(self.parts[1:]):
+            if used + tokens > self.overlap_tokens:
+                break
+            tail.insert(0, (page, text, tokens, True))
+            used += tokens
+        self.parts = tail
+        if self.held is not None:
+            yield self.held
+        self.held = chunk
+
+    def _add_paragraph(self, page_number: int, para: str) -> Iterator[Dict]:
+        tokens = estimate_tokens(para)
+        if self._has_fresh and self._tokens + tokens > self.max_tokens:
+            if self._tokens >= self.min_tokens or self._tokens + tokens > self.hard_max:
+                yield from self._close()
+        self.parts.append((page_number, para, tokens, False))
+
+    def add_page(self, page_number: int, markdown: str) -> Iterator[Dict]:
+        paragraphs = [p.strip() for p in markdown.split("\n\n") if p.strip()]
+        for para in paragraphs:
+            for piece in split_long_paragraph(para, self.max_tokens):
+                yield from self._add_paragraph(page_number, piece)
+
+    def flush(self) -> Iterator[Dict]:
+        """남은 문단 정리. 마지막 청크가 min_tokens 미만이면 앞 청크에 합침"""
+        last = None
+        if self._has_fresh:
+            fresh = [p for p in self.parts if not p[3]]
+            if self.held is not None and sum(p[2] for p in fresh) < self.min_tokens \
+                    and self.held["tokens"] + sum(p[2] for p in fresh) <= self.hard_max:
+                self.held["content_markdown"] += "\n\n" + "\n\n".join(p[1] for p in fresh)
+                self.held["page_end"] = fresh[-1][0]
+                self.held["tokens"] += sum(p[2] for p in fresh)
+            else:
+                last = self._build(self.parts)
+        if self.held is not None:
+            yield self.held
+        if last is not None:
+            yield last
+        self.parts, self.held = [], None
+
+
+class ChunkStats:
+    """청크 개수/크기(토큰) 분포 집계 — 이전 방식과 비교 출력용"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.sizes: List[int] = []
+
+    def add(self, text: str):
+        self.sizes.append(estimate_tokens(text))
+
+    def summary(self, min_tokens: int = CHUNK_MIN_TOKENS) -> str:
+        if not self.sizes:
+            return f"{self.label}: 0개"
+        s = sorted(self.sizes)
+
+        def pct(q: float) -> int:
+            return s[min(len(s) - 1, int(q * len(s)))]
+
+        small = sum(1 for x in s if x < min_tokens)
+        return (f"{self.label}: {len(s)}개, 토큰 평균 {sum(s) / len(s):.0f} "
+                f"(min {s[0]} / p50 {pct(0.5)} / p90 {pct(0.9)} / max {s[-1]}), "
+                f"{min_tokens}토큰 미만 {small}개, 총 {sum(s)}토큰")
@@ -0,0 +1,242 @@
+import os
+import re
+import zlib
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from incremental import section_hash
+from ingest_utils import CACHE_DIR
+
+
+# =========================================
+# 근사 중복 섹션 제거 (MinHash + LSH)
+#   - 안전 경고/설치 안내 같은 반복 문구가 페이지마다, 모델마다 거의 그대로 들어 있음
+#   - 청크 → (여기) → 메타/임베딩 사이에서 근사 중복을 찾아 대표 섹션 하나만 남기고
+#     나머지는 manual_section_refs에 "이 매뉴얼 p.N에도 있음" 참조로만 기록
+#   - 비교 대상: 같은 PDF 안에서 먼저 나온 섹션 (기본, DEDUP=pdf)
+#     DEDUP=all 이면 이미 저장된 다른 매뉴얼 섹션까지
+#     (저장된 섹션 시그니처는 .ingest_cache/minhash.db에 캐시, 새로 생긴 section_id만 추가로 읽음)
+#   - 에러코드 섹션(force_category)과 아주 짧은 섹션은 대상에서 제외
+#   - 숫자(용량/치수/온도 등)가 하나라도 다르면 문장이 거의 같아도 중복으로 보지 않음
+#     (모델별 사양 섹션이 다른 모델 행으로 합쳐져서 답변이 엉뚱한 모델을 인용하지 않게)
+#   (DB: migrations/004_manual_section_refs.sql)
+# =========================================
+MINHASH_CACHE_PATH = CACHE_DIR / "minhash.db"
+
+DEDUP_MODE = os.getenv("DEDUP", "pdf")                         # "off" | "pdf"(같은 PDF 안에서만) | "all"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # 추정 Jaccard 유사도 기준
+NUM_PERM = 128
+BANDS = 16                # 16 밴드 × 8행 → 유사도 약 0.7부터 후보로 잡힘, 최종 판단은 DEDUP_THRESHOLD
+SHINGLE_SIZE = 5          # 글자 5-gram (한국어는 띄어쓰기가 들쭉날쭉해서 단어보다 글자 단위가 안정적)
+MIN_SHINGLES = 40
+
+_PRIME = np.uint64(4294967291)   # 2^32 미만 최대 소수
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", "", text.lower())
+
+
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def number_key(text: str) -> int:
+    """텍스트 안 숫자 토큰 집합의 해시 (숫자가 없으면 0)"""
+    numbers = sorted(set(NUMBER_RE.findall(text or "")))
+    return zlib.crc32("|".join(numbers).encode("utf-8")) if numbers else 0
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text: str) -> Set[int]:
+        text = _normalize(text)
+        n = self.shingle_size
+        return {zlib.crc32(text[i:i + n].encode("utf-8")) for i in range(max(0, len(text) - n + 1))}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash 시그니처 (uint32, num_perm개). 너무 짧은 텍스트는 None"""
+        shingles = self.shingles(text)
+        if len(shingles) < MIN_SHINGLES:
+            return None
+        hv = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        # (shingle 수, num_perm) 행렬에서 열마다 최솟값
+        hashed = (np.outer(hv, self.a) + self.b) % _PRIME
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """시그니처가 같은 자리 비율 = Jaccard 유사도 추정치"""
+    return float(np.mean(sig_a == sig_b))
+
+
+class LSHIndex:
+    """밴드별 버킷으로 후보를 찾고, 시그니처 비교로 확인"""
+
+    def __init__(self, bands: int = BANDS, num_perm: int = NUM_PERM):
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[Dict[bytes, List]] = [dict() for _ in range(bands)]
+        self.signatures: Dict = {}
+        self.numbers: Dict = {}
+
+    def _band_keys(self, sig: np.ndarray):
+        for b in range(self.bands):
+            yield b, sig[b * self.rows:(b + 1) * self.rows].tobytes()
+
+    def add(self, key, sig: np.ndarray, numbers: int = 0):
+        self.signatures[key] = sig
+        self.numbers[key] = numbers
+        for b, band_key in self._band_keys(sig):
+            self.buckets[b].setdefault(band_key, []).append(key)
+
+    def query(
+        self,
+        sig: np.ndarray,
+        threshold: float = DEDUP_THRESHOLD,
+        numbers: int = 0,
+    ) -> Optional[Tuple[object, float]]:
+        """threshold 이상이고 숫자 토큰이 같은 가장 비슷한 key와 유사도 (없으면 None)"""
+        candidates = set()
+        for b, band_key in self._band_keys(sig):
+            candidates.update(self.buckets[b].get(band_key, ()))
+        best = None
+        for key in candidates:
+            if self.numbers.get(key) != numbers:
+                continue
+            score = similarity(sig, self.signatures[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+class SignatureCache:
+    """저장된 manual_sections의 MinHash 시그니처 로컬 캐시"""
+
+    def __init__(self, db_path: Union[str, Path] = MINHASH_CACHE_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                section_id INTEGER PRIMARY KEY,
+                manual_id  INTEGER,
+                signature  BLOB,
+                numbers    INTEGER
+            )
+            """
+        )
+        self.conn.commit()
+
+    def max_section_id(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(section_id), 0) FROM signatures").fetchone()[0]
+
+    def add_many(self, items: List[Tuple[int, int, Optional[np.ndarray], int]]):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO signatures (section_id, manual_id, signature, numbers) VALUES (?, ?, ?, ?)",
+            [(sid, mid, sig.tobytes() if sig is not None else None, numbers) for sid, mid, sig, numbers in items],
+        )
+        self.conn.commit()
+
+    def iter_signatures(self, exclude_manual_ids: Set[int]) -> Iterator[Tuple[int, np.ndarray, int]]:
+        rows = self.conn.execute("SELECT section_id, manual_id, signature, numbers FROM signatures")
+        for sid, mid, blob, numbers in rows:
+            if blob is not None and mid not in exclude_manual_ids:
+                yield sid, np.frombuffer(blob, dtype=np.uint32), numbers
+
+    def close(self):
+        self.conn.close()
+
+
+def refresh_signature_cache(client, cache: SignatureCache, hasher: MinHasher, page_size: int = 500) -> int:
+    """캐시에 없는(section_id가 더 큰) 저장 섹션만 읽어서 시그니처 추가"""
+    last_id = cache.max_section_id()
+    added = 0
+    while True:
+        rows = client.table("manual_sections") \
+            .select("section_id, manual_id, content_text, category") \
+            .gt("section_id", last_id) \
+            .order("section_id") \
+            .limit(page_size) \
+            .execute().data or []
+        items = []
+        for row in rows:
+            # 에러코드 섹션은 비교 대상에서 제외 (시그니처 없이 기록만)
+            text = row.get("content_text") or ""
+            sig = None if row.get("category") == "error" else hasher.signature(text)
+            items.append((row["section_id"], row["manual_id"], sig, number_key(text)))
+        cache.add_many(items)
+        added += len(items)
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["section_id"]
+    return added
+
+
+class NearDuplicateFilter:
+    """
+    섹션 스트림에서 근사 중복을 표시:
+      sec["duplicate_of"] = {"section_id": 저장된 대표 섹션, "similarity": s}
+                          또는 {"content_hash": 같은 PDF 안의 대표 섹션, "similarity": s}
+    대표 섹션은 그대로 흘려보냄 (표시된 섹션은 메타/임베딩/insert 대상이 아님).
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, hasher: Optional[MinHasher] = None):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self.stored = LSHIndex()
+        self.local = LSHIndex()
+        self.duplicates = 0
+
+    def load_stored(self, client, exclude_manual_ids: Iterable[int] = ()):
+        """
+        이미 저장된 섹션을 비교 대상에 추가.
+        같은 매뉴얼/이전 버전(exclude_manual_ids)은 해시 재사용으로 처리되므로 제외.
+        """
+        cache = SignatureCache()
+        try:
+            added = refresh_signature_cache(client, cache, self.hasher)
+            exclude = {m for m in exclude_manual_ids if m is not None}
+            for sid, sig, numbers in cache.iter_signatures(exclude):
+                self.stored.add(sid, sig, numbers)
+        finally:
+            cache.close()
+        print(f"  🧬 근사 중복 비교 대상: 저장된 섹션 {len(self.stored)}개 (새로 시그니처 계산 {added}개)")
+
+    def filter(self, sections: Iterable[Dict]) -> Iterator[Dict]:
+        for sec in sections:
+            if sec.get("force_category") or sec.get("force_title"):
+                yield sec
+                continue
+            sig = self.hasher.signature(sec["content_markdown"])
+            if sig is None:
+                yield sec
+                continue
+
+            numbers = number_key(sec["content_markdown"])
+            match = self.local.query(sig, self.threshold, numbers)
+            if match:
+                sec["duplicate_of"] = {"content_hash": match[0], "similarity": match[1]}
+            else:
+                match = self.stored.query(sig, self.threshold, numbers) if len(self.stored) else None
+                if match:
+                    sec["duplicate_of"] = {"section_id": match[0], "similarity": match[1]}
+
+            if match:
+                self.duplicates += 1
+            else:
+                key = sec.get("content_hash") or section_hash(sec["content_markdown"])
+                sec["content_hash"] = key
+                self.local.add(key, sig, numbers)
+            yield sec
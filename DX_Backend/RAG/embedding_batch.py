@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import google.generativeai as genai
+
+from ingest_utils import RateLimiter, IngestionReport, call_with_retry, is_rate_limit_error
+
+
+# =========================================
+# 배치 임베딩
+#   - genai.embed_content(content=[...]) 한 번에 최대 MAX_BATCH_SIZE개
+#   - 요청 하나의 대략적인 토큰 합이 MAX_BATCH_TOKENS를 넘지 않게 분할
+#   - 배치가 실패하면 절반으로 쪼개서 다시 시도 (1개짜리까지 실패하면 그 항목만 None)
+# =========================================
+EMBED_MODEL = "models/text-embedding-004"
+MAX_BATCH_SIZE = 100          # batchEmbedContents 요청당 최대 개수
+MAX_BATCH_TOKENS = 20000      # 요청 하나의 토큰 예산 (대략치)
+MAX_INPUT_TOKENS = 2048       # 입력 1개당 모델 한도
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (한국어 기준 2글자 ≈ 1토큰으로 보수적으로 계산)"""
+    return max(1, len(text) // 2)
+
+
+def make_batches(
+    texts: List[str],
+    max_items: int = MAX_BATCH_SIZE,
+    max_tokens: int = MAX_BATCH_TOKENS,
+) -> List[List[int]]:
+    """텍스트 인덱스를 개수/토큰 예산에 맞는 배치들로 나눔 (입력 순서 유지)"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, text in enumerate(texts):
+        cost = min(estimate_tokens(text), MAX_INPUT_TOKENS)
+        if current and (len(current) >= max_items or used + cost > max_tokens):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_batch(
+    texts: List[str],
+    task_type: Optional[str] = None,
+    model: str = EMBED_MODEL,
+    output_dim: Optional[int] = None,
+) -> List[List[float]]:
+    """API 1회 호출로 여러 텍스트 임베딩 (output_dim: 차원을 줄이는 모델용, embedding_config.py)"""
+    kwargs = {"model": model, "content": texts}
+    if task_type:
+        kwargs["task_type"] = task_type
+    if output_dim:
+        kwargs["output_dimensionality"] = output_dim
+    resp = genai.embed_content(**kwargs)
+    vectors = resp["embedding"]
+    if len(vectors) != len(texts):
+        raise ValueError(f"임베딩 개수 불일치: 요청 {len(texts)}개, 응답 {len(vectors)}개")
+    return vectors
+
+
+def _embed_with_fallback(
+    texts: List[str],
+    task_type: Optional[str],
+    limiter: Optional[RateLimiter],
+    report: Optional[IngestionReport],
+    retries: int,
+    model: str = EMBED_MODEL,
+    output_dim: Optional[int] = None,
+) -> List[Optional[List[float]]]:
+    try:
+        return call_with_retry(
+            embed_batch, texts, task_type, model, output_dim,
+            retries=retries, limiter=limiter, report=report, counter="embed_calls",
+        )
+    except Exception as e:
+        if len(texts) == 1:
+            print(f"  ❌ 임베딩 실패 (1개 항목 건너뜀): {e}")
+            return [None]
+        if is_rate_limit_error(e):
+            # 할당량 에러는 배치를 쪼개도 똑같이 실패 → 이 배치는 실패로 두고 다음 실행에서 재시도
+            print(f"  ❌ 할당량 초과로 배치 임베딩 실패 ({len(texts)}개 건너뜀): {e}")
+            return [None] * len(texts)
+        mid = len(texts) // 2
+        print(f"  ⚠️ 배치 임베딩 실패 ({len(texts)}개) → {mid}/{len(texts) - mid}개로 나눠 재시도: {e}")
+        return (
+            _embed_with_fallback(texts[:mid], task_type, limiter, report, retries, model, output_dim)
+            + _embed_with_fallback(texts[mid:], task_type, limiter, report, retries, model, output_dim)
+        )
+
+
+def embed_texts(
+    texts: List[str],
+    task_type: Optional[str] = None,
+    limiter: Optional[RateLimiter] = None,
+    report: Optional[IngestionReport] = None,
+    max_items: int = MAX_BATCH_SIZE,
+    max_tokens: int = MAX_BATCH_TOKENS,
+    concurrency: int = 1,
+    retries: int = 1,
+    model: str = EMBED_MODEL,
+    output_dim: Optional[int] = None,
+) -> List[Optional[List[float]]]:
+    """
+    texts 전체를 배치로 임베딩해서 같은 순서의 벡터 리스트로 반환.
+    실패한 항목은 None.
+    """
+    if not texts:
+        return []
+
+    batches = make_batches(texts, max_items, max_tokens)
+    results: List[Optional[List[float]]] = [None] * len(texts)
+
+    def run(indices: List[int]):
+        vectors = _embed_with_fallback(
+            [texts[i] for i in indices], task_type, limiter, report, retries, model, output_dim,
+        )
+        for i, vec in zip(indices, vectors):
+            results[i] = vec
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(run, batches))
+
+    print(f"  🧮 임베딩 {len(texts)}개 → 배치 {len(batches)}개")
+    return results
@@ -0,0 +1,56 @@
+import json
+from array import array
+from typing import List, Optional, Sequence
+
+
+# =========================================
+# 임베딩 저장 형식
+#   - DB: manual_sections.embedding (pgvector vector(768), migrations/002_manual_sections_pgvector.sql)
+#         PostgREST에는 float 리스트로 보내고, 읽을 때는 "[0.1,0.2,...]" 문자열로 돌아옴
+#   - 로컬(체크포인트 저널 등): float32 little-endian bytes (768차원 = 3KB, JSON 텍스트의 약 1/4)
+#   - 예전 행의 embedding_vector(JSON 텍스트)도 읽을 수 있게 parse_embedding은 모든 형식을 받음
+# =========================================
+EMBEDDING_DIM = 768
+EMBEDDING_COLUMN = "embedding"
+LEGACY_EMBEDDING_COLUMN = "embedding_vector"
+
+
+def pack_f32(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def unpack_f32(data: bytes) -> List[float]:
+    arr = array("f")
+    arr.frombytes(data)
+    return arr.tolist()
+
+
+def parse_embedding(value) -> Optional[List[float]]:
+    """float 리스트 / pgvector 문자열 / JSON 텍스트 / float32 bytes → float 리스트"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return unpack_f32(bytes(value))
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        # pgvector 텍스트 표현 "[1,2,3]"은 JSON 배열과 같은 형식
+        return [float(x) for x in json.loads(value)]
+    return [float(x) for x in value]
+
+
+def to_db_vector(value, dim: int = EMBEDDING_DIM) -> Optional[List[float]]:
+    """insert/update용 값 (pgvector 컬럼에는 float 리스트를 그대로 보냄)"""
+    vec = parse_embedding(value)
+    if vec is not None and len(vec) != dim:
+        raise ValueError(f"임베딩 차원 불일치: {len(vec)} (기대값 {dim})")
+    return vec
+
+
+def row_embedding(row: dict) -> Optional[List[float]]:
+    """DB 행에서 임베딩 읽기 (새 컬럼 우선, 없으면 예전 JSON 컬럼)"""
+    value = row.get(EMBEDDING_COLUMN)
+    if value is None:
+        value = row.get(LEGACY_EMBEDDING_COLUMN)
+    return parse_embedding(value)
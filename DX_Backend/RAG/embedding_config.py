@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+
+# =========================================
+# 현재 검색에 쓰는 임베딩 설정 (blue/green 전환용)
+#   - DB의 embedding_config 한 줄(id=1)에 모델/차원/컬럼/검색 함수를 같이 저장
+#     (migrations/006_embedding_config.sql)
+#   - 질의 쪽(챗봇 서버, vision SupabaseRAG)과 적재 쪽(upload_manual, 백필 데몬)이 모두 이 값을 읽음
+#     → 모델 교체는 reembed.py가 새 컬럼을 다 채운 뒤 이 한 줄만 update (원자적 전환)
+#   - 모델과 검색 함수는 항상 같은 스냅샷에서 꺼내 씀 (질의 임베딩과 검색 컬럼이 어긋나지 않게)
+#   - 테이블이 아직 없으면 DEFAULT_CONFIG (text-embedding-004 / embedding / hybrid_search)
+# =========================================
+CONFIG_TABLE = "embedding_config"
+CONFIG_TTL_SEC = float(os.getenv("EMBEDDING_CONFIG_TTL", "30"))
+
+# 슬롯: 임베딩 컬럼 ↔ 그 컬럼을 읽는 hybrid_search 함수 (둘 중 하나가 현재, 다른 하나가 shadow)
+SLOTS = {
+    "embedding": "hybrid_search",
+    "embedding_next": "hybrid_search_next",
+}
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    model: str
+    dim: int
+    column: str
+    search_function: str
+
+    @property
+    def shadow_column(self) -> str:
+        return next(c for c in SLOTS if c != self.column)
+
+    def to_row(self) -> Dict:
+        return {
+            "model": self.model,
+            "dim": self.dim,
+            "column_name": self.column,
+            "search_function": self.search_function,
+        }
+
+
+DEFAULT_CONFIG = EmbeddingConfig(
+    model="models/text-embedding-004",
+    dim=768,
+    column="embedding",
+    search_function="hybrid_search",
+)
+
+
+def config_for_slot(column: str, model: str, dim: int) -> EmbeddingConfig:
+    if column not in SLOTS:
+        raise ValueError(f"알 수 없는 임베딩 컬럼: {column} (가능: {', '.join(SLOTS)})")
+    return EmbeddingConfig(model=model, dim=dim, column=column, search_function=SLOTS[column])
+
+
+def config_from_row(row: Optional[Dict]) -> Optional[EmbeddingConfig]:
+    """embedding_config 행 또는 pending/previous jsonb → EmbeddingConfig (비어 있으면 None)"""
+    if not row:
+        return None
+    return EmbeddingConfig(
+        model=row["model"],
+        dim=int(row["dim"]),
+        column=row["column_name"],
+        search_function=row["search_function"],
+    )
+
+
+def load_embedding_config(client) -> EmbeddingConfig:
+    try:
+        res = client.table(CONFIG_TABLE) \
+            .select("model, dim, column_name, search_function") \
+            .eq("id", 1) \
+            .limit(1) \
+            .execute()
+    except Exception as e:
+        print(f"⚠️ {CONFIG_TABLE} 조회 실패 → 기본 설정 사용: {e}")
+        return DEFAULT_CONFIG
+    return config_from_row(res.data[0] if res.data else None) or DEFAULT_CONFIG
+
+
+class EmbeddingConfigCache:
+    """ttl초 동안 같은 설정 재사용 (요청마다 DB 조회하지 않음). 전환 후 ttl 안에 모든 서버가 따라옴"""
+
+    def __init__(self, ttl: float = CONFIG_TTL_SEC):
+        self.ttl = ttl
+        self._config: Optional[EmbeddingConfig] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, client) -> EmbeddingConfig:
+        with self._lock:
+            if self._config is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._config = load_embedding_config(client)
+                self._loaded_at = time.monotonic()
+            return self._config
+
+    def invalidate(self):
+        with self._lock:
+            self._config = None
+
+
+_cache = EmbeddingConfigCache()
+
+
+def get_embedding_config(client) -> EmbeddingConfig:
+    return _cache.get(client)
+
+
+def invalidate_embedding_config():
+    """이 프로세스의 캐시만 비움 (다른 서버는 ttl 안에 새 설정을 읽음)"""
+    _cache.invalidate()
+
+
+def describe(config: EmbeddingConfig) -> str:
+    return ", ".join(f"{k}={v}" for k, v in asdict(config).items())
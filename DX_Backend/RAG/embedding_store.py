@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from embedding_codec import (
+    EMBEDDING_DIM,
+    EMBEDDING_COLUMN,
+    LEGACY_EMBEDDING_COLUMN,
+    parse_embedding,
+)
+
+
+# =========================================
+# 임베딩 저장소 유틸
+#   python embedding_store.py migrate              : embedding_vector(JSON 텍스트) → embedding(pgvector) 변환
+#   python embedding_store.py export corpus.npy    : 전체 임베딩을 float32 .npy + section_id 사이드카로 내보내기
+#   load_corpus("corpus.npy")                      : mmap으로 바로 로드 (복사/파싱 없음)
+# =========================================
+PAGE_SIZE = 500
+
+
+def ids_path_for(npy_path: Path) -> Path:
+    """corpus.npy → corpus.ids.npy"""
+    return npy_path.with_suffix(".ids.npy")
+
+
+_bulk_rpc_available = True
+
+
+def bulk_update_embeddings(client, items: List[Tuple[int, List[float]]], column: str = EMBEDDING_COLUMN) -> int:
+    """
+    (section_id, 벡터) 여러 개를 한 번에 저장 (migrations/005 update_section_embeddings RPC).
+    RPC가 아직 없는 DB면 경고 한 번 출력 후 행마다 update로 대신함.
+    """
+    global _bulk_rpc_available
+    if not items:
+        return 0
+    if _bulk_rpc_available:
+        try:
+            res = client.rpc("update_section_embeddings", {
+                "items": [{"section_id": sid, "embedding": vec} for sid, vec in items],
+                "target_column": column,
+            }).execute()
+            return res.data if isinstance(res.data, int) else len(items)
+        except Exception as e:
+            if "update_section_embeddings" not in str(e):
+                raise
+            _bulk_rpc_available = False
+            print(f"  ⚠️ update_section_embeddings RPC 없음 (migrations/005 적용 필요) → 행마다 update: {e}")
+    for sid, vec in items:
+        client.table("manual_sections").update({column: vec}).eq("section_id", sid).execute()
+    return len(items)
+
+
+def migrate_legacy_embeddings(client, page_size: int = PAGE_SIZE) -> int:
+    """
+    embedding이 비어 있고 embedding_vector(JSON)가 있는 행을 section_id 순으로 나눠 변환.
+    (SQL 편집기에서 002 마이그레이션의 update를 돌릴 수 없을 때 사용)
+    중간에 멈춰도 다시 실행하면 남은 행만 처리됨.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        res = client.table("manual_sections") \
+            .select(f"section_id, {LEGACY_EMBEDDING_COLUMN}") \
+            .is_(EMBEDDING_COLUMN, "null") \
+            .not_.is_(LEGACY_EMBEDDING_COLUMN, "null") \
+            .gt("section_id", last_id) \
+            .order("section_id") \
+            .limit(page_size) \
+            .execute()
+        rows = res.data or []
+        items = []
+        for row in rows:
+            try:
+                vec = parse_embedding(row[LEGACY_EMBEDDING_COLUMN])
+            except ValueError as e:
+                print(f"  ⚠️ section_id={row['section_id']} 임베딩 파싱 실패: {e}")
+                continue
+            if not vec or len(vec) != EMBEDDING_DIM:
+                print(f"  ⚠️ section_id={row['section_id']} 차원 이상 ({len(vec or [])}) → 건너뜀")
+                continue
+            items.append((row["section_id"], vec))
+        migrated += bulk_update_embeddings(client, items)
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["section_id"]
+        print(f"  ↪️ {migrated}개 변환 (section_id ≤ {last_id})")
+    return migrated
+
+
+def export_embeddings(
+    client,
+    out_path: str,
+    manual_id: Optional[int] = None,
+    page_size: int = PAGE_SIZE,
+) -> int:
+    """
+    manual_sections 임베딩을 (N, 768) float32 .npy와 section_id(int64) 사이드카 .ids.npy로 저장.
+    section_id 순 keyset 페이지네이션.
+    """
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    chunks, id_chunks = [], []
+    last_id = 0
+    started = time.perf_counter()
+
+    while True:
+        query = client.table("manual_sections") \
+            .select(f"section_id, {EMBEDDING_COLUMN}") \
+            .not_.is_(EMBEDDING_COLUMN, "null") \
+            .gt("section_id", last_id)
+        if manual_id is not None:
+            query = query.eq("manual_id", manual_id)
+        rows = query.order("section_id").limit(page_size).execute().data or []
+        if rows:
+            chunks.append(np.asarray([parse_embedding(r[EMBEDDING_COLUMN]) for r in rows], dtype=np.float32))
+            id_chunks.append(np.asarray([r["section_id"] for r in rows], dtype=np.int64))
+            last_id = rows[-1]["section_id"]
+        if len(rows) < page_size:
+            break
+
+    vectors = np.concatenate(chunks) if chunks else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    ids = np.concatenate(id_chunks) if id_chunks else np.zeros((0,), dtype=np.int64)
+    np.save(out, vectors)
+    np.save(ids_path_for(out), ids)
+    print(f"💾 {len(ids)}개 임베딩 내보내기 완료 → {out} ({vectors.nbytes / 1e6:.1f}MB, "
+          f"{time.perf_counter() - started:.1f}s)")
+    return len(ids)
+
+
+def load_corpus(npy_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(vectors (N, 768) float32, section_ids (N,) int64) — 둘 다 읽기 전용 mmap"""
+    path = Path(npy_path)
+    vectors = np.load(path, mmap_mode="r")
+    ids = np.load(ids_path_for(path), mmap_mode="r")
+    if len(vectors) != len(ids):
+        raise ValueError(f"임베딩/ID 개수 불일치: {len(vectors)} vs {len(ids)}")
+    return vectors, ids
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    client = create_client("https://wzafalbctqkylhyzlfej.supabase.co", os.getenv("supbase_service_role"))
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "migrate":
+        print(f"✅ 변환 완료: {migrate_legacy_embeddings(client)}개")
+    elif command == "export":
+        export_embeddings(client, sys.argv[2] if len(sys.argv) > 2 else "manual_sections.npy")
+    else:
+        print("사용법: python embedding_store.py migrate | export [out.npy]")
@@ -0,0 +1,346 @@
+import re
+import json
+import time
+import zlib
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from embedding_codec import EMBEDDING_DIM
+from section_classifier import CATEGORIES
+
+
+# =========================================
+# 오프라인 대역 (API 할당량/DB 없이 적재 파이프라인 돌리기용)
+#   - FakeGenAI      : genai.embed_content / genai.GenerativeModel 대역
+#                      (호출 종류별 지연시간 설정, 결과는 입력 내용으로 결정되는 고정값)
+#   - FakeTableStore : supabase 클라이언트 대역 (manual_documents / manual_sections /
+#                      manual_section_refs / embedding_config 를 메모리 dict로 흉내, 파이프라인이 쓰는
+#                      쿼리 메서드와 update_section_embeddings / prepare_embedding_slot / hybrid_search(_next)
+#                      RPC만 지원)
+#   upload_manual.use_clients(supabase_client=store, genai_module=fake) 로 주입
+#   (benchmark_ingest.py 참고)
+# =========================================
+ID_COLUMNS = {
+    "manual_documents": "manual_id",
+    "manual_sections": "section_id",
+    "manual_section_refs": "ref_id",
+}
+
+
+SEARCH_COLUMNS = {
+    "hybrid_search": "embedding",
+    "hybrid_search_next": "embedding_next",
+}
+SEARCH_RESULT_COLUMNS = ("section_id", "manual_id", "section_title", "content_text", "page_number", "category")
+
+
+def _sleep_ms(ms: float, jitter: float = 0.2):
+    if ms > 0:
+        time.sleep(ms / 1000 * random.uniform(1 - jitter, 1 + jitter))
+
+
+# =========================================
+# 1. Gemini 대역
+# =========================================
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, service: "FakeGenAI", name: str):
+        self.service = service
+        self.name = name
+
+    def generate_content(self, contents, generation_config=None, **kwargs) -> FakeResponse:
+        if isinstance(contents, list):
+            # [프롬프트, {"mime_type", "data"}] → 에러코드 표 Vision 파싱
+            image = next((c for c in contents if isinstance(c, dict)), {})
+            self.service.count("vision", bytes_=len(image.get("data") or b""))
+            _sleep_ms(self.service.vision_ms)
+            seed = zlib.crc32(image.get("data") or b"")
+            rows = [
+                {"code": f"E{(seed + i) % 90 + 10}", "symptom": f"증상 {i}", "cause": f"원인 {i}", "solution": f"해결 {i}"}
+                for i in range(3)
+            ]
+            return FakeResponse(json.dumps(rows, ensure_ascii=False))
+
+        prompt = str(contents)
+        indices = [int(i) for i in re.findall(r"\[섹션 index=(\d+)\]", prompt)]
+        if indices:
+            # 배치 분류 (section_classifier.build_batch_prompt)
+            self.service.count("classify_batch", items=len(indices))
+            _sleep_ms(self.service.llm_ms + self.service.llm_item_ms * len(indices))
+            items = [{"index": i, **self.service.fake_meta(f"{i}:{prompt}")} for i in indices]
+            return FakeResponse(json.dumps(items, ensure_ascii=False))
+
+        # 섹션 1개 분류 (analyze_section_with_gemini)
+        self.service.count("classify_single", items=1)
+        _sleep_ms(self.service.llm_ms)
+        return FakeResponse(json.dumps(self.service.fake_meta(prompt), ensure_ascii=False))
+
+
+class FakeGenAI:
+    """google.generativeai 모듈 대신 쓰는 객체 (configure / embed_content / GenerativeModel)"""
+
+    def __init__(
+        self,
+        embed_ms: float = 300,
+        embed_item_ms: float = 2,
+        llm_ms: float = 1500,
+        llm_item_ms: float = 40,
+        vision_ms: float = 4000,
+    ):
+        self.embed_ms = embed_ms
+        self.embed_item_ms = embed_item_ms
+        self.llm_ms = llm_ms
+        self.llm_item_ms = llm_item_ms
+        self.vision_ms = vision_ms
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, kind: str, items: int = 0, bytes_: int = 0):
+        with self._lock:
+            self.calls[f"{kind}_calls"] += 1
+            if items:
+                self.calls[f"{kind}_items"] += items
+            if bytes_:
+                self.calls[f"{kind}_bytes"] += bytes_
+
+    def configure(self, **kwargs):
+        pass
+
+    def GenerativeModel(self, name: str) -> FakeGenerativeModel:
+        return FakeGenerativeModel(self, name)
+
+    @staticmethod
+    def fake_vector(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+        rng = np.random.RandomState(zlib.crc32(text.encode("utf-8")))
+        vec = rng.standard_normal(dim).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    @staticmethod
+    def fake_meta(text: str) -> Dict:
+        seed = zlib.crc32(text.encode("utf-8"))
+        return {"section_title": f"섹션 {seed % 1000}", "category": CATEGORIES[seed % len(CATEGORIES)]}
+
+    def embed_content(self, model: str, content, task_type: Optional[str] = None, **kwargs) -> Dict:
+        texts = content if isinstance(content, list) else [content]
+        self.count("embed", items=len(texts))
+        _sleep_ms(self.embed_ms + self.embed_item_ms * len(texts))
+        dim = kwargs.get("output_dimensionality") or EMBEDDING_DIM
+        vectors = [self.fake_vector(t, dim) for t in texts]
+        return {"embedding": vectors if isinstance(content, list) else vectors[0]}
+
+
+# =========================================
+# 2. Supabase 대역
+# =========================================
+class FakeResult:
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """supabase-py 쿼리 빌더 흉내 (체이닝 후 execute())"""
+
+    def __init__(self, store: "FakeTableStore", table: str):
+        self.store = store
+        self.table = table
+        self.op = "select"
+        self.columns: Optional[List[str]] = None
+        self.count: Optional[str] = None
+        self.payload = None
+        self.filters: List = []
+        self.order_by: List = []
+        self.row_limit: Optional[int] = None
+        self.row_range: Optional[tuple] = None
+        self._negate = False
+
+    # ---------- 동작 ----------
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.op, self.count = "select", count
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: Dict):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # ---------- 필터 ----------
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, fn):
+        negate, self._negate = self._negate, False
+        self.filters.append((lambda row: not fn(row)) if negate else fn)
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column: str, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column: str, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column: str, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column: str, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def in_(self, column: str, values):
+        wanted = set(values)
+        return self._filter(lambda row: row.get(column) in wanted)
+
+    def is_(self, column: str, value):
+        if value in ("null", None):
+            return self._filter(lambda row: row.get(column) is None)
+        return self._filter(lambda row: row.get(column) is value)
+
+    # ---------- 정렬/페이지 ----------
+    def order(self, column: str, desc: bool = False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self.row_limit = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.row_range = (start, end)
+        return self
+
+    def execute(self) -> FakeResult:
+        return self.store.run(self)
+
+
+class FakeRpc:
+    def __init__(self, store: "FakeTableStore", name: str, params: Dict):
+        self.store = store
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResult:
+        return self.store.run_rpc(self.name, self.params)
+
+
+class FakeTableStore:
+    """메모리 테이블 저장소 — create_client() 결과 대신 사용"""
+
+    def __init__(self, latency_ms: float = 30):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, Dict[int, Dict]] = {}
+        self.next_ids: Counter = Counter()
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict) -> "FakeRpc":
+        return FakeRpc(self, name, params)
+
+    def run_rpc(self, name: str, params: Dict) -> FakeResult:
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.calls[f"rpc.{name}"] += 1
+            sections = self.tables.setdefault("manual_sections", {})
+            if name == "update_section_embeddings":
+                column = params.get("target_column", "embedding")
+                updated = 0
+                for item in params["items"]:
+                    row = sections.get(item["section_id"])
+                    if row is not None:
+                        row[column] = item["embedding"]
+                        updated += 1
+                return FakeResult(updated)
+            if name == "prepare_embedding_slot":
+                for row in sections.values():
+                    row[params["target_column"]] = None
+                return FakeResult(None)
+            if name in SEARCH_COLUMNS:
+                return FakeResult(self._search(sections.values(), SEARCH_COLUMNS[name], params))
+            raise ValueError(f"지원하지 않는 RPC: {name}")
+
+    @staticmethod
+    def _search(rows, column: str, params: Dict) -> List[Dict]:
+        """hybrid_search의 벡터 점수 부분만 흉내 (코사인 유사도 순)"""
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        scored = []
+        for row in rows:
+            vec = row.get(column)
+            if vec is None or len(vec) != len(query):
+                continue
+            vec = np.asarray(vec, dtype=np.float32)
+            score = float(vec @ query / (np.linalg.norm(vec) * np.linalg.norm(query) or 1.0))
+            if score > params.get("match_threshold", 0.1):
+                scored.append({**{k: row.get(k) for k in SEARCH_RESULT_COLUMNS}, "similarity": score})
+        scored.sort(key=lambda r: r["similarity"], reverse=True)
+        return scored[:params.get("match_count", 5)]
+
+    def rows(self, name: str) -> List[Dict]:
+        return list(self.tables.get(name, {}).values())
+
+    def _match(self, query: FakeQuery, paged: bool = True) -> List[Dict]:
+        rows = [row for row in self.tables.get(query.table, {}).values()
+                if all(f(row) for f in query.filters)]
+        for column, desc in reversed(query.order_by):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if not paged:
+            return rows
+        if query.row_range:
+            rows = rows[query.row_range[0]:query.row_range[1] + 1]
+        if query.row_limit is not None:
+            rows = rows[:query.row_limit]
+        return rows
+
+    def run(self, query: FakeQuery) -> FakeResult:
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.calls[f"{query.table}.{query.op}"] += 1
+            table = self.tables.setdefault(query.table, {})
+            id_column = ID_COLUMNS.get(query.table, "id")
+
+            if query.op == "insert":
+                inserted = []
+                for row in query.payload:
+                    self.next_ids[query.table] += 1
+                    row = dict(row)
+                    row.setdefault(id_column, self.next_ids[query.table])
+                    table[row[id_column]] = row
+                    inserted.append(dict(row))
+                return FakeResult(inserted)
+
+            rows = self._match(query)
+            if query.op == "update":
+                for row in rows:
+                    row.update(query.payload)
+                return FakeResult([dict(row) for row in rows])
+            if query.op == "delete":
+                for row in rows:
+                    table.pop(row[id_column], None)
+                return FakeResult([dict(row) for row in rows])
+            count = len(self._match(query, paged=False)) if query.count else None
+            if query.columns is None:
+                return FakeResult([dict(row) for row in rows], count)
+            # "별칭:컬럼" 형식 지원 (incremental.load_section_index)
+            columns = [c.split(":", 1) if ":" in c else (c, c) for c in query.columns]
+            return FakeResult([{alias: row.get(c) for alias, c in columns} for row in rows], count)
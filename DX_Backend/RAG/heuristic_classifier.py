@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ingest_utils import CACHE_DIR
+
+
+# =========================================
+# 로컬 섹션 분류기 (LLM 호출 전 단계)
+#   1) 키워드 규칙: "코스" → course, "버튼" → button, "청소/세척" → maintenance ...
+#   2) TF-IDF(문자 2~3-gram) 최근접 중심 분류기: Gemini가 라벨을 붙인 manual_sections로만 학습
+#      (category_source = 'llm', migrations/007) — 이 분류기가 붙인 라벨로 다시 학습하지 않게
+#   두 결과를 합쳐 category / section_title / confidence 를 반환.
+#   confidence가 임계값보다 낮은 섹션만 Gemini로 보냄.
+#   TF-IDF 신뢰도는 softmax가 아니라 학습 때 떼어 둔 검증 세트에서 잰 "유사도 구간별 정답률"
+#   (검증 세트가 작으면 유사도 자체를 쓰고 TFIDF_MIN_SIMILARITY 미만은 0)
+# =========================================
+MODEL_PATH = CACHE_DIR / "heuristic_model.json"
+
+# 특징/학습 방식이 바뀌면 올림 → 예전 캐시 모델은 자동 재학습
+MODEL_VERSION = 2
+HOLDOUT_EVERY = 5               # content_text crc32 % 5 == 0 → 검증 세트 (약 20%)
+MIN_CALIBRATION_ROWS = 50       # 검증 세트가 이보다 작으면 보정 없이 유사도 기준
+CALIBRATION_BINS = 10
+TFIDF_MIN_SIMILARITY = float(os.getenv("TFIDF_MIN_SIMILARITY", "0.3"))
+# 저장된 모델 이후 LLM 라벨 섹션이 이 비율 이상 늘면 재학습
+RETRAIN_GROWTH = float(os.getenv("HEURISTIC_RETRAIN_GROWTH", "0.2"))
+RETRAIN_MIN_NEW_ROWS = 100
+
+CATEGORIES = ("button", "course", "error", "maintenance", "other")
+
+# (키워드, 가중치)
+KEYWORD_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "course": [("코스", 2.0), ("표준세탁", 2.0), ("불림", 1.0), ("삶음", 1.5), ("이불", 1.0),
+               ("울/섬세", 1.5), ("섬세", 1.0), ("헹굼", 0.5), ("탈수", 0.5), ("급속", 1.0)],
+    "button": [("버튼", 2.0), ("누르", 1.0), ("조작부", 2.0), ("조작", 1.0), ("전원", 1.0),
+               ("시작/일시정지", 2.0), ("잠금", 1.0), ("예약", 1.0), ("표시부", 1.0)],
+    "maintenance": [("청소", 2.0), ("세척", 2.0), ("세조", 1.5), ("관리", 1.0), ("필터", 1.5),
+                    ("배수 필터", 2.0), ("주의", 1.0), ("경고", 1.0), ("안전", 1.0), ("설치", 1.0),
+                    ("통살균", 2.0), ("보관", 1.0)],
+    "error": [("에러", 2.0), ("오류", 2.0), ("고장", 1.5), ("에러코드", 2.0), ("해결책", 1.0),
+              ("서비스센터", 1.0)],
+}
+# 화면 표시 코드 (UE, OE, dE1, IE, LE ...): 표시부에 실제로 나오는 코드만 나열
+# ("PC", "IC" 같은 일반 약어가 걸리지 않게 두 글자 패턴으로 묶지 않음)
+ERROR_CODE_RE = re.compile(
+    r"(?<![A-Za-z0-9])(?:IE|OE|UE|uE|dE[12]?|dHE|tE|LE|PE|FE|AE|CE|PF|CL|E\d{1,2})(?![A-Za-z0-9])"
+)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _ngrams(text: str) -> Dict[str, int]:
+    text = _normalize(text)
+    counts: Dict[str, int] = {}
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            g = text[i:i + n]
+            if g.strip():
+                counts[g] = counts.get(g, 0) + 1
+    return counts
+
+
+def _unit(vec: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {k: v / norm for k, v in vec.items()}
+
+
+def make_title(text: str, category: str, max_len: int = 15) -> str:
+    """
+    섹션 제목 추정: 첫 번째 짧은 제목형 줄(마침표로 끝나지 않는 줄)을 사용.
+    마땅한 줄이 없으면 첫 줄 앞부분.
+    """
+    lines = [l.strip(" -#*•\t") for l in text.splitlines() if l.strip(" -#*•\t")]
+    for line in lines[:5]:
+        if 2 <= len(line) <= 25 and not line.endswith((".", "다", "요")):
+            return line[:max_len]
+    if category == "error":
+        m = ERROR_CODE_RE.search(text)
+        if m:
+            return f"{m.group(0)} 오류"
+    return (lines[0] if lines else "섹션")[:max_len]
+
+
+class HeuristicClassifier:
+    def __init__(self):
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        # [(유사도 하한, 정답률), ...] 오름차순. 비어 있으면 보정 없음
+        self.calibration: List[Tuple[float, float]] = []
+        self.label_rows = 0
+        self.version = MODEL_VERSION
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.centroids)
+
+    # ---------- 1) 키워드 규칙 ----------
+    def rule_scores(self, text: str) -> Dict[str, float]:
+        scores = {c: 0.0 for c in KEYWORD_RULES}
+        for category, rules in KEYWORD_RULES.items():
+            for kw, weight in rules:
+                if kw in text:
+                    scores[category] += weight
+        codes = len(ERROR_CODE_RE.findall(text))
+        scores["error"] += min(codes, 3) * 1.5
+        return scores
+
+    def rule_predict(self, text: str) -> Tuple[str, float]:
+        scores = self.rule_scores(text)
+        total = sum(scores.values())
+        if total <= 0:
+            return "other", 0.0
+        best = max(scores, key=scores.get)
+        share = scores[best] / total
+        # 근거(가중치 합)가 적으면 신뢰도를 깎음: 가중치 4 이상이면 share 그대로
+        strength = min(1.0, scores[best] / 4.0)
+        return best, share * strength
+
+    # ---------- 2) TF-IDF 최근접 중심 ----------
+    def fit(self, texts: List[str], labels: List[str], max_features: int = 5000, per_class: int = 1500):
+        """검증 세트를 떼어 학습 → 보정표 생성 → 전체로 다시 학습"""
+        holdout = [zlib.crc32(t.encode("utf-8")) % HOLDOUT_EVERY == 0 for t in texts]
+        valid = [(t, l) for t, l, h in zip(texts, labels, holdout) if h]
+        self.calibration = []
+        if len(valid) >= MIN_CALIBRATION_ROWS:
+            self._fit_centroids(
+                [t for t, h in zip(texts, holdout) if not h],
+                [l for l, h in zip(labels, holdout) if not h],
+                max_features, per_class,
+            )
+            scored = []
+            for text, label in valid:
+                best, sim = self._nearest(text)
+                scored.append((sim, best == label))
+            self.calibration = calibrate(scored)
+        self._fit_centroids(texts, labels, max_features, per_class)
+        self.label_rows = len(texts)
+        return self
+
+    def _fit_centroids(self, texts: List[str], labels: List[str], max_features: int, per_class: int):
+        docs = [_ngrams(t) for t in texts]
+        df: Dict[str, int] = {}
+        for d in docs:
+            for g in d:
+                df[g] = df.get(g, 0) + 1
+
+        n = len(docs)
+        vocab = sorted((g for g, c in df.items() if c >= 2), key=lambda g: -df[g])[:max_features]
+        self.idf = {g: math.log((1 + n) / (1 + df[g])) + 1.0 for g in vocab}
+
+        sums: Dict[str, Dict[str, float]] = {}
+        for d, label in zip(docs, labels):
+            if label not in CATEGORIES:
+                continue
+            vec = _unit({g: c * self.idf[g] for g, c in d.items() if g in self.idf})
+            acc = sums.setdefault(label, {})
+            for g, v in vec.items():
+                acc[g] = acc.get(g, 0.0) + v
+
+        self.centroids = {}
+        for label, acc in sums.items():
+            top = dict(sorted(acc.items(), key=lambda kv: -kv[1])[:per_class])
+            self.centroids[label] = _unit(top)
+
+    def _nearest(self, text: str) -> Tuple[str, float]:
+        """(가장 가까운 카테고리, 코사인 유사도)"""
+        vec = _unit({g: c * self.idf[g] for g, c in _ngrams(text).items() if g in self.idf})
+        sims = {label: sum(v * centroid.get(g, 0.0) for g, v in vec.items())
+                for label, centroid in self.centroids.items()}
+        best = max(sims, key=sims.get)
+        return best, sims[best]
+
+    def tfidf_predict(self, text: str) -> Tuple[str, float]:
+        if not self.trained:
+            return "other", 0.0
+        best, sim = self._nearest(text)
+        if not self.calibration:
+            return best, sim if sim >= TFIDF_MIN_SIMILARITY else 0.0
+        confidence = 0.0
+        for lower, accuracy in self.calibration:
+            if sim < lower:
+                break
+            confidence = accuracy
+        return best, confidence
+
+    # ---------- 결합 ----------
+    def predict(self, text: str) -> Dict:
+        rule_cat, rule_conf = self.rule_predict(text)
+        tfidf_cat, tfidf_conf = self.tfidf_predict(text)
+
+        if rule_cat == tfidf_cat:
+            category = rule_cat
+            confidence = 1 - (1 - rule_conf) * (1 - tfidf_conf)   # 두 근거가 일치하면 보강
+        elif rule_conf >= tfidf_conf:
+            category, confidence = rule_cat, rule_conf * (1 - tfidf_conf * 0.5)
+        else:
+            category, confidence = tfidf_cat, tfidf_conf * (1 - rule_conf * 0.5)
+
+        return {
+            "section_title": make_title(text, category),
+            "category": category,
+            "confidence": round(confidence, 3),
+        }
+
+    # ---------- 저장/로드 ----------
+    def save(self, path: Path = MODEL_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.version,
+            "trained_at": time.time(),
+            "label_rows": self.label_rows,
+            "idf": self.idf,
+            "centroids": self.centroids,
+            "calibration": self.calibration,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "HeuristicClassifier":
+        clf = cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        clf.version = data.get("version", 1)
+        clf.label_rows = data.get("label_rows", 0)
+        clf.idf = data.get("idf", {})
+        clf.centroids = data.get("centroids", {})
+        clf.calibration = [tuple(pair) for pair in data.get("calibration", [])]
+        return clf
+
+
+def calibrate(scored: List[Tuple[float, bool]], bins: int = CALIBRATION_BINS) -> List[Tuple[float, float]]:
+    """
+    (유사도, 정답 여부) → 유사도 구간별 정답률 (개수가 같은 구간으로 나눔).
+    유사도가 높을수록 정답률이 낮아지지 않게 인접 구간을 합침 (pool adjacent violators).
+    """
+    scored = sorted(scored)
+    size = max(1, math.ceil(len(scored) / bins))
+    blocks = []   # [하한, 정답 수, 개수]
+    for i in range(0, len(scored), size):
+        chunk = scored[i:i + size]
+        blocks.append([chunk[0][0], sum(ok for _, ok in chunk), len(chunk)])
+        while len(blocks) > 1 and blocks[-2][1] / blocks[-2][2] > blocks[-1][1] / blocks[-1][2]:
+            last = blocks.pop()
+            blocks[-1][1] += last[1]
+            blocks[-1][2] += last[2]
+    return [(round(lower, 4), round(hits / n, 3)) for lower, hits, n in blocks]
+
+
+def count_llm_labelled(supabase_client) -> int:
+    res = supabase_client.table("manual_sections") \
+        .select("section_id", count="exact") \
+        .eq("category_source", "llm") \
+        .limit(1) \
+        .execute()
+    return res.count or 0
+
+
+def train_from_supabase(supabase_client, page_size: int = 1000, max_rows: int = 20000) -> HeuristicClassifier:
+    """manual_sections 중 Gemini가 라벨을 붙인 (content_text, category)로만 학습"""
+    texts: List[str] = []
+    labels: List[str] = []
+    start = 0
+    while start < max_rows:
+        res = supabase_client.table("manual_sections") \
+            .select("content_text, category") \
+            .eq("category_source", "llm") \
+            .order("section_id") \
+            .range(start, start + page_size - 1) \
+            .execute()
+        rows = res.data or []
+        for row in rows:
+            if row.get("content_text") and row.get("category") in CATEGORIES:
+                texts.append(row["content_text"])
+                labels.append(row["category"])
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+    clf = HeuristicClassifier()
+    if texts:
+        clf.fit(texts, labels)
+    print(f"🧠 로컬 분류기 학습: LLM 라벨 섹션 {len(texts)}개, 카테고리 {len(clf.centroids)}개, "
+          f"보정 구간 {len(clf.calibration)}개")
+    return clf
+
+
+def needs_retrain(clf: HeuristicClassifier, supabase_client=None) -> bool:
+    """모델 버전이 다르거나, 학습 이후 LLM 라벨 섹션이 RETRAIN_GROWTH 이상 늘었으면 재학습"""
+    if clf.version != MODEL_VERSION:
+        print(f"🧠 로컬 분류기 버전 변경 ({clf.version} → {MODEL_VERSION}), 재학습")
+        return True
+    if supabase_client is None:
+        return False
+    try:
+        current = count_llm_labelled(supabase_client)
+    except Exception as e:
+        print(f"⚠️ LLM 라벨 섹션 수 조회 실패 (캐시 모델 사용): {e}")
+        return False
+    grown = current - clf.label_rows
+    if grown >= RETRAIN_MIN_NEW_ROWS and grown >= clf.label_rows * RETRAIN_GROWTH:
+        print(f"🧠 LLM 라벨 섹션 {clf.label_rows} → {current}개, 재학습")
+        return True
+    return False
+
+
+def load_or_train(supabase_client=None, retrain: bool = False) -> HeuristicClassifier:
+    """
+    캐시된 모델이 있으면 로드(버전/라벨 증가량 확인 후 필요하면 재학습),
+    없으면 Supabase LLM 라벨로 학습 후 저장. 둘 다 안 되면 규칙만 사용
+    """
+    if MODEL_PATH.exists() and not retrain:
+        try:
+            clf = HeuristicClassifier.load()
+            if not needs_retrain(clf, supabase_client):
+                return clf
+        except Exception as e:
+            print(f"⚠️ 로컬 분류기 로드 실패 (재학습): {e}")
+    if supabase_client is not None:
+        try:
+            clf = train_from_supabase(supabase_client)
+            if clf.trained:
+                clf.save()
+            return clf
+        except Exception as e:
+            print(f"⚠️ 로컬 분류기 학습 실패 (키워드 규칙만 사용): {e}")
+    return HeuristicClassifier()
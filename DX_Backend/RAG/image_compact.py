@@ -0,0 +1,84 @@
+import io
+import os
+from typing import Optional, Tuple
+
+from PIL import Image
+
+
+# =========================================
+# Vision 표 파싱용 이미지 압축
+#   - 페이지 전체 200dpi PNG 대신: 표 영역만 잘라서 → 흑백 → 해상도 자동 선택 → JPEG/WebP
+#   - 바이트 예산(VISION_MAX_BYTES) 안에 들어올 때까지 품질 → 크기 순으로 낮춤
+#   - 글자가 뭉개지지 않도록 품질/크기 하한을 둠
+# =========================================
+VISION_MAX_BYTES = int(os.getenv("VISION_MAX_BYTES", "250000"))
+VISION_FORMAT = os.getenv("VISION_FORMAT", "jpeg").lower()   # "jpeg" | "webp"
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1600"))  # 긴 변 최대 픽셀
+MIN_DPI = 100
+MAX_DPI = 200
+QUALITY_STEPS = (85, 75, 65, 55, 45)
+MIN_SIDE = 800   # 이보다 작게 줄이면 표 글자를 못 읽음
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def pick_resolution(width_pt: float, height_pt: float, max_side: int = VISION_MAX_SIDE) -> int:
+    """잘라낸 영역 크기(pt, 1/72인치) 기준으로 긴 변이 max_side px이 되는 dpi (MIN_DPI~MAX_DPI)"""
+    longest_inch = max(width_pt, height_pt, 1.0) / 72.0
+    return int(max(MIN_DPI, min(MAX_DPI, max_side / longest_inch)))
+
+
+def encode_compact(
+    img: Image.Image,
+    max_bytes: int = VISION_MAX_BYTES,
+    fmt: str = VISION_FORMAT,
+    max_side: int = VISION_MAX_SIDE,
+) -> Tuple[bytes, str]:
+    """
+    이미지를 흑백 JPEG/WebP로 인코딩해서 (bytes, mime_type) 반환.
+    품질을 낮춰도 max_bytes를 넘으면 0.8배씩 줄여가며 다시 시도 (긴 변 MIN_SIDE까지).
+    """
+    fmt = fmt if fmt in ("jpeg", "webp") else "jpeg"
+    img = img.convert("L")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    data = b""
+    while True:
+        for quality in QUALITY_STEPS:
+            buf = io.BytesIO()
+            img.save(buf, format=fmt.upper(), quality=quality, optimize=True)
+            data = buf.getvalue()
+            if len(data) <= max_bytes:
+                return data, MIME_TYPES[fmt]
+        if max(img.size) * 0.8 < MIN_SIDE:
+            # 더 줄이면 못 읽음 → 예산을 조금 넘더라도 가장 작은 결과 사용
+            return data, MIME_TYPES[fmt]
+        img = img.resize((int(img.width * 0.8), int(img.height * 0.8)), Image.LANCZOS)
+
+
+def table_bbox(page, margin: float = 8.0) -> Optional[Tuple[float, float, float, float]]:
+    """pdfplumber page에서 감지된 표들을 모두 감싸는 영역 (없으면 None)"""
+    try:
+        tables = page.find_tables()
+    except Exception:
+        return None
+    if not tables:
+        return None
+    x0 = min(t.bbox[0] for t in tables) - margin
+    top = min(t.bbox[1] for t in tables) - margin
+    x1 = max(t.bbox[2] for t in tables) + margin
+    bottom = max(t.bbox[3] for t in tables) + margin
+    return (max(0, x0), max(0, top), min(page.width, x1), min(page.height, bottom))
+
+
+def render_table_image(page) -> Tuple[bytes, str]:
+    """
+    pdfplumber page → Vision에 보낼 압축 이미지 (bytes, mime_type).
+    표 영역이 감지되면 그 부분만, 아니면 페이지 전체.
+    """
+    bbox = table_bbox(page)
+    region = page.crop(bbox) if bbox else page
+    resolution = pick_resolution(region.width, region.height)
+    img = region.to_image(resolution=resolution).original
+    return encode_compact(img)
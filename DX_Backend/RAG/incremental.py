@@ -0,0 +1,157 @@
+import re
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# =========================================
+# 증분 재적재 (content hash 기반)
+#   - 섹션마다 내용 해시(content_hash)를 저장
+#   - 같은 model_id의 이전 버전(또는 같은 버전 재실행)의 섹션과 해시 비교
+#   - 바뀌지 않은 섹션은 제목/카테고리/임베딩을 그대로 재사용 → API 호출 없음
+#   - 같은 내용 섹션이 여러 개일 수 있으므로 해시 → row 목록으로 두고 개수대로 맞춤
+#   (DB 컬럼: migrations/001_manual_sections_content_hash.sql)
+# =========================================
+def section_hash(content: str) -> str:
+    """공백 차이는 무시하고 내용만으로 해시"""
+    normalized = re.sub(r"\s+", " ", content).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def find_manual_id(supabase_client, model_id: str, version: str) -> Optional[int]:
+    """같은 model_id + version 문서가 이미 있으면 그 manual_id (재실행)"""
+    res = supabase_client.table("manual_documents") \
+        .select("manual_id") \
+        .eq("model_id", model_id) \
+        .eq("version", version) \
+        .order("created_at", desc=True) \
+        .limit(1) \
+        .execute()
+    return res.data[0]["manual_id"] if res.data else None
+
+
+def find_latest_manual_id(supabase_client, model_id: str) -> Optional[int]:
+    """같은 model_id의 가장 최근 버전 manual_id"""
+    res = supabase_client.table("manual_documents") \
+        .select("manual_id") \
+        .eq("model_id", model_id) \
+        .order("created_at", desc=True) \
+        .limit(1) \
+        .execute()
+    return res.data[0]["manual_id"] if res.data else None
+
+
+def load_section_index(
+    supabase_client,
+    manual_id: int,
+    page_size: int = 500,
+    embedding_column: str = "embedding",
+) -> Dict[str, List[Dict]]:
+    """
+    manual_id의 섹션들을 {content_hash: [row, ...]} (section_id 순) 로 반환.
+    content_hash가 비어 있는 예전 행은 content_text로 해시를 계산.
+    embedding_column(현재 검색 컬럼, embedding_config.py)의 값은 항상 row["embedding"]으로 읽힘.
+    """
+    embedding_select = "embedding" if embedding_column == "embedding" else f"embedding:{embedding_column}"
+    index: Dict[str, List[Dict]] = {}
+    start = 0
+    while True:
+        res = supabase_client.table("manual_sections") \
+            .select(f"section_id, section_title, category, category_source, content_text, {embedding_select}, content_hash") \
+            .eq("manual_id", manual_id) \
+            .order("section_id") \
+            .range(start, start + page_size - 1) \
+            .execute()
+        rows = res.data or []
+        for row in rows:
+            h = row.get("content_hash") or section_hash(row.get("content_text") or "")
+            index.setdefault(h, []).append(row)
+        if len(rows) < page_size:
+            break
+        start += page_size
+    return index
+
+
+def count_rows(index: Dict[str, List[Dict]]) -> int:
+    return sum(len(rows) for rows in index.values())
+
+
+def split_by_hash(
+    sections: List[Dict],
+    previous: Dict[str, List[Dict]],
+    claimed: Optional[Set[int]] = None,
+) -> Tuple[List[Tuple[Dict, Dict]], List[Dict]]:
+    """
+    sections에 content_hash를 채우고
+    (재사용 가능한 (섹션, 이전 row) 목록, 새로 처리해야 할 섹션 목록) 으로 나눔.
+    이전 row에 임베딩이 없으면 재사용하지 않음.
+    claimed(같은 버전 재실행)를 넘기면 이전 row 하나는 섹션 하나에만 대응시키고 section_id를 기록
+    → 같은 내용이 예전보다 많아지면 남는 섹션은 새로 처리, 적어지면 남는 row는 delete_stale_sections가 삭제.
+    """
+    reuse: List[Tuple[Dict, Dict]] = []
+    todo: List[Dict] = []
+    for sec in sections:
+        sec["content_hash"] = sec.get("content_hash") or section_hash(sec["content_markdown"])
+        prev = next(
+            (row for row in previous.get(sec["content_hash"], [])
+             if row.get("embedding") and (claimed is None or row["section_id"] not in claimed)),
+            None,
+        )
+        if prev:
+            if claimed is not None:
+                claimed.add(prev["section_id"])
+            reuse.append((sec, prev))
+        else:
+            todo.append(sec)
+    return reuse, todo
+
+
+def hand_over_referenced_sections(supabase_client, manual_id: int, section_ids: List[int]) -> Set[int]:
+    """
+    다른 매뉴얼이 근사 중복 참조(manual_section_refs, dedup.py)로 가리키는 섹션은 지우지 않고
+    참조하던 매뉴얼 중 첫 번째로 넘김 (그 참조 행은 실제 섹션이 되므로 삭제, 나머지 참조는 그대로 유효).
+    넘긴 section_id 집합 반환.
+    """
+    refs = []
+    for i in range(0, len(section_ids), 200):
+        refs += supabase_client.table("manual_section_refs") \
+            .select("ref_id, section_id, manual_id, page_number, page_end") \
+            .in_("section_id", section_ids[i:i + 200]) \
+            .neq("manual_id", manual_id) \
+            .order("ref_id") \
+            .execute().data or []
+    handed: Set[int] = set()
+    for ref in refs:
+        if ref["section_id"] in handed:
+            continue
+        supabase_client.table("manual_sections") \
+            .update({"manual_id": ref["manual_id"], "page_number": ref["page_number"], "page_end": ref["page_end"]}) \
+            .eq("section_id", ref["section_id"]) \
+            .execute()
+        supabase_client.table("manual_section_refs").delete().eq("ref_id", ref["ref_id"]).execute()
+        handed.add(ref["section_id"])
+    return handed
+
+
+def delete_stale_sections(
+    supabase_client,
+    manual_id: int,
+    previous: Dict[str, List[Dict]],
+    kept_ids: Set[int],
+) -> int:
+    """
+    같은 버전 재실행 시: 이번 실행에서 재사용되지 않은 이전 섹션 삭제
+    (새 PDF에 없어진 섹션, 같은 내용이 줄어서 남는 사본, 임베딩이 없어 새로 만든 섹션의 예전 row).
+    다른 매뉴얼이 참조하던 섹션은 그 매뉴얼로 넘김.
+    """
+    stale_ids = [row["section_id"] for rows in previous.values() for row in rows
+                 if row["section_id"] not in kept_ids]
+    handed = hand_over_referenced_sections(supabase_client, manual_id, stale_ids) if stale_ids else set()
+    if handed:
+        print(f"  🔁 다른 매뉴얼이 참조하던 섹션 {len(handed)}개는 삭제하지 않고 그 매뉴얼로 넘김")
+    stale_ids = [sid for sid in stale_ids if sid not in handed]
+    for i in range(0, len(stale_ids), 200):
+        supabase_client.table("manual_sections") \
+            .delete() \
+            .in_("section_id", stale_ids[i:i + 200]) \
+            .execute()
+    return len(stale_ids)
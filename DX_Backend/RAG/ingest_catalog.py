@@ -0,0 +1,302 @@
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ingest_utils import RateLimiter, IngestionReport
+from page_extraction import PDF_WORKERS, count_pages
+import upload_manual
+
+
+# =========================================
+# 여러 매뉴얼 한꺼번에 적재 (카탈로그 단위)
+#   python ingest_catalog.py manuals/                 : 폴더 안 PDF 전체 (manifest.json/csv가 있으면 그걸 사용)
+#   python ingest_catalog.py catalog.json             : 매니페스트 파일
+#   python ingest_catalog.py manuals/ --concurrency 3 --rps 8 --report-json report.json
+#
+#   매니페스트 항목: pdf_path, model_id, version, [title], [file_url]
+#     - JSON: 위 키를 가진 객체 리스트 / CSV: 같은 이름의 헤더
+#     - pdf_path가 상대 경로면 매니페스트 파일 위치 기준
+#   매니페스트 없는 폴더: 파일명 "<model_id>_<version>.pdf" (밑줄 없으면 --version 값 사용)
+#
+#   - 매뉴얼 MANUAL_CONCURRENCY개를 동시에 처리, Gemini 호출은 upload_manual.gemini_limiter
+#     하나를 같이 씀 → 매뉴얼 수와 상관없이 전체 호출 속도가 GEMINI_RPS(--rps)를 넘지 않음
+#   - PDF 추출 프로세스(PDF_WORKERS)도 동시에 도는 매뉴얼 수로 나눠 씀
+#   - 처리 중에는 PROGRESS_INTERVAL초마다 진행 상황, 끝나면 매뉴얼별 처리량/API 호출/예상 비용 표
+#   - 같은 시점에 함께 적재되는 매뉴얼끼리는 근사 중복(dedup.py) 비교가 되지 않음
+#     (다음 적재부터는 저장된 섹션으로 비교됨)
+# =========================================
+MANUAL_CONCURRENCY = int(os.getenv("MANUAL_CONCURRENCY", "2"))
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "10"))
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+
+# 예상 비용 계산용 단가 (USD / 1M 토큰) — 실제 요금제에 맞게 환경변수로 조정
+#   토큰 수는 estimate_tokens(2글자 ≈ 1토큰) 기준 추정치라 청구액과 정확히 같지는 않음
+PRICE_LLM_INPUT = float(os.getenv("PRICE_LLM_INPUT", "1.25"))      # 섹션 분류 (gemini-1.5-pro)
+PRICE_LLM_OUTPUT = float(os.getenv("PRICE_LLM_OUTPUT", "5.0"))
+PRICE_EMBED = float(os.getenv("PRICE_EMBED", "0.0"))               # text-embedding-004 (무료 티어 기준 0)
+PRICE_VISION_INPUT = float(os.getenv("PRICE_VISION_INPUT", "1.25"))
+PRICE_VISION_OUTPUT = float(os.getenv("PRICE_VISION_OUTPUT", "5.0"))
+LLM_OUTPUT_TOKENS_PER_SECTION = 30    # 분류 응답(JSON 제목/카테고리) 섹션당 대략치
+VISION_TOKENS_PER_IMAGE = 258         # Gemini 1.5 이미지 1장 입력 토큰
+VISION_OUTPUT_TOKENS = 800            # 에러코드 표 JSON 응답 대략치
+
+
+@dataclass
+class ManualJob:
+    pdf_path: str
+    model_id: str
+    version: str
+    title: str = ""
+    file_url: str = ""
+    total_pages: int = 0
+    status: str = "대기"
+    error: Optional[str] = None
+    report: IngestionReport = field(default_factory=IngestionReport)
+
+    @property
+    def name(self) -> str:
+        return f"{self.model_id} {self.version}"
+
+
+# =========================================
+# 1. 카탈로그 읽기
+# =========================================
+def _job_from_item(item: Dict, base_dir: Path) -> ManualJob:
+    missing = [key for key in ("pdf_path", "model_id", "version") if not item.get(key)]
+    if missing:
+        raise ValueError(f"매니페스트 항목에 {', '.join(missing)} 없음: {item}")
+    pdf_path = Path(item["pdf_path"])
+    if not pdf_path.is_absolute():
+        pdf_path = base_dir / pdf_path
+    model_id = str(item["model_id"]).strip()
+    return ManualJob(
+        pdf_path=str(pdf_path),
+        model_id=model_id,
+        version=str(item["version"]).strip(),
+        title=(item.get("title") or "").strip() or f"{model_id} 상세 매뉴얼",
+        file_url=(item.get("file_url") or "").strip(),
+    )
+
+
+def load_manifest(path: Path) -> List[ManualJob]:
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            items = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+    return [_job_from_item(item, path.parent) for item in items]
+
+
+def scan_directory(directory: Path, default_version: str) -> List[ManualJob]:
+    """매니페스트가 없는 폴더: 파일명 <model_id>_<version>.pdf"""
+    jobs = []
+    for pdf in sorted(directory.glob("*.pdf")):
+        model_id, sep, version = pdf.stem.rpartition("_")
+        if not sep:
+            model_id, version = pdf.stem, default_version
+        jobs.append(ManualJob(
+            pdf_path=str(pdf),
+            model_id=model_id,
+            version=version,
+            title=f"{model_id} 상세 매뉴얼",
+            file_url=os.getenv("MANUAL_FILE_URL", ""),
+        ))
+    return jobs
+
+
+def load_catalog(source: str, default_version: str = "v1.0") -> List[ManualJob]:
+    path = Path(source)
+    if path.is_dir():
+        for name in MANIFEST_NAMES:
+            if (path / name).exists():
+                return load_manifest(path / name)
+        return scan_directory(path, default_version)
+    if path.exists():
+        return load_manifest(path)
+    raise FileNotFoundError(f"카탈로그를 찾을 수 없습니다: {source}")
+
+
+# =========================================
+# 2. 비용 추정 / 진행 상황 출력
+# =========================================
+def estimate_cost(counters: Dict[str, int]) -> float:
+    """IngestionReport.counters 기준 예상 비용 (USD)"""
+    llm = (counters.get("llm_input_tokens", 0) * PRICE_LLM_INPUT
+           + counters.get("llm_sections", 0) * LLM_OUTPUT_TOKENS_PER_SECTION * PRICE_LLM_OUTPUT)
+    embed = counters.get("embed_tokens", 0) * PRICE_EMBED
+    vision_calls = counters.get("vision_calls", 0)
+    vision = vision_calls * (VISION_TOKENS_PER_IMAGE * PRICE_VISION_INPUT + VISION_OUTPUT_TOKENS * PRICE_VISION_OUTPUT)
+    return (llm + embed + vision) / 1_000_000
+
+
+def progress_line(job: ManualJob) -> str:
+    c = job.report.counters
+    pages = c.get("pages", 0)
+    return (f"  ⏳ {job.name}: 페이지 {pages}/{job.total_pages or '?'}, "
+            f"섹션 {job.report.sections} (실패 {job.report.failed}), "
+            f"llm {c.get('llm_calls', 0)} / embed {c.get('embed_calls', 0)} / vision {c.get('vision_calls', 0)}, "
+            f"{job.report.elapsed:.0f}s")
+
+
+def watch_progress(jobs: List[ManualJob], stop: threading.Event, interval: float = PROGRESS_INTERVAL):
+    while not stop.wait(interval):
+        running = [job for job in jobs if job.status == "처리 중"]
+        done = sum(1 for job in jobs if job.status not in ("대기", "처리 중"))
+        print(f"📈 진행: 완료 {done}/{len(jobs)}, 처리 중 {len(running)}")
+        for job in running:
+            print(progress_line(job))
+
+
+def print_catalog_report(jobs: List[ManualJob], wall_seconds: float):
+    header = (f"{'manual':<22}{'status':>6}{'pages':>7}{'sections':>9}{'failed':>7}{'sec':>8}"
+              f"{'pages/s':>9}{'sect/s':>8}{'llm':>6}{'embed':>7}{'vision':>7}{'cost($)':>9}")
+    print("\n" + header)
+    print("-" * len(header))
+    totals: Dict[str, int] = {}
+    total_pages = total_sections = total_failed = 0
+    for job in jobs:
+        r, c = job.report, job.report.counters
+        pages = c.get("pages", 0)
+        total_pages += pages
+        total_sections += r.sections
+        total_failed += r.failed
+        for key, value in c.items():
+            totals[key] = totals.get(key, 0) + value
+        print(f"{job.name[:21]:<22}{job.status:>6}{pages:>7}{r.sections:>9}{r.failed:>7}{r.elapsed:>8.1f}"
+              f"{pages / r.elapsed:>9.2f}{r.sections_per_sec:>8.2f}{c.get('llm_calls', 0):>6}"
+              f"{c.get('embed_calls', 0):>7}{c.get('vision_calls', 0):>7}{estimate_cost(c):>9.4f}")
+    print("-" * len(header))
+    wall = max(wall_seconds, 1e-9)
+    print(f"{'합계':<22}{'':>6}{total_pages:>7}{total_sections:>9}{total_failed:>7}{wall:>8.1f}"
+          f"{total_pages / wall:>9.2f}{total_sections / wall:>8.2f}{totals.get('llm_calls', 0):>6}"
+          f"{totals.get('embed_calls', 0):>7}{totals.get('vision_calls', 0):>7}{estimate_cost(totals):>9.4f}")
+    print("  (합계 행의 pages/s, sect/s는 전체 경과 시간 기준 — 동시 처리 효과 포함)")
+    for job in jobs:
+        if job.error:
+            print(f"  ❌ {job.name}: {job.error}")
+
+
+def catalog_report_dict(jobs: List[ManualJob], wall_seconds: float) -> Dict:
+    return {
+        "wall_seconds": wall_seconds,
+        "manuals": [
+            {
+                "pdf_path": job.pdf_path,
+                "model_id": job.model_id,
+                "version": job.version,
+                "status": job.status,
+                "error": job.error,
+                "pages": job.report.counters.get("pages", 0),
+                "sections": job.report.sections,
+                "failed": job.report.failed,
+                "elapsed": job.report.elapsed,
+                "pages_per_sec": job.report.counters.get("pages", 0) / job.report.elapsed,
+                "sections_per_sec": job.report.sections_per_sec,
+                "counters": dict(job.report.counters),
+                "estimated_cost_usd": estimate_cost(job.report.counters),
+            }
+            for job in jobs
+        ],
+    }
+
+
+# =========================================
+# 3. 실행
+# =========================================
+def run_job(job: ManualJob, pdf_workers: int, text_backend: Optional[str]) -> ManualJob:
+    job.status = "처리 중"
+    job.report = IngestionReport(label=job.name)
+    try:
+        job.total_pages = count_pages(job.pdf_path, backend=text_backend)
+        upload_manual.process_manual_pdf(
+            pdf_path=job.pdf_path,
+            model_id=job.model_id,
+            manual_title=job.title,
+            manual_version=job.version,
+            file_url=job.file_url,
+            text_backend=text_backend,
+            workers=pdf_workers,
+            report=job.report,
+        )
+        job.status = "완료" if not job.report.failed else "일부실패"
+    except Exception as e:
+        job.status = "실패"
+        job.error = f"{type(e).__name__}: {e}"
+    finally:
+        job.report.finish()
+    return job
+
+
+def ingest_catalog(
+    jobs: List[ManualJob],
+    concurrency: int = MANUAL_CONCURRENCY,
+    rps: Optional[float] = None,
+    text_backend: Optional[str] = None,
+) -> float:
+    """매뉴얼들을 concurrency개씩 동시에 적재. 반환: 전체 경과 시간(초)"""
+    if rps:
+        # upload_manual 안의 모든 Gemini 호출이 이 limiter 하나를 공유함
+        upload_manual.gemini_limiter = RateLimiter(rps)
+    concurrency = max(1, min(concurrency, len(jobs)))
+    pdf_workers = max(1, PDF_WORKERS // concurrency)
+    # 로컬 분류기는 전역 1개 — 스레드들이 동시에 학습하지 않도록 미리 로드
+    upload_manual.get_local_classifier()
+
+    print(f"🚚 매뉴얼 {len(jobs)}개 적재 시작 (동시 {concurrency}개, PDF 프로세스 매뉴얼당 {pdf_workers}개, "
+          f"Gemini {upload_manual.gemini_limiter.rate:g} req/s 공유)")
+    started = time.perf_counter()
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_progress, args=(jobs, stop), daemon=True)
+    watcher.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_job, job, pdf_workers, text_backend) for job in jobs]
+            for future in as_completed(futures):
+                job = future.result()
+                mark = "✅" if job.status == "완료" else "⚠️"
+                print(f"{mark} {job.name} {job.status} ({job.report.elapsed:.1f}s)")
+    finally:
+        stop.set()
+        watcher.join()
+    return time.perf_counter() - started
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="여러 매뉴얼 PDF를 한꺼번에 manual_sections에 적재")
+    parser.add_argument("source", help="PDF 폴더 또는 매니페스트(.json/.csv)")
+    parser.add_argument("--concurrency", type=int, default=MANUAL_CONCURRENCY, help="동시에 처리할 매뉴얼 수")
+    parser.add_argument("--rps", type=float, default=None, help="전체 Gemini 초당 호출 한도 (기본 GEMINI_RPS)")
+    parser.add_argument("--version", default="v1.0", help="폴더 스캔 시 파일명에 버전이 없을 때 쓸 버전")
+    parser.add_argument("--backend", default=None, help="PDF 텍스트 백엔드 (기본 PDF_TEXT_BACKEND)")
+    parser.add_argument("--report-json", default=None, help="최종 리포트를 JSON으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    jobs = load_catalog(args.source, default_version=args.version)
+    for job in jobs:
+        if not os.path.exists(job.pdf_path):
+            print(f"❌ 파일을 찾을 수 없습니다: {job.pdf_path}")
+    jobs = [job for job in jobs if os.path.exists(job.pdf_path)]
+    if not jobs:
+        print("적재할 매뉴얼이 없습니다.")
+        return 1
+
+    wall = ingest_catalog(jobs, concurrency=args.concurrency, rps=args.rps, text_backend=args.backend)
+    print_catalog_report(jobs, wall)
+    if args.report_json:
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(catalog_report_dict(jobs, wall), f, ensure_ascii=False, indent=2)
+        print(f"💾 리포트 저장 → {args.report_json}")
+    return 0 if all(job.status == "완료" for job in jobs) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from embedding_codec import pack_f32, parse_embedding
+from ingest_utils import CACHE_DIR
+
+
+# =========================================
+# 적재 체크포인트 저널 (로컬 SQLite)
+#   - 메타/임베딩이 끝난 섹션을 바로 기록 → 중간에 할당량 에러로 죽어도 다시 돌리면
+#     이미 돈 내고 받은 분류/임베딩 결과를 그대로 재사용 (API 재호출 없음)
+#   - 키: (manual_id, content_hash), 임베딩은 float32 bytes로 저장
+#   - 매뉴얼 적재가 끝까지 성공하면 해당 manual_id 기록은 정리
+# =========================================
+JOURNAL_PATH = CACHE_DIR / "ingest_journal.db"
+
+
+class IngestJournal:
+    def __init__(self, db_path: Union[str, Path] = JOURNAL_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS enriched_sections (
+                manual_id        INTEGER NOT NULL,
+                content_hash     TEXT NOT NULL,
+                section_title    TEXT,
+                category         TEXT,
+                category_source  TEXT,
+                embedding        BLOB,
+                inserted         INTEGER DEFAULT 0,
+                updated_at       REAL,
+                PRIMARY KEY (manual_id, content_hash)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, manual_id: int, content_hash: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT section_title, category, embedding, inserted, category_source FROM enriched_sections "
+            "WHERE manual_id = ? AND content_hash = ?",
+            (manual_id, content_hash),
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "section_title": row[0],
+            "category": row[1],
+            "embedding": parse_embedding(row[2]),
+            "inserted": bool(row[3]),
+            "category_source": row[4],
+        }
+
+    def record(self, manual_id: int, content_hash: str, meta: Dict, embedding: List[float]):
+        """분류+임베딩이 끝난 섹션 1개 기록 (insert 전)"""
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO enriched_sections
+                (manual_id, content_hash, section_title, category, category_source, embedding, inserted, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+                ON CONFLICT(manual_id, content_hash) DO UPDATE SET
+                    section_title = excluded.section_title,
+                    category = excluded.category,
+                    category_source = excluded.category_source,
+                    embedding = excluded.embedding,
+                    updated_at = excluded.updated_at
+                """,
+                (manual_id, content_hash, meta["section_title"], meta["category"], meta.get("category_source"),
+                 pack_f32(embedding), time.time()),
+            )
+            self.conn.commit()
+
+    def mark_inserted(self, manual_id: int, content_hashes: Iterable[str]):
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE enriched_sections SET inserted = 1, updated_at = ? WHERE manual_id = ? AND content_hash = ?",
+                [(time.time(), manual_id, h) for h in content_hashes],
+            )
+            self.conn.commit()
+
+    def pending_count(self, manual_id: int) -> int:
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM enriched_sections WHERE manual_id = ? AND inserted = 0",
+            (manual_id,),
+        ).fetchone()
+        return row[0]
+
+    def clear(self, manual_id: int):
+        with self._lock:
+            self.conn.execute("DELETE FROM enriched_sections WHERE manual_id = ?", (manual_id,))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
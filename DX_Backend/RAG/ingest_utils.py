@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+# =========================================
+# 매뉴얼 적재(ingestion) 공통 유틸
+#   - RateLimiter   : 여러 스레드가 공유하는 API 호출 속도 제한 (토큰 버킷)
+#   - AdaptiveRateLimiter: 응답에 따라 속도를 조절하는 토큰 버킷 (AIMD)
+#   - call_with_retry: 항목 단위 재시도 (지수 백오프 + 지터)
+#   - IngestionReport: 처리량(sections/sec), API 호출 수 등 집계
+#   - CACHE_DIR      : 적재 로컬 캐시 폴더 (페이지 캐시, 저널, 시그니처, 분류기 모델, 백필 상태)
+# =========================================
+CACHE_DIR = Path(os.getenv("INGEST_CACHE_DIR") or Path(__file__).resolve().parent / ".ingest_cache")
+
+
+class RateLimiter:
+    """
+    초당 rate_per_sec 회까지 허용하는 토큰 버킷.
+    burst 만큼은 순간적으로 몰아서 호출 가능.
+    """
+
+    def __init__(self, rate_per_sec: float, burst: Optional[int] = None):
+        if rate_per_sec <= 0:
+            raise ValueError("rate_per_sec는 0보다 커야 합니다.")
+        self.rate = rate_per_sec
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_sec)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """토큰이 생길 때까지 대기"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def record_success(self):
+        """호출 성공 알림 (고정 속도 limiter는 무시)"""
+
+    def record_failure(self, error: Exception):
+        """호출 실패 알림 (고정 속도 limiter는 무시)"""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / 할당량 초과 계열 에러인지 (google.api_core.exceptions.ResourceExhausted 등)"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(key in text for key in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    AIMD 속도 제어:
+      - 성공할 때마다 rate += increase (max_rate까지)
+      - 429/할당량 에러면 rate *= decrease (min_rate까지)
+        동시에 나간 요청들이 한꺼번에 실패해도 cooldown초 안에는 한 번만 줄임
+    고정 sleep 없이 실제 할당량 근처에서 속도가 유지됨.
+    """
+
+    def __init__(
+        self,
+        rate_per_sec: float,
+        min_rate: float = 0.2,
+        max_rate: float = 50.0,
+        increase: float = 0.2,
+        decrease: float = 0.5,
+        cooldown: float = 2.0,
+    ):
+        super().__init__(rate_per_sec, burst=max(1, int(rate_per_sec)))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.throttled = 0
+        self._last_decrease = 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.capacity = float(max(1, int(self.rate)))
+
+    def record_failure(self, error: Exception):
+        if not is_rate_limit_error(error):
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.capacity = float(max(1, int(self.rate)))
+            self.tokens = min(self.tokens, 0.0)
+
+
+def call_with_retry(
+    fn: Callable,
+    *args,
+    retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    limiter: Optional[RateLimiter] = None,
+    report: Optional["IngestionReport"] = None,
+    counter: Optional[str] = None,
+    **kwargs,
+):
+    """
+    fn(*args, **kwargs)를 최대 retries번 재시도.
+    limiter가 있으면 매 시도 전에 토큰을 받고 성공/실패를 알려줌 (AdaptiveRateLimiter 속도 조절),
+    report/counter가 있으면 호출 수를 집계.
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        if report and counter:
+            report.count(counter)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if limiter:
+                limiter.record_failure(e)
+            if report and is_rate_limit_error(e):
+                report.count("throttled")
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.8, 1.2)
+            if report:
+                report.count("retries")
+            print(f"  ⚠️ [재시도 {attempt + 1}/{retries}] {getattr(fn, '__name__', 'call')} 실패: {e} → {delay:.1f}초 후 재시도")
+            time.sleep(delay)
+        else:
+            if limiter:
+                limiter.record_success()
+            return result
+
+
+@dataclass
+class IngestionReport:
+    """적재 한 번의 처리량/호출 수 집계 (스레드 안전)"""
+    label: str = "ingestion"
+    sections: int = 0
+    failed: int = 0
+    counters: Dict[str, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def section_done(self, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.sections += 1
+            else:
+                self.failed += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def sections_per_sec(self) -> float:
+        return self.sections / self.elapsed
+
+    def print_summary(self):
+        print(f"📊 [{self.label}] sections={self.sections}, failed={self.failed}, "
+              f"elapsed={self.elapsed:.1f}s, {self.sections_per_sec:.2f} sections/sec")
+        if self.counters:
+            calls = ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items()))
+            print(f"   API 호출: {calls}")
@@ -0,0 +1,11 @@
+-- 섹션 내용 해시 (증분 재적재용)
+-- upload_manual.py가 새 버전 매뉴얼을 올릴 때 같은 model_id의 이전 버전과 해시를 비교해서
+-- 바뀌지 않은 섹션은 메타/임베딩을 재사용함.
+alter table manual_sections
+    add column if not exists content_hash text;
+
+create index if not exists manual_sections_manual_hash_idx
+    on manual_sections (manual_id, content_hash);
+
+create index if not exists manual_documents_model_version_idx
+    on manual_documents (model_id, version);
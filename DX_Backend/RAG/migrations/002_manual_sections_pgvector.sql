@@ -0,0 +1,49 @@
+-- 임베딩을 JSON 텍스트(embedding_vector) 대신 pgvector 컬럼(embedding)에 저장
+-- upload_manual.py / upload_manual_supabase.py 는 이 마이그레이션 이후 embedding 컬럼에만 씀.
+-- 순서: 1) 컬럼/인덱스 추가  2) 기존 행 변환  3) hybrid_search가 새 컬럼을 읽도록 교체
+--       4) 검색 확인 후 embedding_vector 삭제 (맨 아래, 수동 실행)
+create extension if not exists vector;
+
+alter table manual_sections
+    add column if not exists embedding vector(768);
+
+-- 2) 기존 행 변환: json.dumps 결과 "[0.1, 0.2, ...]"는 pgvector 텍스트 입력 형식과 같아서 바로 캐스팅됨
+--    행이 많으면 embedding_store.py migrate (section_id 순으로 나눠서 변환)로 대신 실행해도 됨
+update manual_sections
+   set embedding = embedding_vector::vector
+ where embedding is null
+   and embedding_vector is not null;
+
+create index if not exists manual_sections_embedding_hnsw_idx
+    on manual_sections using hnsw (embedding vector_cosine_ops);
+
+-- 3) hybrid_search: 벡터 점수를 embedding 컬럼에서 계산하도록 교체
+--    대시보드에서 만든 현재 정의(pg_get_functiondef)를 그대로 가져와 embedding_vector 참조만 embedding으로 바꿔 다시 생성
+--    → 파라미터/반환 컬럼/키워드 점수 방식은 그대로 (오버로드가 새로 생기거나 랭킹이 바뀌지 않음)
+--    적용 전후 확인: select pg_get_functiondef('public.hybrid_search'::regproc);
+do $$
+declare
+    n   int;
+    def text;
+begin
+    select count(*) into n
+      from pg_proc
+     where proname = 'hybrid_search'
+       and pronamespace = 'public'::regnamespace;
+    if n <> 1 then
+        raise exception 'public.hybrid_search 함수가 %개 있음 (1개여야 자동 교체 가능)', n;
+    end if;
+
+    def := pg_get_functiondef('public.hybrid_search'::regproc);
+    if def !~ 'embedding_vector' then
+        raise notice 'hybrid_search가 이미 embedding_vector를 읽지 않음 → 건너뜀';
+        return;
+    end if;
+    -- embedding_vector, embedding_vector::vector, embedding_vector::vector(768) → embedding
+    def := regexp_replace(def, 'embedding_vector(\s*::\s*(public\.)?vector(\(\d+\))?)?', 'embedding', 'g');
+    execute def;
+end;
+$$;
+
+-- 4) 검색 결과 확인 후 수동 실행 (텍스트 임베딩 컬럼 제거 → 저장 공간 회수)
+-- alter table manual_sections drop column embedding_vector;
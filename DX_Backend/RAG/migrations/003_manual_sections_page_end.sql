@@ -0,0 +1,8 @@
+-- 섹션이 걸쳐 있는 마지막 페이지 (페이지 경계를 넘는 청커, chunker.py)
+-- page_number는 시작 페이지, page_end는 끝 페이지. 예전 행은 page_number와 같게 채움.
+alter table manual_sections
+    add column if not exists page_end int;
+
+update manual_sections
+   set page_end = page_number
+ where page_end is null;
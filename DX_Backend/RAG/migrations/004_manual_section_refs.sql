@@ -0,0 +1,28 @@
+-- 근사 중복 섹션 참조 (dedup.py)
+-- 안전 경고/설치 안내처럼 여러 페이지·여러 모델에 반복되는 섹션은 대표 섹션 하나만 manual_sections에 저장하고,
+-- 다른 위치(매뉴얼/페이지)는 이 테이블에 대표 섹션을 가리키는 참조로만 남김.
+-- 대표 섹션은 참조가 남아 있으면 지울 수 없음 (on delete restrict):
+-- 다른 매뉴얼의 내용이 참조로만 남아 있으므로, 대표 섹션 매뉴얼을 재적재할 때는
+-- incremental.delete_stale_sections가 섹션을 참조하던 매뉴얼로 넘긴 뒤 지움.
+create table if not exists manual_section_refs (
+    ref_id      bigserial primary key,
+    section_id  bigint not null references manual_sections (section_id) on delete restrict,
+    manual_id   bigint not null references manual_documents (manual_id) on delete cascade,
+    page_number int,
+    page_end    int,
+    similarity  real,
+    created_at  timestamptz default now()
+);
+
+create index if not exists manual_section_refs_manual_idx
+    on manual_section_refs (manual_id);
+
+create index if not exists manual_section_refs_section_idx
+    on manual_section_refs (section_id);
+
+-- 예전 정의(on delete cascade)로 이미 만든 테이블도 restrict로 교체
+alter table manual_section_refs
+    drop constraint if exists manual_section_refs_section_id_fkey;
+alter table manual_section_refs
+    add constraint manual_section_refs_section_id_fkey
+    foreign key (section_id) references manual_sections (section_id) on delete restrict;
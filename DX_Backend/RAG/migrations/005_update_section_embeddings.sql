@@ -0,0 +1,28 @@
+-- 임베딩 일괄 갱신 RPC
+-- upload_manual_supabase.py(임베딩 백필) / embedding_store.py migrate 가 행마다 update를 보내는 대신
+-- 페이지(수백 행) 단위로 한 번에 호출함.
+--   items: [{"section_id": 1, "embedding": [0.1, ...]}, ...]
+--   target_column: 임베딩을 쓸 vector(768) 컬럼 (기본 embedding)
+-- upsert(on_conflict=section_id)는 NOT NULL 컬럼(content_text 등)을 전부 다시 보내야 해서 update 함수로 처리.
+create or replace function update_section_embeddings(
+    items jsonb,
+    target_column text default 'embedding'
+)
+returns integer
+language plpgsql
+as $$
+declare
+    updated integer;
+begin
+    execute format(
+        'update manual_sections s
+            set %I = (i.embedding)::vector
+           from jsonb_to_recordset($1) as i(section_id bigint, embedding text)
+          where s.section_id = i.section_id',
+        target_column
+    )
+    using items;
+    get diagnostics updated = row_count;
+    return updated;
+end;
+$$;
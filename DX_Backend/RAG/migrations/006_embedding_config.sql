@@ -0,0 +1,87 @@
+-- 임베딩 모델 blue/green 전환 (reembed.py, embedding_config.py)
+-- manual_sections에 임베딩 컬럼 슬롯 두 개(embedding / embedding_next)를 두고,
+-- 어느 슬롯을 검색에 쓰는지는 embedding_config 한 줄(id=1)로 정함.
+-- 순서: 1) reembed.py prepare  → shadow 슬롯 컬럼을 새 차원으로 다시 만듦
+--       2) reembed.py backfill → 새 모델로 shadow 컬럼 채움 (검색은 계속 기존 컬럼)
+--       3) reembed.py verify   → 채움 비율/샘플 질의 recall 비교
+--       4) reembed.py flip     → embedding_config update 한 번으로 전환 (이전 설정은 previous에 보관)
+create table if not exists embedding_config (
+    id              int primary key default 1 check (id = 1),
+    model           text not null,
+    dim             int not null,
+    column_name     text not null check (column_name in ('embedding', 'embedding_next')),
+    search_function text not null,
+    pending         jsonb,  -- prepare 이후 채우는 중인 shadow 설정 {model, dim, column_name, search_function}
+    previous        jsonb,  -- 전환 직전 설정 (rollback용)
+    updated_at      timestamptz default now()
+);
+
+insert into embedding_config (id, model, dim, column_name, search_function)
+values (1, 'models/text-embedding-004', 768, 'embedding', 'hybrid_search')
+on conflict (id) do nothing;
+
+alter table manual_sections
+    add column if not exists embedding_next vector(768);
+
+-- hybrid_search_next: 현재 hybrid_search 정의(002 적용 후)를 그대로 복사해서 embedding 참조만 embedding_next로 바꿈
+-- → 파라미터/반환 컬럼/키워드 점수 방식이 같아서 verify의 recall 비교가 벡터 컬럼 차이만 반영함
+-- query_embedding 차원은 prepare_embedding_slot으로 만든 컬럼 차원을 따르도록 vector(n) → vector
+-- (hybrid_search 정의를 바꾸면 이 블록을 다시 실행할 것)
+do $$
+declare
+    n   int;
+    def text;
+begin
+    select count(*) into n
+      from pg_proc
+     where proname = 'hybrid_search'
+       and pronamespace = 'public'::regnamespace;
+    if n <> 1 then
+        raise exception 'public.hybrid_search 함수가 %개 있음 (1개여야 복사 가능)', n;
+    end if;
+
+    def := pg_get_functiondef('public.hybrid_search'::regproc);
+    if def ~ 'embedding_vector' then
+        raise exception 'hybrid_search가 아직 embedding_vector를 읽음 (002 먼저 적용)';
+    end if;
+    def := regexp_replace(def, 'FUNCTION public\.hybrid_search\(', 'FUNCTION public.hybrid_search_next(');
+    def := regexp_replace(def, '\membedding\M', 'embedding_next', 'g');
+    def := regexp_replace(def, 'vector\(\d+\)', 'vector', 'g');
+    execute def;
+end;
+$$;
+
+-- shadow 슬롯 준비: 컬럼을 vector(dim)으로 다시 만들고 HNSW 인덱스 생성
+-- 현재 검색에 쓰는 컬럼은 거부함 (전환 전 실수로 지우지 않게)
+-- hnsw 인덱스는 2000차원까지만 지원 → 그보다 크면 인덱스 없이 만들어짐
+create or replace function prepare_embedding_slot(
+    target_column text,
+    dim int
+)
+returns void
+language plpgsql
+as $$
+declare
+    active text;
+begin
+    if target_column not in ('embedding', 'embedding_next') then
+        raise exception 'unknown embedding column: %', target_column;
+    end if;
+    select column_name into active from embedding_config where id = 1;
+    if target_column = coalesce(active, 'embedding') then
+        raise exception 'column % is active for search', target_column;
+    end if;
+
+    execute format('alter table manual_sections drop column if exists %I', target_column);
+    execute format('alter table manual_sections add column %I vector(%s)', target_column, dim);
+    if dim <= 2000 then
+        execute format(
+            'create index %I on manual_sections using hnsw (%I vector_cosine_ops)',
+            'manual_sections_' || target_column || '_hnsw_idx',
+            target_column
+        );
+    end if;
+    -- PostgREST 스키마 캐시 갱신 (select/update에서 새 컬럼 인식)
+    perform pg_notify('pgrst', 'reload schema');
+end;
+$$;
@@ -0,0 +1,14 @@
+-- 카테고리를 누가 붙였는지 (heuristic_classifier.py 학습 데이터 선별용)
+-- 'llm'    : Gemini 분류 결과 → 로컬 분류기는 이 행만으로 학습
+-- 'local'  : 로컬 분류기(키워드 규칙 + TF-IDF) 결과
+-- 'forced' : 에러 표 등 적재 코드가 직접 정한 값
+alter table manual_sections
+    add column if not exists category_source text;
+
+-- 기존 행: 로컬 분류기 도입 전에는 에러 표('error' 고정) 외 카테고리는 모두 Gemini가 붙였음
+update manual_sections
+   set category_source = case when category = 'error' then 'forced' else 'llm' end
+ where category_source is null;
+
+create index if not exists manual_sections_category_source_idx
+    on manual_sections (category_source);
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 import time
 import subprocess
+import sqlite3
 import sys
 import re
 import pathlib
@@ -17,6 +18,8 @@ import google.generativeai as genai
 from google.api_core import exceptions
 from google.api_core.exceptions import ResourceExhausted
 
+from embedding_config import EmbeddingConfig, get_embedding_config
+
 # ==========================================
 # 1. 환경 설정 및 초기화
 # ==========================================
@@ -52,7 +55,7 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 genai.configure(api_key=GOOGLE_API_KEY)
 
 # 모델 설정 (최신 모델 적용)
-EMBEDDING_MODEL = "models/text-embedding-004"
+# 임베딩 모델/차원/검색 함수는 DB의 embedding_config에서 읽음 (embedding_config.py, reembed.py로 전환)
 # 만약 2.5 접근 권한이 있으시면 "gemini-2.5-flash"로 바꾸세요.
 GENERATION_MODEL_ID = "gemini-2.5-flash" 
 GENERATION_MODEL = genai.GenerativeModel(GENERATION_MODEL_ID)
@@ -86,12 +89,13 @@ def save_to_firebase(user_id: str, sender: str, text: str, room_id: Optional[str
         import traceback
         traceback.print_exc()
 
-def get_embedding(text: str):
+def get_embedding(text: str, config: EmbeddingConfig):
     try:
         result = genai.embed_content(
-            model=EMBEDDING_MODEL,
+            model=config.model,
             content=text,
-            task_type="retrieval_query"
+            task_type="retrieval_query",
+            output_dimensionality=config.dim,
         )
         return result['embedding']
     except Exception as e:
@@ -302,12 +306,14 @@ async def chat_endpoint(req: ChatRequest):
         print(f"✨ [쿼리 확장] '{req.user_message}' -> '{search_keyword}'")
 
         # 3. 임베딩 생성 (벡터 검색용)
-        query_vector = get_embedding(search_keyword)
+        # 질의 임베딩 모델과 검색 함수(컬럼)는 같은 설정 스냅샷에서 꺼냄 (모델 전환 중에도 어긋나지 않게)
+        embedding_config = get_embedding_config(supabase)
+        query_vector = get_embedding(search_keyword, embedding_config)
         if not query_vector: raise Exception("임베딩 실패")
 
         # 🔥 [핵심] 하이브리드 검색 RPC 호출
-        # (Supabase에 hybrid_search 함수가 만들어져 있어야 함)
-        rpc_response = supabase.rpc("hybrid_search", {
+        # (Supabase에 hybrid_search / hybrid_search_next 함수가 만들어져 있어야 함)
+        rpc_response = supabase.rpc(embedding_config.search_function, {
             "query_text": search_keyword,    # 텍스트 매칭용
             "query_embedding": query_vector, # 의미 검색용
             "match_threshold": 0.1,          # 기준 점수
@@ -430,12 +436,40 @@ async def chat_endpoint(req: ChatRequest):
 
 # --- 비디오 상태 확인용 글로벌 변수 ---
 # 실제로는 DB나 Redis를 써야 하지만, 간단한 데모를 위해 메모리에 상태 저장
-# key: video_id (또는 user_id), value: {'status': '...', 'url': '...'}
+# key: room_id (없으면 'demo_video'), value: {'status', 'room_id', 'started_at', 'process'}
 video_generation_status = {}
-_initial_mp4_count = None  # /generate/assets_generate 폴더의 초기 mp4 개수 기록용
+_last_video_key = None  # 가장 최근 /generate-video 요청의 key (room_id 없이 상태를 물을 때 사용)
+
+# generate.py의 OperationManager가 진행률을 기록하는 job registry (generate/.video_state/operations.db)
+sys.path.append(str(Path(__file__).parent.parent / "generate"))
+
+
+def find_requested_video_job(room_id: Optional[str], started_at: float) -> Optional[dict]:
+    """
+    /generate-video 요청 이후 registry에 등록된 작업 (room_id가 있으면 그 방의 작업만).
+    조회만 하므로 JobRegistry(테이블 생성/WAL 설정) 대신 읽기 전용 연결을 씀.
+    아직 generate.py가 작업을 등록하기 전이면 None.
+    """
+    from operation_manager import OPERATIONS_DB_PATH
+    if not OPERATIONS_DB_PATH.exists():
+        return None
+    conn = sqlite3.connect(f"file:{OPERATIONS_DB_PATH.as_posix()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        query = "SELECT * FROM operations WHERE submitted_at >= ?"
+        params = [started_at]
+        if room_id:
+            query += " AND session_id = ?"
+            params.append(room_id)
+        row = conn.execute(query + " ORDER BY submitted_at DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
 
 @app.post("/generate-video")
-async def generate_video_endpoint():
+async def generate_video_endpoint(room_id: Optional[str] = None):
+    global _last_video_key
+    key = room_id or 'demo_video'
     try:
         # Current file directory: lgdx_backend/RAG
         current_dir = Path(__file__).parent
@@ -447,60 +481,70 @@ async def generate_video_endpoint():
         if not script_path.exists():
              raise HTTPException(status_code=404, detail=f"Script not found at {script_path}")
 
-        # 상태를 'processing'으로 설정
-        # 실제 앱에서는 user_id 등을 받아야 함. 여기선 'demo_video'라는 고정 ID 사용
-        video_generation_status['demo_video'] = {'status': 'processing'}
-
-        # 시작 시점에 mp4 파일 개수 기록
-        global _initial_mp4_count
-        assets_dir = current_dir.parent / "generate" / "assets_generate"
-        assets_dir.mkdir(exist_ok=True)
-        _initial_mp4_count = len(list(assets_dir.glob("*.mp4")))
-
         # Run the script asynchronously using subprocess
-        # 스크립트가 완료되면 파일을 생성하거나 DB를 업데이트한다고 가정
-        # 여기서는 단순히 스크립트를 실행하고, 폴링 시 파일 존재 여부를 확인할 수도 있음
-        subprocess.Popen([sys.executable, str(script_path)])
+        # room_id를 넘기면 generate.py가 전체 메시지 검색 없이 해당 방의 최근 대화만 읽음
+        cmd = [sys.executable, str(script_path)]
+        if room_id:
+            cmd.append(room_id)
+
+        # 상태를 'processing'으로 설정 (요청 시각 이후 registry에 등록된 작업이 이 요청의 작업)
+        video_generation_status[key] = {
+            'status': 'processing',
+            'room_id': room_id,
+            'started_at': time.time(),
+            'process': subprocess.Popen(cmd),
+        }
+        _last_video_key = key
         
-        return {"status": "started", "message": "Video generation started in background"}
+        return {"status": "started", "message": "Video generation started in background", "room_id": room_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ 실행 실패: {e}")
-        video_generation_status['demo_video'] = {'status': 'failed'}
+        video_generation_status[key] = {'status': 'failed'}
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/check-video-status")
-async def check_video_status():
+async def check_video_status(room_id: Optional[str] = None):
     """
-    assets_generate 폴더의 mp4 개수를 관찰하여
-    초기 개수 대비 1개 이상 증가하면 생성 완료로 판단.
+    /generate-video 요청(room_id, 없으면 가장 최근 요청)으로 생긴 작업을 registry에서 찾아 상태 반환.
+    - 작업이 아직 등록되지 않았으면 processing (진행률 0)
+    - 작업이 다운로드까지 끝나면 그 작업의 output_path 파일을 결과로 반환
+      (폴더의 최신 mp4를 보지 않으므로 다른 방의 복구된 영상과 섞이지 않음)
     """
     try:
-        base_dir = Path(__file__).parent.parent / "generate" / "assets_generate"
-        if not base_dir.exists():
-            return {"status": "processing"}
-
-        mp4_files = list(base_dir.glob("*.mp4"))
-        current_count = len(mp4_files)
-
-        global _initial_mp4_count
-        if _initial_mp4_count is None:
-            # generate-video가 먼저 호출되지 않은 경우 대비해서 초기값 설정
-            _initial_mp4_count = current_count
-            return {"status": "processing"}
-
-        if current_count <= _initial_mp4_count:
-            return {"status": "processing"}
-
-        # 개수가 증가했으면 가장 최신 파일을 완료된 결과로 간주
-        latest_file = max(mp4_files, key=os.path.getctime)
-        size = os.path.getsize(latest_file)
-        created_at_iso = datetime.fromtimestamp(os.path.getmtime(latest_file)).isoformat()
+        request = video_generation_status.get(room_id or _last_video_key or 'demo_video')
+        if not request:
+            return {"status": "processing", "progress": 0}
+        if request['status'] == 'failed':
+            return {"status": "failed"}
+
+        from operation_manager import STATUS_DOWNLOADED
+        from video_providers import STATUS_FAILED
+        job = find_requested_video_job(request['room_id'], request['started_at'])
+
+        if job is None:
+            # 작업 등록 전에 generate.py가 끝났으면 (프롬프트 생성 실패 등) 실패
+            if request['process'].poll() is not None:
+                request['status'] = 'failed'
+                return {"status": "failed"}
+            return {"status": "processing", "progress": 0}
+
+        if job["status"] == STATUS_FAILED:
+            return {"status": "failed", "error": job.get("error")}
+
+        output = Path(job["output_path"] or "")
+        if job["status"] != STATUS_DOWNLOADED or not output.exists():
+            if request['process'].poll() is not None:
+                # 프로세스는 끝났는데 작업이 남음 → 다음 실행이 이어받음, 이번 요청은 실패 처리
+                return {"status": "failed", "progress": int(job["progress"] or 0)}
+            return {"status": "processing", "progress": int(job["progress"] or 0)}
 
         return {
             "status": "completed",
-            "video_url": f"/assets/{latest_file.name}",
-            "video_created_at": created_at_iso,
-            "video_size": size,
+            "video_url": f"/assets/{output.name}",
+            "video_created_at": datetime.fromtimestamp(os.path.getmtime(output)).isoformat(),
+            "video_size": os.path.getsize(output),
         }
 
     except Exception as e:
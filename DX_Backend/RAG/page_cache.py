@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from ingest_utils import CACHE_DIR
+
+
+# =========================================
+# 페이지 캐시 (로컬 SQLite)
+#   - 키: (페이지 내용 해시, 추출기 버전)
+#   - 값: 추출한 텍스트, 에러표 여부, 파싱한 표 row (로컬 파싱 또는 Vision 결과)
+#   - 같은 PDF를 다시 돌리거나 새 버전에서 안 바뀐 페이지는 텍스트 추출/Vision 호출 없이 바로 사용
+#   - 추출/파싱 로직이나 Vision 프롬프트를 바꾸면 버전 문자열을 올려서 무효화
+#   워커 프로세스마다 각자 연결을 열어서 씀 (WAL + busy timeout)
+# =========================================
+PAGE_CACHE_PATH = CACHE_DIR / "page_cache.db"
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+
+
+def page_content_hash(page) -> str:
+    """
+    pdfplumber page의 원본 content stream + 페이지 크기/회전으로 해시.
+    (텍스트 추출/레이아웃 분석 없이 계산되므로 빠름)
+    폰트/이미지 리소스만 바뀌고 content stream이 같은 페이지는 같은 해시로 봄.
+    """
+    h = hashlib.sha256()
+    page_obj = page.page_obj
+    h.update(repr((tuple(page.bbox), getattr(page, "rotation", 0))).encode("utf-8"))
+    contents = page_obj.contents or []
+    for stream in contents if isinstance(contents, list) else [contents]:
+        try:
+            h.update(stream.get_data())
+        except Exception:
+            h.update(repr(stream).encode("utf-8"))
+    return h.hexdigest()
+
+
+class PageCache:
+    def __init__(self, db_path: Union[str, Path] = PAGE_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                page_hash  TEXT NOT NULL,
+                version    TEXT NOT NULL,
+                payload    TEXT NOT NULL,
+                updated_at REAL,
+                PRIMARY KEY (page_hash, version)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, page_hash: Optional[str], version: str) -> Optional[Dict]:
+        if not page_hash:
+            return None
+        row = self.conn.execute(
+            "SELECT payload FROM pages WHERE page_hash = ? AND version = ?",
+            (page_hash, version),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, page_hash: Optional[str], version: str, payload: Dict):
+        if not page_hash:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (page_hash, version, payload, updated_at) VALUES (?, ?, ?, ?)",
+            (page_hash, version, json.dumps(payload, ensure_ascii=False), time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
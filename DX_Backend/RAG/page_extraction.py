@@ -0,0 +1,336 @@
+import os
+import importlib.util
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pdfplumber
+
+from table_parsing import extract_error_rows
+from image_compact import render_table_image
+from page_cache import PageCache, PAGE_CACHE_ENABLED, page_content_hash
+
+
+# =========================================
+# PDF 페이지 추출 (멀티 프로세스)
+#   - extract_text() / to_image()는 CPU 작업이라 프로세스 풀로 나눠서 처리
+#   - 워커마다 PDF를 직접 열고 페이지 범위 하나를 담당 → 결과는 페이지 순서대로 합침
+#   - 워커는 API를 부르지 않음: 에러코드 표 페이지는 이미지 바이트만 만들어 돌려주고
+#     Vision 파싱은 메인 프로세스에서 처리
+#   - 텍스트 백엔드 교체 가능 (PDF_TEXT_BACKEND)
+#       "pdfium"    : pypdfium2 (빠름) → 일반 페이지용
+#       "pdfplumber": 느리지만 표 레이아웃 보존이 나음
+#     어떤 백엔드를 쓰든 에러코드 표 페이지는 pdfplumber로 다시 열어 처리
+#   - 에러코드 표는 먼저 extract_tables로 로컬 파싱(table_rows), 구조 인식에 실패한 페이지만 이미지 렌더링
+#     헤더 없이 다음 페이지로 이어지는 표는 직전 페이지의 열 매핑(table_mapping)으로 파싱
+#     (범위 첫 페이지면 앞 페이지를 TABLE_LOOKBACK_PAGES까지 거슬러 올라가 매핑을 찾음)
+#   - 페이지 캐시(page_cache.py): 내용 해시가 같은 페이지는 추출/Vision 결과를 그대로 사용
+# =========================================
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pdfium")
+MIN_PAGES_PER_TASK = 4
+MAX_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))  # 워커 결과를 메모리에 들고 있는 단위
+TABLE_LOOKBACK_PAGES = 3
+
+# 캐시 버전: 텍스트 추출/표 파싱 로직을 바꾸면 EXTRACTOR_VERSION,
+#            parse_error_table_with_gemini 프롬프트를 바꾸면 VISION_CACHE_VERSION을 올릴 것
+EXTRACTOR_VERSION = "2"
+VISION_CACHE_VERSION = "vision:1"
+
+
+def extractor_version(backend: str) -> str:
+    return f"{backend}:{EXTRACTOR_VERSION}"
+
+
+def is_error_table_page(raw_text: str) -> bool:
+    """
+    이 페이지가 '고장 신고 전 확인 사항' 에러코드 표인지 판별하는 간단한 규칙.
+    필요하면 키워드 추가/수정해서 쓰면 됨.
+    """
+    keywords = ["고장 신고 전 확인 사항", "표시부 알림", "해결책", "원인"]
+    return any(k in raw_text for k in keywords)
+
+
+class TextBackend:
+    """페이지 텍스트 추출기 공통 인터페이스 (with 문으로 열고 닫음)"""
+    name = "base"
+    requires: Optional[str] = None  # 따로 설치해야 하는 모듈 (없으면 pdfplumber로 대체)
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def text(self, index: int) -> str:
+        """0부터 시작하는 페이지 index의 텍스트"""
+        raise NotImplementedError
+
+    def release(self, index: int):
+        """페이지 처리 후 캐시 해제 (메모리 유지용)"""
+        pass
+
+    def close(self):
+        pass
+
+
+class PdfplumberBackend(TextBackend):
+    name = "pdfplumber"
+
+    def __init__(self, pdf_path: str):
+        super().__init__(pdf_path)
+        self.pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self) -> int:
+        return len(self.pdf.pages)
+
+    def page(self, index: int):
+        return self.pdf.pages[index]
+
+    def text(self, index: int) -> str:
+        return (self.page(index).extract_text() or "").strip()
+
+    def release(self, index: int):
+        # pdfplumber는 페이지마다 chars/objects/layout 캐시를 들고 있어서 안 비우면 페이지 수만큼 쌓임
+        page = self.pdf.pages[index]
+        if hasattr(page, "close"):
+            page.close()
+        else:
+            page.flush_cache()
+
+    def close(self):
+        self.pdf.close()
+
+
+class PdfiumBackend(TextBackend):
+    name = "pdfium"
+    requires = "pypdfium2"
+
+    def __init__(self, pdf_path: str):
+        super().__init__(pdf_path)
+        import pypdfium2 as pdfium
+        self.pdf = pdfium.PdfDocument(pdf_path)
+
+    def __len__(self) -> int:
+        return len(self.pdf)
+
+    def text(self, index: int) -> str:
+        page = self.pdf[index]
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_bounded()
+        finally:
+            textpage.close()
+            page.close()
+        return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+    def close(self):
+        self.pdf.close()
+
+
+BACKENDS = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PdfiumBackend.name: PdfiumBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _module_available(module: str) -> bool:
+    if importlib.util.find_spec(module) is None:
+        print(f"⚠️ {module}가 설치되어 있지 않아 해당 백엔드 대신 pdfplumber를 씁니다")
+        return False
+    return True
+
+
+def resolve_backend(name: str) -> str:
+    """실제로 쓸 백엔드 이름. 필요한 모듈이 없으면 pdfplumber (캐시 버전도 이 이름으로 만들어야 함)"""
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 PDF 텍스트 백엔드: {name} (가능: {', '.join(BACKENDS)})")
+    requires = BACKENDS[name].requires
+    if requires and not _module_available(requires):
+        return PdfplumberBackend.name
+    return name
+
+
+def open_backend(name: str, pdf_path: str) -> TextBackend:
+    """이름으로 백엔드 열기. 필요한 모듈이 없으면 pdfplumber로 대체 (doc.name이 실제 백엔드)"""
+    return BACKENDS[resolve_backend(name)](pdf_path)
+
+
+def _extract_one(
+    doc: TextBackend,
+    plumber: PdfplumberBackend,
+    idx: int,
+    mapping: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """
+    페이지 하나 추출: {raw_text, is_error_table, table_rows, table_mapping} (캐시에 그대로 저장되는 값)
+    mapping: 직전 페이지 표의 열 매핑 (헤더 없이 이어지는 표용)
+    """
+    raw_text = doc.text(idx)
+    is_error = is_error_table_page(raw_text)
+    table_rows = table_mapping = None
+    if is_error:
+        # 표가 있는 페이지는 pdfplumber로
+        if plumber is not doc:
+            raw_text = plumber.text(idx)
+        table_rows, table_mapping = extract_error_rows(plumber.page(idx), mapping)
+    return {"raw_text": raw_text, "is_error_table": is_error, "table_rows": table_rows, "table_mapping": table_mapping}
+
+
+def _lookback_mapping(plumber: PdfplumberBackend, start: int) -> Optional[Dict[str, int]]:
+    """범위 첫 페이지용: 바로 앞 에러표 페이지들에서 열 매핑을 찾음 (중간에 일반 페이지가 나오면 없음)"""
+    for idx in range(start - 1, max(-1, start - 1 - TABLE_LOOKBACK_PAGES), -1):
+        try:
+            if not is_error_table_page(plumber.text(idx)):
+                return None
+            _, mapping = extract_error_rows(plumber.page(idx))
+        finally:
+            plumber.release(idx)
+        if mapping:
+            return mapping
+    return None
+
+
+def _mapping_version(version: str, mapping: Optional[Dict[str, int]]) -> str:
+    """이어받은 매핑에 따라 파싱 결과가 달라지므로 캐시 버전에 매핑을 포함"""
+    if not mapping:
+        return version
+    return version + ":" + ",".join(f"{k}={v}" for k, v in sorted(mapping.items()))
+
+
+def extract_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    backend: Optional[str] = None,
+    use_cache: Optional[bool] = None,
+) -> List[Dict]:
+    """
+    [start, end) 페이지(0부터)를 처리해서
+    [{page_number, page_hash, raw_text, is_error_table, table_rows, image, image_mime, cached}, ...] 반환.
+    일반 페이지는 backend 텍스트 그대로.
+    에러코드 표 페이지는 pdfplumber 텍스트 + 로컬 파싱한 table_rows,
+    로컬 파싱에 실패했고 Vision 결과 캐시도 없을 때만 Vision용 압축 이미지(image, image_mime).
+    """
+    backend = resolve_backend(backend or PDF_TEXT_BACKEND)
+    version = extractor_version(backend)
+    cache = PageCache() if (PAGE_CACHE_ENABLED if use_cache is None else use_cache) else None
+
+    records: List[Dict] = []
+    plumber = PdfplumberBackend(pdf_path)   # 페이지 해시/표 처리용 (열기만 하면 가벼움)
+    doc: Optional[TextBackend] = None       # 텍스트 백엔드는 캐시 miss가 나야 엶
+    carried: Optional[Dict[str, int]] = None  # 직전 페이지 표의 열 매핑
+
+    def load(idx: int, page_hash: Optional[str], mapping: Optional[Dict[str, int]]) -> Tuple[Dict, bool]:
+        nonlocal doc
+        page_version = _mapping_version(version, mapping)
+        extracted = cache.get(page_hash, page_version) if cache else None
+        if extracted is not None:
+            return extracted, True
+        if doc is None:
+            doc = plumber if backend == PdfplumberBackend.name else BACKENDS[backend](pdf_path)
+        extracted = _extract_one(doc, plumber, idx, mapping)
+        if cache:
+            cache.put(page_hash, page_version, extracted)
+        return extracted, False
+
+    try:
+        for idx in range(start, min(end, len(plumber))):
+            page_hash = page_content_hash(plumber.page(idx)) if cache else None
+            extracted, cached = load(idx, page_hash, carried)
+            if idx == start > 0 and extracted["is_error_table"] and not extracted["table_rows"]:
+                # 범위 경계에서 끊긴 표일 수 있음 → 앞 페이지 매핑으로 다시 시도
+                carried = _lookback_mapping(plumber, start)
+                if carried:
+                    extracted, cached = load(idx, page_hash, carried)
+            carried = extracted.get("table_mapping")
+
+            record = {
+                "page_number": idx + 1,
+                "page_hash": page_hash,
+                **extracted,
+                "image": None,
+                "image_mime": None,
+                "cached": cached,
+            }
+            if record["is_error_table"] and not record["table_rows"]:
+                vision = cache.get(page_hash, VISION_CACHE_VERSION) if cache else None
+                if vision:
+                    record["table_rows"] = vision["table_rows"]
+                else:
+                    record["image"], record["image_mime"] = render_table_image(plumber.page(idx))
+            records.append(record)
+
+            plumber.release(idx)
+            if doc is not None and doc is not plumber:
+                doc.release(idx)
+    finally:
+        if doc is not None and doc is not plumber:
+            doc.close()
+        plumber.close()
+        if cache:
+            cache.close()
+    return records
+
+
+def count_pages(pdf_path: str, backend: Optional[str] = None) -> int:
+    with open_backend(backend or PDF_TEXT_BACKEND, pdf_path) as doc:
+        return len(doc)
+
+
+def split_page_ranges(
+    total: int,
+    workers: int,
+    min_pages: int = MIN_PAGES_PER_TASK,
+    max_pages: int = MAX_PAGES_PER_TASK,
+) -> List[Tuple[int, int]]:
+    """
+    페이지 [0, total)을 범위 여러 개로 나눔.
+    워커당 2개 정도씩 돌아가게 잘라서, 에러표 페이지(렌더링이 무거움)가 몰린 범위가 있어도 덜 기다리게 함.
+    범위 하나는 max_pages를 넘지 않음 (긴 매뉴얼이어도 한 번에 들고 있는 페이지 수 제한).
+    """
+    if total <= 0:
+        return []
+    tasks = max(1, min(workers * 2, total // max(1, min_pages)))
+    size = min(-(-total // tasks), max(1, max_pages))
+    return [(s, min(s + size, total)) for s in range(0, total, size)]
+
+
+def iter_pages(pdf_path: str, workers: Optional[int] = None, backend: Optional[str] = None) -> Iterator[Dict]:
+    """
+    PDF 페이지를 페이지 순서대로 하나씩 yield (workers<=1이면 현재 프로세스에서 처리).
+    프로세스 풀은 동시에 workers*2개 범위까지만 제출 → 소비하는 쪽이 느려도 결과가 쌓이지 않음.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    total = count_pages(pdf_path, backend)
+    ranges = split_page_ranges(total, max(1, workers))
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield from extract_page_range(pdf_path, start, end, backend)
+        return
+
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        pending = deque()
+        next_range = 0
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(extract_page_range, pdf_path, start, end, backend))
+                next_range += 1
+            # 제출한 순서(=페이지 순서)대로 꺼냄
+            yield from pending.popleft().result()
+
+
+def extract_pages(pdf_path: str, workers: Optional[int] = None, backend: Optional[str] = None) -> List[Dict]:
+    """PDF 전체 페이지를 페이지 순서대로 리스트로 추출"""
+    return list(iter_pages(pdf_path, workers, backend))
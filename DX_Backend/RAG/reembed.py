@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from embedding_batch import embed_texts
+from embedding_codec import to_db_vector
+from embedding_config import (
+    CONFIG_TABLE,
+    EmbeddingConfig,
+    config_for_slot,
+    config_from_row,
+    describe,
+    invalidate_embedding_config,
+)
+from ingest_utils import AdaptiveRateLimiter, IngestionReport
+from upload_manual_supabase import BACKFILL_CONCURRENCY, backfill_embeddings, get_supabase
+
+
+# =========================================
+# 임베딩 모델 blue/green 전환 (migrations/006_embedding_config.sql)
+#   python reembed.py status
+#   python reembed.py prepare --model models/gemini-embedding-001 --dim 768
+#   python reembed.py backfill [--rps 1] [--max-rps 5]
+#   python reembed.py verify [--queries queries.json] [--sample 50] [--top-k 5]
+#   python reembed.py flip [--force]
+#   python reembed.py rollback
+#   - 검색은 전환 전까지 계속 현재 컬럼(blue)을 읽고, 새 모델 임베딩은 다른 슬롯(green)에 채움
+#   - 새 모델 설정은 embedding_config.pending에 보관 → backfill/verify/flip이 같은 값을 씀
+#   - flip: 마지막으로 빈 행을 채운 뒤 embedding_config 한 줄 update (모델/차원/컬럼/검색 함수가 같이 바뀜)
+#     질의 서버는 EMBEDDING_CONFIG_TTL초 안에 새 설정을 읽고, 적재/백필 데몬도 새 컬럼으로 넘어감
+#   - rollback: 이전 설정(previous)으로 되돌림. 전환 후 새로 적재된 행은 예전 컬럼에 먼저 채우고 되돌림
+#     (전환 후 다시 prepare 하면 예전 컬럼이 지워지므로 rollback 불가)
+# =========================================
+SECTIONS_TABLE = "manual_sections"
+
+# 재임베딩은 라이브 적재와 같은 할당량을 쓰므로 낮은 속도에서 시작하고 상한도 낮게 둠
+REEMBED_RPS = float(os.getenv("REEMBED_RPS", "1"))
+REEMBED_MAX_RPS = float(os.getenv("REEMBED_MAX_RPS", "5"))
+
+# 전환 조건: green 채움 비율 ≥ MIN_COVERAGE, green recall ≥ blue recall - RECALL_TOLERANCE
+MIN_COVERAGE = float(os.getenv("REEMBED_MIN_COVERAGE", "0.999"))
+RECALL_TOLERANCE = float(os.getenv("REEMBED_RECALL_TOLERANCE", "0.02"))
+VERIFY_SAMPLE = 50
+VERIFY_TOP_K = 5
+
+
+# =========================================
+# 1. embedding_config 읽기/쓰기
+# =========================================
+def read_state(client) -> Tuple[EmbeddingConfig, Optional[EmbeddingConfig], Optional[EmbeddingConfig]]:
+    """(현재 설정, pending, previous)"""
+    res = client.table(CONFIG_TABLE) \
+        .select("model, dim, column_name, search_function, pending, previous") \
+        .eq("id", 1) \
+        .limit(1) \
+        .execute()
+    if not res.data:
+        raise RuntimeError(f"{CONFIG_TABLE} 행이 없습니다 (migrations/006_embedding_config.sql 적용 필요)")
+    row = res.data[0]
+    return config_from_row(row), config_from_row(row.get("pending")), config_from_row(row.get("previous"))
+
+
+def write_state(client, values: Dict):
+    client.table(CONFIG_TABLE) \
+        .update({**values, "updated_at": datetime.now(timezone.utc).isoformat()}) \
+        .eq("id", 1) \
+        .execute()
+    invalidate_embedding_config()
+
+
+def require_pending(client) -> Tuple[EmbeddingConfig, EmbeddingConfig]:
+    current, pending, _ = read_state(client)
+    if pending is None:
+        raise RuntimeError("준비된 새 모델이 없습니다. 먼저 prepare --model --dim 을 실행하세요.")
+    return current, pending
+
+
+# =========================================
+# 2. 채움 비율
+# =========================================
+def count_sections(client, column: Optional[str] = None) -> int:
+    """내용이 있는 행 수 (column을 주면 그 컬럼에 임베딩이 있는 행만)"""
+    query = client.table(SECTIONS_TABLE) \
+        .select("section_id", count="exact") \
+        .not_.is_("content_text", "null")
+    if column:
+        query = query.not_.is_(column, "null")
+    return query.limit(1).execute().count or 0
+
+
+def coverage(client, current: EmbeddingConfig, pending: EmbeddingConfig) -> Dict:
+    """green이 blue만큼 채워졌는지 (짧은/빈 내용 행은 양쪽 다 비어 있으므로 blue 기준으로 비교)"""
+    total = count_sections(client)
+    blue = count_sections(client, current.column)
+    green = count_sections(client, pending.column)
+    return {
+        "total": total,
+        "blue": blue,
+        "green": green,
+        "ratio": green / blue if blue else 1.0,
+    }
+
+
+# =========================================
+# 3. 샘플 질의 recall (blue vs green)
+#   - --queries: [{"query": "...", "expected_section_ids": [1, 2]}, ...]
+#   - 없으면 section_title로 질의를 만들고 같은 제목의 섹션들을 정답으로 씀
+# =========================================
+def load_queries(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        queries = json.load(f)
+    return [q for q in queries if q.get("query") and q.get("expected_section_ids")]
+
+
+def sample_title_queries(client, n: int, seed: int = 0, scan: int = 2000) -> List[Dict]:
+    rows = client.table(SECTIONS_TABLE) \
+        .select("section_id, section_title") \
+        .not_.is_("section_title", "null") \
+        .order("section_id") \
+        .limit(scan) \
+        .execute().data or []
+    by_title: Dict[str, List[int]] = {}
+    for row in rows:
+        title = (row["section_title"] or "").strip()
+        if len(title) >= 2:
+            by_title.setdefault(title, []).append(row["section_id"])
+    titles = sorted(by_title)
+    random.Random(seed).shuffle(titles)
+    return [{"query": t, "expected_section_ids": by_title[t]} for t in titles[:n]]
+
+
+def search_ids(client, config: EmbeddingConfig, queries: List[str], top_k: int, limiter, report) -> List[List[int]]:
+    """config의 모델로 질의 임베딩 → config의 검색 함수로 top_k section_id"""
+    vectors = embed_texts(
+        queries,
+        task_type="retrieval_query",
+        limiter=limiter,
+        report=report,
+        model=config.model,
+        output_dim=config.dim,
+    )
+    results = []
+    for query, vector in zip(queries, vectors):
+        if not vector:
+            results.append([])
+            continue
+        rows = client.rpc(config.search_function, {
+            "query_text": query,
+            "query_embedding": to_db_vector(vector, config.dim),
+            "match_threshold": 0.0,
+            "match_count": top_k,
+        }).execute().data or []
+        results.append([row["section_id"] for row in rows])
+    return results
+
+
+def recall_at_k(found: List[List[int]], expected: List[List[int]], k: int) -> float:
+    scores = []
+    for ids, wanted in zip(found, expected):
+        wanted = set(wanted)
+        scores.append(len(wanted & set(ids[:k])) / min(len(wanted), k))
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def overlap_at_k(a: List[List[int]], b: List[List[int]], k: int) -> float:
+    scores = [len(set(x[:k]) & set(y[:k])) / k for x, y in zip(a, b)]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def verify(
+    client,
+    queries_path: Optional[str] = None,
+    sample: int = VERIFY_SAMPLE,
+    top_k: int = VERIFY_TOP_K,
+    min_coverage: float = MIN_COVERAGE,
+    tolerance: float = RECALL_TOLERANCE,
+) -> Dict:
+    current, pending = require_pending(client)
+    cov = coverage(client, current, pending)
+    queries = load_queries(queries_path) if queries_path else sample_title_queries(client, sample)
+
+    limiter = AdaptiveRateLimiter(REEMBED_RPS, max_rate=REEMBED_MAX_RPS)
+    report = IngestionReport(label="verify")
+    texts = [q["query"] for q in queries]
+    expected = [q["expected_section_ids"] for q in queries]
+    blue_ids = search_ids(client, current, texts, top_k, limiter, report)
+    green_ids = search_ids(client, pending, texts, top_k, limiter, report)
+
+    result = {
+        "blue": describe(current),
+        "green": describe(pending),
+        "coverage": cov,
+        "queries": len(queries),
+        "top_k": top_k,
+        "blue_recall": recall_at_k(blue_ids, expected, top_k),
+        "green_recall": recall_at_k(green_ids, expected, top_k),
+        "overlap": overlap_at_k(blue_ids, green_ids, top_k),
+    }
+    reasons = []
+    if cov["ratio"] < min_coverage:
+        reasons.append(f"채움 비율 {cov['ratio']:.2%} < {min_coverage:.2%}")
+    if not queries:
+        reasons.append("검증 질의가 없음")
+    elif result["green_recall"] < result["blue_recall"] - tolerance:
+        reasons.append(f"recall@{top_k} {result['green_recall']:.3f} < blue {result['blue_recall']:.3f} - {tolerance}")
+    result["passed"] = not reasons
+    result["reasons"] = reasons
+    return result
+
+
+def print_verify(result: Dict):
+    cov = result["coverage"]
+    print(f"🔎 blue : {result['blue']}")
+    print(f"   green: {result['green']}")
+    print(f"   채움: green {cov['green']} / blue {cov['blue']} ({cov['ratio']:.2%}), 내용 있는 행 {cov['total']}")
+    print(f"   질의 {result['queries']}개, recall@{result['top_k']}: blue {result['blue_recall']:.3f} / "
+          f"green {result['green_recall']:.3f}, top-{result['top_k']} 겹침 {result['overlap']:.2f}")
+    if result["passed"]:
+        print("✅ 전환 가능")
+    else:
+        print("❌ 전환 보류: " + "; ".join(result["reasons"]))
+
+
+# =========================================
+# 4. 명령
+# =========================================
+def status(client):
+    current, pending, previous = read_state(client)
+    print(f"📌 현재  : {describe(current)}")
+    print(f"   준비 중: {describe(pending) if pending else '-'}")
+    print(f"   이전  : {describe(previous) if previous else '-'}")
+    total = count_sections(client)
+    for column in (current.column, current.shadow_column):
+        try:
+            filled = count_sections(client, column)
+            print(f"   {column}: {filled}/{total}행")
+        except Exception as e:
+            print(f"   {column}: 조회 실패 ({e})")
+
+
+def prepare(client, model: str, dim: int):
+    current, _, _ = read_state(client)
+    pending = config_for_slot(current.shadow_column, model, dim)
+    # shadow 컬럼을 새 차원으로 다시 만듦 (예전 임베딩 삭제 → 이전 설정으로 rollback 불가)
+    client.rpc("prepare_embedding_slot", {"target_column": pending.column, "dim": dim}).execute()
+    write_state(client, {"pending": pending.to_row(), "previous": None})
+    print(f"🧱 {pending.column} 준비 완료 → {describe(pending)}")
+    print("   다음: python reembed.py backfill")
+
+
+def backfill(client, rps: float = REEMBED_RPS, max_rps: float = REEMBED_MAX_RPS, restart: bool = False):
+    _, pending = require_pending(client)
+    limiter = AdaptiveRateLimiter(rps, max_rate=max_rps)
+    return backfill_embeddings(
+        client,
+        target=pending,
+        limiter=limiter,
+        concurrency=min(BACKFILL_CONCURRENCY, max(1, int(max_rps))),
+        restart=restart,
+    )
+
+
+def flip(client, force: bool = False, **verify_kwargs) -> bool:
+    current, pending = require_pending(client)
+    # 그 사이 새로 적재된 행(현재 컬럼에만 임베딩됨)을 green에도 채움
+    backfill(client, restart=True)
+    result = verify(client, **verify_kwargs)
+    print_verify(result)
+    if not result["passed"] and not force:
+        return False
+
+    write_state(client, {
+        **pending.to_row(),
+        "pending": None,
+        "previous": current.to_row(),
+    })
+    print(f"🔀 전환 완료: {current.column} ({current.model}) → {pending.column} ({pending.model})")
+    print("   질의 서버는 EMBEDDING_CONFIG_TTL초 안에 새 설정을 사용합니다.")
+    return True
+
+
+def rollback(client):
+    current, pending, previous = read_state(client)
+    if previous is None:
+        raise RuntimeError("되돌릴 이전 설정이 없습니다.")
+    if pending is not None and pending.column == previous.column:
+        raise RuntimeError(f"{previous.column} 컬럼이 새 모델용으로 다시 준비되어 rollback할 수 없습니다.")
+    # 전환 후 적재된 행은 새 컬럼에만 임베딩 → 예전 모델로 예전 컬럼을 먼저 채움
+    backfill_embeddings(
+        client,
+        target=previous,
+        limiter=AdaptiveRateLimiter(REEMBED_RPS, max_rate=REEMBED_MAX_RPS),
+        restart=True,
+    )
+    write_state(client, {
+        **previous.to_row(),
+        "pending": None,
+        "previous": current.to_row(),
+    })
+    print(f"↩️ 되돌림: {current.column} ({current.model}) → {previous.column} ({previous.model})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="임베딩 모델 blue/green 전환")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="현재/준비 중 설정과 컬럼별 채움 현황")
+
+    p = sub.add_parser("prepare", help="shadow 컬럼을 새 모델 차원으로 다시 만듦")
+    p.add_argument("--model", required=True)
+    p.add_argument("--dim", type=int, required=True)
+
+    p = sub.add_parser("backfill", help="새 모델로 shadow 컬럼 채우기 (중간에 멈추면 이어서)")
+    p.add_argument("--rps", type=float, default=REEMBED_RPS)
+    p.add_argument("--max-rps", type=float, default=REEMBED_MAX_RPS)
+    p.add_argument("--restart", action="store_true")
+
+    for name in ("verify", "flip"):
+        p = sub.add_parser(name, help="채움 비율/샘플 질의 recall 비교" if name == "verify" else "검증 후 전환")
+        p.add_argument("--queries", default=None, help='[{"query", "expected_section_ids"}] JSON 파일')
+        p.add_argument("--sample", type=int, default=VERIFY_SAMPLE, help="질의 파일이 없을 때 섹션 제목 샘플 수")
+        p.add_argument("--top-k", type=int, default=VERIFY_TOP_K)
+        p.add_argument("--min-coverage", type=float, default=MIN_COVERAGE)
+        p.add_argument("--tolerance", type=float, default=RECALL_TOLERANCE)
+        if name == "flip":
+            p.add_argument("--force", action="store_true", help="검증 실패해도 전환")
+
+    sub.add_parser("rollback", help="이전 설정으로 되돌림")
+    args = parser.parse_args(argv)
+
+    client = get_supabase()
+    try:
+        if args.command == "status":
+            status(client)
+        elif args.command == "prepare":
+            prepare(client, args.model, args.dim)
+        elif args.command == "backfill":
+            backfill(client, args.rps, args.max_rps, args.restart)
+        elif args.command in ("verify", "flip"):
+            verify_kwargs = {
+                "queries_path": args.queries,
+                "sample": args.sample,
+                "top_k": args.top_k,
+                "min_coverage": args.min_coverage,
+                "tolerance": args.tolerance,
+            }
+            if args.command == "flip":
+                return 0 if flip(client, force=args.force, **verify_kwargs) else 1
+            result = verify(client, **verify_kwargs)
+            print_verify(result)
+            return 0 if result["passed"] else 1
+        elif args.command == "rollback":
+            rollback(client)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import google.generativeai as genai
+
+from ingest_utils import RateLimiter, IngestionReport, call_with_retry
+from embedding_batch import make_batches
+
+
+# =========================================
+# 배치 섹션 분류 (제목/카테고리)
+#   - 섹션 여러 개를 하나의 프롬프트에 담아 JSON 배열로 한 번에 응답받음
+#     [{"index": 0, "section_title": "...", "category": "..."}, ...]
+#   - 응답 스키마 검증 후 빠진 index만 다시 요청
+#   - 끝까지 빠진 항목은 fallback_fn(1개씩 분류)으로 처리
+# =========================================
+CLASSIFY_MODEL = "gemini-1.5-pro"
+CATEGORIES = ("button", "course", "error", "maintenance", "other")
+
+MAX_SECTIONS_PER_CALL = 25
+MAX_PROMPT_TOKENS = 12000
+MAX_CHARS_PER_SECTION = 1500   # 제목/카테고리 판단에는 앞부분이면 충분
+MAX_REASKS = 2
+
+_model_cache: Dict[str, "genai.GenerativeModel"] = {}
+
+
+def get_model(name: str = CLASSIFY_MODEL):
+    """GenerativeModel은 호출마다 새로 만들지 않고 재사용"""
+    if name not in _model_cache:
+        _model_cache[name] = genai.GenerativeModel(name)
+    return _model_cache[name]
+
+
+def build_batch_prompt(items: List[Dict]) -> str:
+    """items: [{"index": int, "content": str}, ...]"""
+    blocks = []
+    for item in items:
+        content = item["content"][:MAX_CHARS_PER_SECTION]
+        blocks.append(f'[섹션 index={item["index"]}]\n"""{content}"""')
+    joined = "\n\n".join(blocks)
+
+    return f"""
+다음은 세탁기 사용설명서의 여러 섹션이다. 각 섹션은 [섹션 index=N]으로 구분된다.
+
+모든 섹션에 대해 아래 정보를 만들어 JSON 배열 하나로만 답하라.
+- index: 섹션 번호 (입력의 index 그대로)
+- section_title: 이 섹션을 잘 대표하는 제목 (15자 이내, 한국어)
+- category: 다음 중 하나
+  - "button": 버튼/조작부 설명
+  - "course": 세탁 코스/프로그램 설명
+  - "error": 오류코드/에러 설명
+  - "maintenance": 관리/청소/안전 주의
+  - "other": 위에 해당하지 않는 기타
+
+형식:
+[{{"index": 0, "section_title": "...", "category": "..."}}, ...]
+
+{joined}
+"""
+
+
+def parse_batch_response(text: str, expected: List[int]) -> Dict[int, Dict]:
+    """
+    응답 JSON 배열을 검증해서 {index: {"section_title", "category"}} 로 반환.
+    요청하지 않은 index, 형식이 틀린 항목은 버림. category가 목록에 없으면 "other".
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("["):]
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("sections") or data.get("items") or [data]
+    if not isinstance(data, list):
+        raise ValueError("응답이 JSON 배열이 아닙니다.")
+
+    wanted = set(expected)
+    parsed: Dict[int, Dict] = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        title = item.get("section_title")
+        if idx not in wanted or not isinstance(title, str) or not title.strip():
+            continue
+        category = item.get("category")
+        parsed[idx] = {
+            "section_title": title.strip()[:50],
+            "category": category if category in CATEGORIES else "other",
+        }
+    return parsed
+
+
+def classify_batch(items: List[Dict], model_name: str = CLASSIFY_MODEL) -> Dict[int, Dict]:
+    """API 1회 호출로 items 전체 분류"""
+    resp = get_model(model_name).generate_content(
+        build_batch_prompt(items),
+        generation_config={"response_mime_type": "application/json"},
+    )
+    return parse_batch_response(resp.text, [item["index"] for item in items])
+
+
+def _classify_with_reask(
+    items: List[Dict],
+    limiter: Optional[RateLimiter],
+    report: Optional[IngestionReport],
+    retries: int,
+) -> Dict[int, Dict]:
+    results: Dict[int, Dict] = {}
+    pending = items
+    for attempt in range(MAX_REASKS + 1):
+        if not pending:
+            break
+        try:
+            results.update(call_with_retry(
+                classify_batch, pending,
+                retries=retries, limiter=limiter, report=report, counter="llm_calls",
+            ))
+        except Exception as e:
+            print(f"  ⚠️ 배치 분류 실패 ({len(pending)}개): {e}")
+        pending = [item for item in pending if item["index"] not in results]
+        if pending and attempt < MAX_REASKS:
+            print(f"  🔁 응답에서 빠진 {len(pending)}개 섹션만 다시 요청합니다.")
+    return results
+
+
+def classify_sections(
+    contents: List[str],
+    limiter: Optional[RateLimiter] = None,
+    report: Optional[IngestionReport] = None,
+    fallback_fn: Optional[Callable[[str], Dict]] = None,
+    max_items: int = MAX_SECTIONS_PER_CALL,
+    max_tokens: int = MAX_PROMPT_TOKENS,
+    concurrency: int = 1,
+    retries: int = 1,
+) -> List[Optional[Dict]]:
+    """
+    contents 전체를 배치로 분류해서 같은 순서의 메타 리스트로 반환.
+    배치+재요청으로도 못 받은 항목은 fallback_fn(content)로 1개씩 처리, 그래도 실패하면 None.
+    """
+    if not contents:
+        return []
+
+    trimmed = [c[:MAX_CHARS_PER_SECTION] for c in contents]
+    batches = make_batches(trimmed, max_items, max_tokens)
+    results: Dict[int, Dict] = {}
+
+    def run(indices: List[int]):
+        items = [{"index": i, "content": contents[i]} for i in indices]
+        results.update(_classify_with_reask(items, limiter, report, retries))
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(run, batches))
+
+    missing = [i for i in range(len(contents)) if i not in results]
+    if missing and fallback_fn:
+        print(f"  ↪️ 배치 분류에서 빠진 {len(missing)}개 섹션은 개별 분류합니다.")
+        for i in missing:
+            try:
+                results[i] = call_with_retry(
+                    fallback_fn, contents[i],
+                    retries=retries, limiter=limiter, report=report, counter="llm_calls",
+                )
+            except Exception as e:
+                print(f"  ❌ 개별 분류 실패 (index {i}): {e}")
+
+    print(f"  🏷️ 분류 {len(contents)}개 → 배치 {len(batches)}개")
+    return [results.get(i) for i in range(len(contents))]
@@ -0,0 +1,131 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# =========================================
+# 에러코드 표 로컬 파싱 (pdfplumber extract_tables)
+#   - 대부분의 '고장 신고 전 확인 사항' 표는 벡터 표라서 Vision 없이 바로 읽힘
+#   - 헤더 문구로 열을 code / symptom / cause / solution 에 매핑
+#   - 병합 셀(None)은 위 행 값을 이어받음
+#   - 헤더 없이 다음 페이지로 이어지는 표는 직전 페이지 매핑 재사용
+#     (페이지 사이 전달은 page_extraction.extract_page_range가 담당)
+#   - 검증을 통과하지 못하면 None → 호출하는 쪽에서 Gemini Vision으로 대체
+# =========================================
+FIELDS = ("code", "symptom", "cause", "solution")
+
+HEADER_ALIASES: Dict[str, List[str]] = {
+    "code": ["표시부 알림", "표시부", "에러코드", "에러 코드", "오류코드", "코드", "알림"],
+    "symptom": ["증상", "이런 경우", "이럴 때", "현상", "상태"],
+    "cause": ["원인", "이유"],
+    "solution": ["해결책", "해결 방법", "해결방법", "조치", "이렇게 하세요", "확인 사항"],
+}
+
+# 표시부에 나오는 짧은 코드 (UE, OE, dE1, IE, 4E ...)
+SHORT_CODE_RE = re.compile(r"^(?:[A-Za-z]{1,3}\d{0,2}|\d[A-Za-z]{1,2})$")
+
+MIN_VALID_RATIO = 0.8   # 매핑된 행 중 이 비율 이상이 유효해야 표 구조를 믿음
+
+
+def clean_cell(cell: Optional[str]) -> str:
+    if cell is None:
+        return ""
+    return re.sub(r"\s+", " ", str(cell)).strip()
+
+
+def _match_field(header: str) -> Optional[str]:
+    compact = header.replace(" ", "")
+    for field in ("cause", "solution", "symptom", "code"):
+        if any(alias.replace(" ", "") in compact for alias in HEADER_ALIASES[field]):
+            return field
+    return None
+
+
+def map_columns(header_row: List[Optional[str]]) -> Optional[Dict[str, int]]:
+    """
+    헤더 행 → {field: 열 번호}.
+    원인/해결책 열이 있고, 코드나 증상 열이 하나라도 있어야 매핑으로 인정.
+    """
+    mapping: Dict[str, int] = {}
+    for idx, cell in enumerate(header_row):
+        field = _match_field(clean_cell(cell))
+        if field and field not in mapping:
+            mapping[field] = idx
+    if "cause" in mapping and "solution" in mapping and ("code" in mapping or "symptom" in mapping):
+        return mapping
+    return None
+
+
+def _row_to_record(row: List[Optional[str]], mapping: Dict[str, int], carry: Dict[str, str]) -> Dict[str, str]:
+    record = {}
+    for field in FIELDS:
+        idx = mapping.get(field)
+        cell = row[idx] if idx is not None and idx < len(row) else ""
+        value = clean_cell(cell)
+        # 병합 셀(pdfplumber가 None으로 줌): 코드/증상 칸은 위 행 값을 이어받음
+        if cell is None and field in ("code", "symptom"):
+            value = carry.get(field, "")
+        record[field] = value
+
+    # '표시부 알림' 열에 코드 대신 메시지 문장이 들어있는 경우 → 증상으로 이동
+    if record["code"] and not SHORT_CODE_RE.match(record["code"]) and "symptom" not in mapping:
+        record["symptom"], record["code"] = record["code"], ""
+    return record
+
+
+def is_valid_row(record: Dict[str, str]) -> bool:
+    return bool((record["code"] or record["symptom"]) and (record["cause"] or record["solution"]))
+
+
+def parse_tables(
+    tables: List[List[List[Optional[str]]]],
+    mapping: Optional[Dict[str, int]] = None,
+) -> Tuple[Optional[List[Dict]], Optional[Dict[str, int]]]:
+    """
+    page.extract_tables() 결과 → ([{code, symptom, cause, solution}, ...], 마지막으로 쓴 열 매핑)
+    mapping: 헤더가 없는 표에 쓸 직전 페이지 매핑.
+    매핑/검증에 실패하면 (None, None).
+    """
+    rows: List[Dict] = []
+    attempted = 0
+
+    for table in tables:
+        if not table:
+            continue
+        body = table
+        # 처음 두 행 안에서 헤더 찾기 (제목 행이 먼저 오는 경우가 있음)
+        for h in range(min(2, len(table))):
+            found = map_columns(table[h])
+            if found:
+                mapping, body = found, table[h + 1:]
+                break
+        if mapping is None:
+            continue
+
+        carry: Dict[str, str] = {}
+        for raw in body:
+            if not raw or not any(clean_cell(c) for c in raw):
+                continue
+            if map_columns(raw):   # 표 중간에 반복되는 헤더
+                continue
+            attempted += 1
+            record = _row_to_record(raw, mapping, carry)
+            if is_valid_row(record):
+                rows.append(record)
+                carry = {"code": record["code"], "symptom": record["symptom"]}
+
+    if not rows or len(rows) < attempted * MIN_VALID_RATIO:
+        return None, None
+    return rows, mapping
+
+
+def extract_error_rows(
+    page,
+    mapping: Optional[Dict[str, int]] = None,
+) -> Tuple[Optional[List[Dict]], Optional[Dict[str, int]]]:
+    """pdfplumber page에서 에러코드 표를 로컬로 파싱 → (rows, 열 매핑). 실패하면 (None, None)"""
+    try:
+        tables = page.extract_tables()
+    except Exception as e:
+        print(f"  ⚠️ 표 추출 실패 (Vision으로 대체): {e}")
+        return None, None
+    return parse_tables(tables or [], mapping)
@@ -1,8 +1,8 @@
 import os
 import time
 import re
-import io
-from typing import List, Dict
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Optional, Set
 
 import pdfplumber
 from PIL import Image
@@ -10,6 +10,29 @@ from dotenv import load_dotenv
 from supabase import create_client, Client
 import google.generativeai as genai
 
+import embedding_batch
+import section_classifier
+from ingest_utils import RateLimiter, IngestionReport, call_with_retry
+from embedding_batch import embed_batch, embed_texts, estimate_tokens
+from embedding_codec import row_embedding, to_db_vector
+from embedding_config import EmbeddingConfig, get_embedding_config
+from section_classifier import classify_sections, get_model
+from heuristic_classifier import load_or_train
+from incremental import (
+    find_manual_id,
+    find_latest_manual_id,
+    load_section_index,
+    count_rows,
+    split_by_hash,
+    delete_stale_sections,
+)
+from ingest_journal import IngestJournal
+from page_extraction import iter_pages, is_error_table_page, VISION_CACHE_VERSION
+from page_cache import PageCache, PAGE_CACHE_ENABLED
+from image_compact import encode_compact
+from chunker import CrossPageChunker, ChunkStats
+from dedup import NearDuplicateFilter, DEDUP_MODE
+
 
 # =========================================
 # 0. 환경 설정 (.env 필요)
@@ -23,9 +46,60 @@ SUPABASE_URL = "https://wzafalbctqkylhyzlfej.supabase.co"
 SUPABASE_KEY = os.getenv("supbase_service_role")
 GOOGLE_API_KEY = os.getenv("google_api")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# Supabase 클라이언트는 처음 쓸 때 만듦 (import만으로는 접속/키 검사를 하지 않음)
+# 오프라인 벤치마크 등에서는 use_clients()로 다른 클라이언트를 주입
+supabase: Optional[Client] = None
+
+
+def get_supabase() -> Client:
+    global supabase
+    if supabase is None:
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase
+
+
+def use_clients(supabase_client=None, genai_module=None):
+    """
+    Supabase 클라이언트 / Gemini 모듈 교체 (benchmark_ingest.py의 로컬 대역 등).
+    genai_module은 embed_content(), GenerativeModel()을 가진 객체 —
+    임베딩(embedding_batch)·분류(section_classifier) 모듈도 같이 바꿈.
+    """
+    global supabase, genai
+    if supabase_client is not None:
+        supabase = supabase_client
+    if genai_module is not None:
+        genai = genai_module
+        embedding_batch.genai = genai_module
+        section_classifier.genai = genai_module
+        section_classifier._model_cache.clear()
+
+# 섹션 메타/임베딩 동시 처리 설정
+#   ENRICH_CONCURRENCY: 동시에 보낼 분류 배치 요청 수 (스레드 수)
+#   GEMINI_RPS        : 모든 스레드가 공유하는 Gemini 초당 호출 한도 (API 할당량에 맞출 것)
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+GEMINI_RPS = float(os.getenv("GEMINI_RPS", "5"))
+API_RETRIES = 3
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))  # 동시에 보낼 임베딩 배치 요청 수
+INSERT_CHUNK_SIZE = int(os.getenv("INSERT_CHUNK_SIZE", "100"))  # 분류→임베딩→insert를 이 개수 단위로 끊어서 진행
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "token")  # "token"(페이지 경계 넘는 토큰 청커) | "page"(예전 방식)
+CHUNK_STATS = os.getenv("CHUNK_STATS", "0") == "1"     # token 청커일 때 예전 방식 청크 분포도 같이 계산해서 비교 출력
+
+gemini_limiter = RateLimiter(GEMINI_RPS)
+
+# 로컬 분류기(키워드 규칙 + TF-IDF) 신뢰도가 이 값 이상이면 Gemini 분류를 건너뜀
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.75"))
+_local_classifier = None
+
+
+def get_local_classifier():
+    """처음 한 번만 로드/학습 (.ingest_cache/heuristic_model.json 캐시)"""
+    global _local_classifier
+    if _local_classifier is None:
+        _local_classifier = load_or_train(get_supabase())
+    return _local_classifier
+
 
 # =========================================
 # 1. 공통 유틸: 텍스트 정리
@@ -52,25 +126,11 @@ def page_to_markdown(page_text: str) -> str:
 # =========================================
 # 2. 에러코드 표 페이지 감지 + Vision 파싱
 # =========================================
-def is_error_table_page(raw_text: str) -> bool:
+def parse_error_table_with_gemini(page_image, mime_type: Optional[str] = None) -> List[Dict]:
     """
-    이 페이지가 '고장 신고 전 확인 사항' 에러코드 표인지 판별하는 간단한 규칙.
-    필요하면 키워드 추가/수정해서 쓰면 됨.
-    """
-    keywords = ["고장 신고 전 확인 사항", "표시부 알림", "해결책", "원인"]
-    return any(k in raw_text for k in keywords)
-
-
-def extract_page_image(page) -> Image.Image:
-    """pdfplumber page → PIL 이미지로 변환"""
-    pil_img = page.to_image(resolution=200).original
-    return pil_img
-
-
-def parse_error_table_with_gemini(page_image: Image.Image) -> List[Dict]:
-    """
-    에러코드 표 페이지 전체 이미지를 Gemini Vision에 보내서
+    에러코드 표 이미지를 Gemini Vision에 보내서
     row 단위 JSON으로 파싱.
+    page_image: 이미 압축된 이미지 bytes(+mime_type) 또는 PIL 이미지(여기서 흑백 JPEG/WebP로 압축)
 
     기대 응답 형식:
     [
@@ -83,9 +143,10 @@ def parse_error_table_with_gemini(page_image: Image.Image) -> List[Dict]:
       ...
     ]
     """
-    buf = io.BytesIO()
-    page_image.save(buf, format="PNG")
-    buf.seek(0)
+    if isinstance(page_image, Image.Image):
+        image_bytes, mime_type = encode_compact(page_image)
+    else:
+        image_bytes, mime_type = page_image, mime_type or "image/jpeg"
 
     prompt = """
 다음 이미지는 세탁기 사용설명서의 '고장 신고 전 확인 사항' 표이다.
@@ -112,7 +173,7 @@ def parse_error_table_with_gemini(page_image: Image.Image) -> List[Dict]:
 
     model = genai.GenerativeModel("gemini-1.5-pro")
     resp = model.generate_content(
-        [prompt, buf.getvalue()],
+        [prompt, {"mime_type": mime_type, "data": image_bytes}],
     )
 
     import json
@@ -152,40 +213,35 @@ def make_error_sections_from_rows(
     return sections
 
 
-def extract_pages_and_error_sections(pdf_path: str) -> (List[Dict], List[Dict]):
+def error_rows_for_page(record: Dict, report: Optional[IngestionReport] = None) -> List[Dict]:
     """
-    PDF 전체를 돌면서
-    - 일반 페이지 텍스트 목록
-    - 에러코드 표에서 뽑은 섹션 목록
-    을 동시에 만들어 반환.
-
-    normal_pages: [{page_number, raw_text}, ...]
-    error_sections: [{
-        page_number,
-        content_markdown,
-        force_category,
-        force_title
-    }, ...]
+    에러코드 표 페이지의 row 목록.
+    워커에서 extract_tables로 로컬 파싱에 성공했거나 페이지 캐시에 Vision 결과가 있으면 그대로 쓰고 (API 호출 없음, 캐시된 빈 결과도 포함),
+    표 구조 인식에 실패한 페이지만 Gemini Vision으로 파싱해서 결과를 페이지 캐시에 저장.
     """
-    normal_pages: List[Dict] = []
-    error_sections: List[Dict] = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            raw_text = (page.extract_text() or "").strip()
-
-            if is_error_table_page(raw_text):
-                img = extract_page_image(page)
-                rows = parse_error_table_with_gemini(img)
-                secs = make_error_sections_from_rows(rows, page_number=i)
-                error_sections.extend(secs)
-            else:
-                normal_pages.append({
-                    "page_number": i,
-                    "raw_text": raw_text,
-                })
-
-    return normal_pages, error_sections
+    if record.get("table_rows"):
+        if report:
+            report.count("local_table_pages")
+        return record["table_rows"]
+
+    image = record.get("image")
+    if image is None:
+        # 페이지 캐시에 Vision 결과가 있어 이미지를 만들지 않은 페이지 (빈 결과 = 에러 섹션 없음)
+        return record.get("table_rows") or []
+    print(f"  🖼️ p.{record['page_number']} 표 구조 인식 실패 → Gemini Vision 파싱 ({len(image) / 1024:.0f}KB)")
+    started = time.perf_counter()
+    rows = call_with_retry(
+        parse_error_table_with_gemini, image, record.get("image_mime"),
+        retries=API_RETRIES, limiter=gemini_limiter, report=report, counter="vision_calls",
+    )
+    if report:
+        report.count("vision_bytes", len(image))
+        report.count("vision_ms", int((time.perf_counter() - started) * 1000))
+    if PAGE_CACHE_ENABLED and record.get("page_hash"):
+        cache = PageCache()
+        cache.put(record["page_hash"], VISION_CACHE_VERSION, {"table_rows": rows})
+        cache.close()
+    return rows
 
 
 # =========================================
@@ -196,7 +252,7 @@ def split_markdown_into_sections(
     max_chars: int = 1200,
 ) -> List[Dict]:
     """
-    normal_pages 리스트를 받아 섹션(청크) 리스트로 변환.
+    페이지 리스트([{page_number, raw_text}, ...])를 받아 섹션(청크) 리스트로 변환.
 
     return:
     [
@@ -250,6 +306,69 @@ def split_markdown_into_sections(
     return sections
 
 
+def iter_manual_sections(
+    pdf_path: str,
+    max_chars: int = 1200,
+    workers: Optional[int] = None,
+    text_backend: Optional[str] = None,
+    report: Optional[IngestionReport] = None,
+    chunker: Optional[str] = None,
+    stats: Optional[bool] = None,
+) -> Iterator[Dict]:
+    """
+    페이지 → 정리 → 청크를 한 페이지씩 흘려보내는 제너레이터 (섹션 dict를 하나씩 yield).
+    페이지 목록/섹션 목록을 통째로 만들지 않고, 페이지 캐시도 처리 즉시 비우므로
+    매뉴얼 페이지 수와 상관없이 메모리 사용량이 일정함.
+    에러코드 표 페이지는 Vision 파싱 결과 섹션을, 나머지는 Markdown 청크를 페이지 순서대로 내보냄.
+
+    chunker (기본 CHUNK_STRATEGY):
+      "token": 페이지 경계를 넘는 토큰 기준 청커 (chunker.py, page_number~page_end 기록)
+      "page" : 예전 방식 (페이지마다 max_chars 글자 기준)
+    끝나면 청크 개수/크기 분포를 출력.
+    stats (기본 CHUNK_STATS): token 청커일 때 예전 방식으로도 한 번 더 잘라서 분포 비교 (페이지마다 추가 작업)
+    """
+    strategy = chunker or CHUNK_STRATEGY
+    token_chunker = CrossPageChunker() if strategy == "token" else None
+    compare = token_chunker is not None and (CHUNK_STATS if stats is None else stats)
+    before, after = ChunkStats("페이지별 글자 기준"), ChunkStats(f"{strategy} 청커")
+
+    def emit(sections: Iterable[Dict]) -> Iterator[Dict]:
+        for sec in sections:
+            after.add(sec["content_markdown"])
+            yield sec
+
+    for record in iter_pages(pdf_path, workers=workers, backend=text_backend):
+        if report:
+            report.count("pages")
+            if record.get("cached"):
+                report.count("page_cache_hits")
+        i = record["page_number"]
+        if record["is_error_table"]:
+            if token_chunker:
+                yield from emit(token_chunker.flush())   # 에러표 앞뒤 내용은 이어 붙이지 않음
+            rows = error_rows_for_page(record, report=report)
+            yield from make_error_sections_from_rows(rows, page_number=i)
+            continue
+
+        page = {"page_number": i, "raw_text": record["raw_text"]}
+        if not token_chunker:
+            yield from emit(split_markdown_into_sections([page], max_chars=max_chars))
+            continue
+        if compare:
+            for sec in split_markdown_into_sections([page], max_chars=max_chars):
+                before.add(sec["content_markdown"])
+        yield from emit(token_chunker.add_page(i, page_to_markdown(record["raw_text"])))
+
+    if token_chunker:
+        yield from emit(token_chunker.flush())
+
+    if compare:
+        print(f"  📐 {before.summary()}")
+    print(f"  📐 {after.summary()}")
+    if report:
+        report.count("chunks", len(after.sizes))
+
+
 # =========================================
 # 4. 섹션 메타데이터 (제목/카테고리) + 임베딩
 # =========================================
@@ -276,8 +395,7 @@ def analyze_section_with_gemini(content: str) -> Dict:
 \"\"\"{content}\"\"\"
 """
 
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    resp = model.generate_content(prompt)
+    resp = get_model("gemini-1.5-pro").generate_content(prompt)
     text = resp.text.strip()
 
     import json
@@ -289,18 +407,37 @@ def analyze_section_with_gemini(content: str) -> Dict:
     }
 
 
-def get_embedding(text: str) -> str:
+def get_embedding(text: str, target: Optional[EmbeddingConfig] = None) -> List[float]:
+    """
+    Gemini 임베딩을 float 리스트로 반환.
+    (DB에는 현재 임베딩 컬럼(embedding_config.py)에 pgvector로 그대로 저장 — embedding_codec.py 참고)
+    여러 섹션을 한 번에 처리할 때는 embed_sections()를 사용할 것.
+    """
+    target = target or get_embedding_config(get_supabase())
+    return embed_batch([text], model=target.model, output_dim=target.dim)[0]  # [float, float, ...]
+
+
+def embed_sections(
+    sections: List[Dict],
+    report: Optional[IngestionReport] = None,
+    target: Optional[EmbeddingConfig] = None,
+) -> List[Optional[List[float]]]:
     """
-    Gemini 임베딩을 구하고 JSON 문자열로 반환.
-    (DB에는 text 컬럼으로 저장하고, 나중에 파싱해서 사용)
+    섹션 전체를 배치 임베딩 (요청당 최대 100개, 토큰 예산 단위로 분할).
+    target: 임베딩 모델/차원 (기본: 현재 검색에 쓰는 설정)
+    반환: 섹션 순서와 같은 벡터 리스트 (실패한 섹션은 None)
     """
-    emb_resp = genai.embed_content(
-        model="models/text-embedding-004",
-        content=text,
+    target = target or get_embedding_config(get_supabase())
+    if report:
+        report.count("embed_tokens", sum(estimate_tokens(sec["content_markdown"]) for sec in sections))
+    return embed_texts(
+        [sec["content_markdown"] for sec in sections],
+        limiter=gemini_limiter,
+        report=report,
+        concurrency=EMBED_CONCURRENCY,
+        model=target.model,
+        output_dim=target.dim,
     )
-    embedding = emb_resp["embedding"]  # [float, float, ...]
-    import json
-    return json.dumps(embedding)
 
 
 # =========================================
@@ -322,48 +459,264 @@ def insert_manual_document(
         "file_url": file_url,
         "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
     }
-    res = supabase.table("manual_documents").insert(data).execute()
+    res = get_supabase().table("manual_documents").insert(data).execute()
     manual_id = res.data[0]["manual_id"]
     return manual_id
 
 
-def insert_manual_sections(manual_id: int, sections: List[Dict]) -> None:
+def classify_sections_meta(
+    sections: List[Dict],
+    report: Optional[IngestionReport] = None,
+    concurrency: int = ENRICH_CONCURRENCY,
+) -> List[Optional[Dict]]:
     """
-    섹션 리스트를 manual_sections 테이블에 일괄 insert.
+    섹션들의 제목/카테고리 결정 (섹션 순서 유지).
     - force_category/force_title 이 있으면 그대로 사용
-    - 없으면 Gemini로 메타 생성
+    - 로컬 분류기 신뢰도가 LOCAL_CONFIDENCE_THRESHOLD 이상이면 그 결과 사용
+    - 나머지(애매한 섹션)만 여러 섹션을 한 프롬프트에 담아 배치로 Gemini 분류
+      (빠진 항목은 재요청 → 그래도 없으면 analyze_section_with_gemini로 개별 처리)
+    실패한 섹션은 None (해당 섹션만 건너뜀).
     """
-    rows = []
-    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    metas: List[Optional[Dict]] = [None] * len(sections)
+    llm_targets: List[int] = []
+    local = get_local_classifier()
 
-    for sec in sections:
-        content = sec["content_markdown"]
-        page_num = sec["page_number"]
+    for i, sec in enumerate(sections):
         force_cat = sec.get("force_category")
         force_title = sec.get("force_title")
-
         if force_cat or force_title:
-            section_title = force_title or ""
-            category = force_cat or "other"
+            metas[i] = {
+                "section_title": force_title or "",
+                "category": force_cat or "other",
+                "category_source": "forced",
+            }
+            continue
+
+        guess = local.predict(sec["content_markdown"])
+        if guess["confidence"] >= LOCAL_CONFIDENCE_THRESHOLD:
+            metas[i] = {
+                "section_title": guess["section_title"],
+                "category": guess["category"],
+                "category_source": "local",
+            }
+            if report:
+                report.count("local_classified")
         else:
-            meta = analyze_section_with_gemini(content)
-            section_title = meta["section_title"]
-            category = meta["category"]
+            llm_targets.append(i)
+
+    if llm_targets:
+        print(f"  🏷️ 로컬 분류 {len(sections) - len(llm_targets)}개 / Gemini 분류 대상 {len(llm_targets)}개")
+        if report:
+            report.count("llm_sections", len(llm_targets))
+            report.count("llm_input_tokens", sum(estimate_tokens(sections[i]["content_markdown"]) for i in llm_targets))
+
+    classified = classify_sections(
+        [sections[i]["content_markdown"] for i in llm_targets],
+        limiter=gemini_limiter,
+        report=report,
+        fallback_fn=analyze_section_with_gemini,
+        concurrency=concurrency,
+        retries=API_RETRIES,
+    )
+    for i, meta in zip(llm_targets, classified):
+        if meta is not None:
+            meta = {**meta, "category_source": "llm"}
+        metas[i] = meta
+    return metas
+
+
+def make_section_row(
+    manual_id: int,
+    sec: Dict,
+    title: str,
+    category: str,
+    embedding,
+    now: str,
+    target: EmbeddingConfig,
+    category_source: Optional[str] = None,
+) -> Dict:
+    return {
+        "manual_id": manual_id,
+        "section_title": title or "",
+        "content_text": sec["content_markdown"],
+        "page_number": sec["page_number"],
+        "page_end": sec.get("page_end", sec["page_number"]),
+        "category": category or "other",
+        "category_source": category_source,
+        target.column: to_db_vector(embedding, target.dim),
+        "content_hash": sec["content_hash"],
+        "created_at": now,
+    }
+
+
+def iter_batches(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """iterable을 size개씩 끊어서 리스트로 yield (전체를 메모리에 올리지 않음)"""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
 
-        embedding_json = get_embedding(content)
 
-        rows.append({
+def drop_stale_duplicate_refs(batch: List[Dict]):
+    """
+    저장된 섹션을 가리키는 중복 표시 중 그 섹션이 이미 삭제된 것은 해제 (일반 섹션으로 처리).
+    (시그니처 캐시는 로컬이라 다른 곳에서 지운 섹션이 남아 있을 수 있음)
+    """
+    targets = {sec["duplicate_of"]["section_id"] for sec in batch
+               if sec.get("duplicate_of", {}).get("section_id")}
+    if not targets:
+        return
+    res = get_supabase().table("manual_sections").select("section_id").in_("section_id", list(targets)).execute()
+    alive = {row["section_id"] for row in res.data or []}
+    for sec in batch:
+        if sec.get("duplicate_of", {}).get("section_id") in targets - alive:
+            sec.pop("duplicate_of")
+
+
+def insert_duplicate_refs(
+    manual_id: int,
+    duplicates: List[Dict],
+    canonical_ids: Dict[str, int],
+    report: IngestionReport,
+):
+    """근사 중복 섹션 → 대표 섹션을 가리키는 manual_section_refs 행"""
+    refs = []
+    for sec in duplicates:
+        dup = sec["duplicate_of"]
+        section_id = dup.get("section_id") or canonical_ids.get(dup.get("content_hash"))
+        if section_id is None:
+            # 대표 섹션이 메타/임베딩 실패로 저장되지 않은 경우
+            report.count("dedup_unresolved")
+            continue
+        refs.append({
+            "section_id": section_id,
             "manual_id": manual_id,
-            "section_title": section_title,
-            "content_text": content,
-            "page_number": page_num,
-            "category": category,
-            "embedding_vector": embedding_json,
-            "created_at": now,
+            "page_number": sec["page_number"],
+            "page_end": sec.get("page_end", sec["page_number"]),
+            "similarity": round(dup["similarity"], 3),
         })
-
-    if rows:
-        supabase.table("manual_sections").insert(rows).execute()
+    if refs:
+        get_supabase().table("manual_section_refs").insert(refs).execute()
+        report.count("dedup_collapsed", len(refs))
+
+
+def insert_manual_sections(
+    manual_id: int,
+    sections: Iterable[Dict],
+    concurrency: int = ENRICH_CONCURRENCY,
+    previous: Optional[Dict[str, List[Dict]]] = None,
+    same_manual: bool = False,
+    chunk_size: int = INSERT_CHUNK_SIZE,
+    journal: Optional[IngestJournal] = None,
+    report: Optional[IngestionReport] = None,
+    target: Optional[EmbeddingConfig] = None,
+) -> IngestionReport:
+    """
+    섹션들(리스트 또는 제너레이터)을 chunk_size개씩 받아 manual_sections 테이블에 insert.
+    chunk마다:
+    0) previous({content_hash: [이전 row, ...]})와 해시가 같은 섹션은 메타/임베딩 재사용
+       - same_manual=True(같은 버전 재실행): 이미 저장돼 있으므로 건너뛰고 (이전 row 하나당 섹션 하나),
+         재사용되지 않은 이전 row는 삭제
+       - same_manual=False(새 버전): 이전 row의 메타/임베딩을 복사해서 insert
+    1) 체크포인트 저널(.ingest_cache/ingest_journal.db)에 이미 분류/임베딩된 섹션은 API 호출 없이 재사용
+    2) 나머지는 배치 분류 → 배치 임베딩 → 저널 기록
+    3) insert
+       → 중간에 실패해도 이미 insert된 chunk와 저널에 기록된 섹션은 다시 돌릴 때 그대로 이어감
+    4) 근사 중복으로 표시된 섹션(sec["duplicate_of"], dedup.py)은 insert하지 않고
+       대표 섹션을 가리키는 manual_section_refs 행만 기록
+    메타나 임베딩 중 하나라도 실패한 섹션은 건너뜀.
+    임베딩은 target(기본: 현재 검색 설정, embedding_config.py)의 모델로 만들어 그 컬럼에 저장.
+    """
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    target = target or get_embedding_config(get_supabase())
+    report = report or IngestionReport(label=f"manual_id={manual_id}")
+    own_journal = journal is None
+    journal = journal or IngestJournal()
+    try:
+        previous = previous or {}
+        chunk_size = max(1, chunk_size)
+        kept_ids: Set[int] = set()   # same_manual: 재사용한 이전 section_id
+        canonical_ids: Dict[str, int] = {}   # 이 매뉴얼 섹션 content_hash → section_id (중복 참조용)
+
+        if same_manual:
+            # 참조는 매번 다시 계산하므로 이전 실행 것은 지움 (API 호출 없이 재생성됨)
+            get_supabase().table("manual_section_refs").delete().eq("manual_id", manual_id).execute()
+
+        for batch in iter_batches(sections, chunk_size):
+            rows: List[Dict] = []
+            drop_stale_duplicate_refs(batch)
+            duplicates = [sec for sec in batch if sec.get("duplicate_of")]
+            batch = [sec for sec in batch if not sec.get("duplicate_of")]
+            reuse, todo = split_by_hash(batch, previous, claimed=kept_ids if same_manual else None)
+            report.count("reused_sections", len(reuse))
+
+            for sec, prev in reuse:
+                report.section_done()
+                if same_manual:
+                    canonical_ids[sec["content_hash"]] = prev["section_id"]
+                    continue
+                rows.append(make_section_row(
+                    manual_id, sec, prev.get("section_title"), prev.get("category"), row_embedding(prev), now, target,
+                    prev.get("category_source"),
+                ))
+
+            # 저널에 남아 있는 섹션 (지난 실행에서 분류/임베딩까지 끝났지만 insert 전에 멈춘 것)
+            fresh: List[Dict] = []
+            for sec in todo:
+                saved = journal.get(manual_id, sec["content_hash"])
+                # 다른 모델로 만든 벡터(전환 전 실행 기록)는 차원이 달라서 재사용하지 않음
+                if saved and saved.get("embedding") and len(saved["embedding"]) == target.dim:
+                    report.section_done()
+                    report.count("journal_resumed")
+                    rows.append(make_section_row(
+                        manual_id, sec, saved["section_title"], saved["category"], saved["embedding"], now, target,
+                        saved.get("category_source"),
+                    ))
+                else:
+                    fresh.append(sec)
+
+            if fresh:
+                metas = classify_sections_meta(fresh, report=report, concurrency=concurrency)
+                embeddings = embed_sections(fresh, report=report, target=target)
+                for sec, meta, embedding in zip(fresh, metas, embeddings):
+                    if meta is None or embedding is None:
+                        report.section_done(ok=False)
+                        continue
+                    journal.record(manual_id, sec["content_hash"], meta, embedding)
+                    report.section_done()
+                    rows.append(make_section_row(
+                        manual_id, sec, meta["section_title"], meta["category"], embedding, now, target,
+                        meta.get("category_source"),
+                    ))
+
+            if rows:
+                res = get_supabase().table("manual_sections").insert(rows).execute()
+                for inserted in res.data or []:
+                    canonical_ids.setdefault(inserted.get("content_hash"), inserted.get("section_id"))
+                journal.mark_inserted(manual_id, [row["content_hash"] for row in rows])
+                report.count("insert_calls")
+            if duplicates:
+                insert_duplicate_refs(manual_id, duplicates, canonical_ids, report)
+            print(f"  💾 섹션 {report.sections + report.failed}개 처리 "
+                  f"(재사용 {len(reuse)} / 체크포인트 {len(todo) - len(fresh)} / 새로 처리 {len(fresh)})")
+
+        if same_manual and previous:
+            removed = delete_stale_sections(get_supabase(), manual_id, previous, kept_ids)
+            if removed:
+                print(f"  🗑️ 새 PDF에 없는 섹션 {removed}개 삭제")
+
+        # 실패한 섹션이 없으면 저널 정리 (있으면 다음 실행에서 이어받도록 남겨둠)
+        if not report.failed:
+            journal.clear(manual_id)
+
+        report.finish().print_summary()
+        return report
+    finally:
+        # 여기서 연 저널만 닫음 (넘겨받은 저널은 호출한 쪽 소유)
+        if own_journal:
+            journal.close()
 
 
 # =========================================
@@ -376,56 +729,84 @@ def process_manual_pdf(
     manual_version: str,
     file_url: str,
     max_chars: int = 1200,
+    text_backend: Optional[str] = None,
+    workers: Optional[int] = None,
+    report: Optional[IngestionReport] = None,
 ):
     """
-    1) manual_documents insert
-    2) PDF에서 일반 페이지 + 에러코드 섹션 분리
-    3) 일반 페이지 → Markdown 섹션 청크
-    4) 에러 섹션과 합치기
-    5) Gemini 메타/임베딩 + manual_sections insert
+    1) manual_documents insert (같은 model_id + version이 이미 있으면 그 문서를 재사용)
+    2) PDF 페이지를 하나씩: 일반 페이지 → Markdown 섹션 청크 / 에러코드 표 → Vision 섹션
+    3) 근사 중복 섹션(같은 PDF 안 / 이미 저장된 다른 매뉴얼)은 대표 섹션 참조로 접음
+    4) 섹션을 chunk 단위로: 이전 버전과 해시 비교 → 바뀐 섹션만 Gemini 메타/임베딩 + manual_sections insert
+    report를 넘기면 진행 상황(pages, sections, API 호출 수)을 처리 도중에도 볼 수 있음 (ingest_catalog.py)
+    임베딩 모델/컬럼은 시작할 때의 embedding_config로 고정 (처리 중 전환돼도 한 매뉴얼 안에서는 섞이지 않음)
     """
-    manual_id = insert_manual_document(
-        model_id=model_id,
-        title=manual_title,
-        version=manual_version,
-        file_url=file_url,
-    )
-    print(f"[INFO] manual_id={manual_id} created")
-
-    normal_pages, error_sections = extract_pages_and_error_sections(pdf_path)
-    print(f"[INFO] normal_pages={len(normal_pages)}, error_sections={len(error_sections)}")
+    target = get_embedding_config(get_supabase())
+    existing_id = find_manual_id(get_supabase(), model_id, manual_version)
+    prev_id = None
+    if existing_id:
+        manual_id = existing_id
+        previous = load_section_index(get_supabase(), manual_id, embedding_column=target.column)
+        print(f"[INFO] manual_id={manual_id} already exists → 변경분만 반영 (기존 섹션 {count_rows(previous)}개)")
+    else:
+        prev_id = find_latest_manual_id(get_supabase(), model_id)
+        previous = load_section_index(get_supabase(), prev_id, embedding_column=target.column) if prev_id else {}
+        manual_id = insert_manual_document(
+            model_id=model_id,
+            title=manual_title,
+            version=manual_version,
+            file_url=file_url,
+        )
+        print(f"[INFO] manual_id={manual_id} created (이전 버전 manual_id={prev_id}, 섹션 {count_rows(previous)}개)")
 
-    normal_sections = split_markdown_into_sections(
-        normal_pages,
-        max_chars=max_chars,
+    # 페이지 추출 → 청크 → 메타/임베딩 → insert 를 chunk 단위로 흘려보냄
+    report = report or IngestionReport()
+    report.label = f"manual_id={manual_id}"
+    sections = iter_manual_sections(
+        pdf_path, max_chars=max_chars, workers=workers, text_backend=text_backend, report=report,
     )
-    print(f"[INFO] normal_sections={len(normal_sections)}")
 
-    # 일반 섹션 + 에러 섹션 합치기
-    all_sections: List[Dict] = []
-    all_sections.extend(normal_sections)
-    all_sections.extend(error_sections)
-    print(f"[INFO] total sections={len(all_sections)}")
-
-    insert_manual_sections(manual_id, all_sections)
+    # 청크 → 근사 중복 제거 → 메타/임베딩 (DEDUP=off|pdf|all)
+    if DEDUP_MODE != "off":
+        dedup = NearDuplicateFilter()
+        if DEDUP_MODE == "all":
+            dedup.load_stored(get_supabase(), exclude_manual_ids={manual_id, prev_id})
+        sections = dedup.filter(sections)
+
+    report = insert_manual_sections(
+        manual_id,
+        sections,
+        previous=previous,
+        same_manual=bool(existing_id),
+        report=report,
+        target=target,
+    )
     print("[INFO] all sections inserted into manual_sections")
+    return report
 
 
 # =========================================
-# 7. 예시 실행
+# 7. 단일 매뉴얼 실행
+#   python upload_manual.py "통돌이 설명서.pdf" TA25GZ9 v1.0 [제목] [file_url]
+#   (여러 매뉴얼을 한꺼번에 올릴 때는 ingest_catalog.py)
 # =========================================
 if __name__ == "__main__":
-    PDF_FILE_PATH = "통돌이 설명서.pdf"
-    MODEL_ID = "TA25GZ9"
-    MANUAL_TITLE = "TA25GZ9 상세 매뉴얼"
-    MANUAL_VERSION = "v1.0"
-    
+    import sys
+
+    args = sys.argv[1:]
+    PDF_FILE_PATH = args[0] if len(args) > 0 else "통돌이 설명서.pdf"
+    MODEL_ID = args[1] if len(args) > 1 else "TA25GZ9"
+    MANUAL_VERSION = args[2] if len(args) > 2 else "v1.0"
+    MANUAL_TITLE = args[3] if len(args) > 3 else f"{MODEL_ID} 상세 매뉴얼"
+    FILE_URL = args[4] if len(args) > 4 else os.getenv("MANUAL_FILE_URL", "")
+
     if os.path.exists(PDF_FILE_PATH):
         process_manual_pdf(
             pdf_path=PDF_FILE_PATH,
             model_id=MODEL_ID,
             manual_title=MANUAL_TITLE,
-            manual_version=MANUAL_VERSION
+            manual_version=MANUAL_VERSION,
+            file_url=FILE_URL,
         )
     else:
         print(f"❌ 파일을 찾을 수 없습니다: {PDF_FILE_PATH}")
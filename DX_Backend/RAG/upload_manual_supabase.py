@@ -1,86 +1,401 @@
 import os
+import json
 import time
+import signal
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
 import google.generativeai as genai
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from embedding_batch import embed_texts
+from embedding_config import EmbeddingConfig, get_embedding_config
+from embedding_store import bulk_update_embeddings
+from ingest_utils import CACHE_DIR, AdaptiveRateLimiter, IngestionReport
+
 # ==========================================
 # 1. 설정 정보
 # ==========================================
 load_dotenv()
 SUPABASE_URL = "https://wzafalbctqkylhyzlfej.supabase.co"
-SUPABASE_KEY = os.getenv("supbase_service_role") 
-GOOGLE_API_KEY = os.getenv("google_api")        
+SUPABASE_KEY = os.getenv("supbase_service_role")
+GOOGLE_API_KEY = os.getenv("google_api")
 
 genai.configure(api_key=GOOGLE_API_KEY)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Optional[Client] = None
+
+
+def get_supabase() -> Client:
+    global supabase
+    if supabase is None:
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase
+
+
+# 백필 설정
+#   BACKFILL_PAGE_SIZE  : 한 번에 읽어서 임베딩/저장하는 행 수 (section_id 순 keyset 페이지)
+#   BACKFILL_RPS        : 임베딩 요청 시작 속도 — 이후 응답(429/할당량 에러)에 따라 AIMD로 자동 조절
+#   BACKFILL_CONCURRENCY: 동시에 보낼 임베딩 배치 요청 수
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "500"))
+BACKFILL_RPS = float(os.getenv("BACKFILL_RPS", "2"))
+BACKFILL_MAX_RPS = float(os.getenv("BACKFILL_MAX_RPS", "20"))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+STATE_PATH = CACHE_DIR / "backfill_state.json"
+
 
 # ==========================================
-# 2. 임베딩 생성 함수
+# 2. 진행 위치 저장 (중간에 멈춰도 이어서)
+#   - 페이지를 저장할 때마다 마지막 section_id 기록 → 다시 실행하면 그 다음부터
+#   - 끝까지 돌면 지움 (다음 실행은 처음부터: 실패했던 행/새로 생긴 빈 행을 다시 확인)
 # ==========================================
-def get_embedding(text):
+def load_checkpoint(column: str, path: Path = STATE_PATH) -> int:
     try:
-        if not text or len(text.strip()) < 2:
-            return None
-            
-        time.sleep(1.0) # 속도 조절
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
-    except Exception as e:
-        print(f"  ⚠️ 임베딩 에러 (잠시 대기): {e}")
-        time.sleep(5)
-        return None
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return 0
+    return int(state.get(column, {}).get("last_section_id", 0))
+
+
+def save_checkpoint(column: str, last_id: Optional[int], path: Path = STATE_PATH):
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        state = {}
+    if last_id is None:
+        state.pop(column, None)
+    else:
+        state[column] = {"last_section_id": last_id, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
 
 # ==========================================
 # 3. 메인 로직
 # ==========================================
-def process_existing_db_rows():
-    print("🔄 DB에서 임베딩이 없는 데이터를 조회합니다...")
+def fetch_page(client, column: str, after_id: int, page_size: int) -> List[Dict]:
+    """임베딩이 비어 있는 행을 section_id 순으로 page_size개 (after_id 다음부터)"""
+    return client.table("manual_sections") \
+        .select("section_id, content_text, created_at") \
+        .is_(column, "null") \
+        .gt("section_id", after_id) \
+        .order("section_id") \
+        .limit(page_size) \
+        .execute().data or []
+
+
+def embed_and_write(
+    client,
+    rows: List[Dict],
+    target: EmbeddingConfig,
+    limiter: AdaptiveRateLimiter,
+    report: IngestionReport,
+    concurrency: int = BACKFILL_CONCURRENCY,
+) -> List[Tuple[int, List[float]]]:
+    """rows 배치 임베딩(target 모델/차원) → target 컬럼에 한 번에 저장. 반환: 저장한 (section_id, 벡터) 목록"""
+    # 빈 텍스트는 임베딩 대상에서 제외
+    targets = [r for r in rows if r["content_text"] and len(r["content_text"].strip()) >= 2]
+    report.count("skipped_empty", len(rows) - len(targets))
 
-    # 🚨 수정된 부분: 'id' 대신 'section_id'를 사용합니다.
-    response = supabase.table("manual_sections") \
-        .select("section_id, content_text") \
-        .is_("embedding_vector", "null") \
-        .execute()
-    
-    rows = response.data
-    
-    if not rows:
+    vectors = embed_texts(
+        [r["content_text"] for r in targets],
+        task_type="retrieval_document",
+        limiter=limiter,
+        report=report,
+        concurrency=concurrency,
+        model=target.model,
+        output_dim=target.dim,
+    )
+    items = []
+    for row, vector in zip(targets, vectors):
+        if vector:
+            items.append((row["section_id"], vector))
+            report.section_done()
+        else:
+            report.section_done(ok=False)
+
+    bulk_update_embeddings(client, items, column=target.column)
+    report.count("write_calls")
+    return items
+
+
+def backfill_embeddings(
+    client,
+    target: Optional[EmbeddingConfig] = None,
+    page_size: int = BACKFILL_PAGE_SIZE,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    concurrency: int = BACKFILL_CONCURRENCY,
+    restart: bool = False,
+    state_path: Path = STATE_PATH,
+) -> IngestionReport:
+    """
+    target 컬럼(기본: 현재 검색 컬럼, embedding_config.py)이 비어 있는 manual_sections 행을 채움.
+    (reembed.py는 shadow 컬럼/새 모델을 target으로 넘김)
+    페이지마다: keyset 조회 → 배치 임베딩(요청당 최대 100개, 동시 concurrency개) → RPC 한 번으로 일괄 저장
+    → 진행 위치 저장. 다음 페이지 조회는 현재 페이지 임베딩과 겹쳐서 미리 해 둠.
+    """
+    target = target or get_embedding_config(client)
+    column = target.column
+    limiter = limiter or AdaptiveRateLimiter(BACKFILL_RPS, max_rate=BACKFILL_MAX_RPS)
+    report = IngestionReport(label=f"backfill {column}")
+    last_id = 0 if restart else load_checkpoint(column, state_path)
+    if last_id:
+        print(f"↪️ 이전 진행 위치부터 이어서: section_id > {last_id}")
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        next_page = prefetch.submit(fetch_page, client, column, last_id, page_size)
+        while True:
+            rows = next_page.result()
+            report.count("fetch_calls")
+            if not rows:
+                break
+            last_id = rows[-1]["section_id"]
+            if len(rows) == page_size:
+                next_page = prefetch.submit(fetch_page, client, column, last_id, page_size)
+
+            items = embed_and_write(client, rows, target, limiter, report, concurrency)
+            save_checkpoint(column, last_id, state_path)
+            print(f"  💾 section_id ≤ {last_id}: {len(items)}/{len(rows)}개 저장 "
+                  f"(누적 {report.sections}개, {report.sections_per_sec:.1f}개/s, 임베딩 {limiter.rate:.1f} req/s)")
+
+            if len(rows) < page_size:
+                break
+
+    # 끝까지 돌았으면 진행 위치 초기화 (실패/빈 행은 다음 실행에서 처음부터 다시 확인)
+    save_checkpoint(column, None, state_path)
+    report.finish().print_summary()
+    if limiter.throttled:
+        print(f"   할당량 에러 {limiter.throttled}회 → 최종 속도 {limiter.rate:.1f} req/s")
+    return report
+
+
+def process_existing_db_rows(restart: bool = False):
+    print("🔄 DB에서 임베딩이 없는 데이터를 조회합니다...")
+    report = backfill_embeddings(get_supabase(), restart=restart)
+    if not report.sections and not report.failed:
         print("✅ 처리할 데이터가 없습니다. (모든 행에 임베딩이 이미 있습니다)")
         return
+    print(f"\n🎉 완료! 총 {report.sections}개의 행이 업데이트되었습니다. (실패 {report.failed}개)")
 
-    print(f"📦 총 {len(rows)}개의 데이터를 찾아 업데이트를 시작합니다.")
-    
-    success_count = 0
 
-    for idx, row in enumerate(rows):
-        # 🚨 수정된 부분: 여기서도 section_id를 가져옵니다.
-        current_id = row['section_id'] 
-        text_content = row['content_text']
-        
-        print(f"[{idx+1}/{len(rows)}] ID:{current_id} 처리 중...", end="")
+# ==========================================
+# 4. 데몬 모드 (계속 돌면서 새로 생긴 빈 임베딩 행을 몇 초 안에 채움)
+#   python upload_manual_supabase.py --daemon
+#   - 워터마크(section_id) 이후의 빈 행만 DAEMON_BATCH_SIZE개씩 micro-batch로 처리,
+#     새 행이 없으면 DAEMON_POLL_SEC초 대기
+#   - 늦게 커밋된 트랜잭션(워터마크보다 작은 id)이나 실패한 행은 DAEMON_SWEEP_SEC마다
+#     워터마크를 0으로 돌려서 다시 훑음 (빈 행만 조회하므로 가벼움)
+#   - 지표: 지연(created_at → 임베딩 저장까지), 대기 중 가장 오래된 행 나이, 처리량(최근 60초)
+#     DAEMON_METRICS_SEC마다 로그 출력, DAEMON_METRICS_PORT를 주면 /metrics (Prometheus 텍스트) 제공
+#   - SIGINT/SIGTERM: 처리 중인 micro-batch까지 저장하고 종료
+# ==========================================
+DAEMON_POLL_SEC = float(os.getenv("DAEMON_POLL_SEC", "2"))
+DAEMON_BATCH_SIZE = int(os.getenv("DAEMON_BATCH_SIZE", "100"))
+DAEMON_SWEEP_SEC = float(os.getenv("DAEMON_SWEEP_SEC", "600"))
+DAEMON_METRICS_SEC = float(os.getenv("DAEMON_METRICS_SEC", "30"))
+DAEMON_METRICS_PORT = int(os.getenv("DAEMON_METRICS_PORT", "0"))
+THROUGHPUT_WINDOW_SEC = 60
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """created_at 문자열 → epoch 초 (타임존 없는 값은 로컬 시간으로 봄)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class DaemonMetrics:
+    """데몬 지표 (스레드 안전) — 로그 출력과 /metrics 응답에 같이 씀"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = 0
+        self.watermark = 0
+        self.backlog_age = 0.0            # 대기 중 가장 오래된 행의 나이(초), 밀린 게 없으면 0
+        self.last_batch_at: Optional[float] = None
+        self.lags: Deque[float] = deque(maxlen=1000)
+        self.recent: Deque[Tuple[float, int]] = deque()
+
+    def record_batch(self, rows: List[Dict], written: int, failed: int):
+        now = time.time()
+        with self._lock:
+            self.batches += 1
+            self.written += written
+            self.failed += failed
+            self.last_batch_at = now
+            self.recent.append((now, written))
+            for row in rows:
+                created = parse_timestamp(row.get("created_at"))
+                if created is not None:
+                    self.lags.append(max(0.0, now - created))
+
+    def set_backlog(self, rows: List[Dict], watermark: int):
+        created = parse_timestamp(rows[0].get("created_at")) if rows else None
+        with self._lock:
+            self.watermark = watermark
+            self.backlog_age = max(0.0, time.time() - created) if created is not None else 0.0
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            while self.recent and now - self.recent[0][0] > THROUGHPUT_WINDOW_SEC:
+                self.recent.popleft()
+            lags = sorted(self.lags)
+            return {
+                "written_total": self.written,
+                "failed_total": self.failed,
+                "batches_total": self.batches,
+                "errors_total": self.errors,
+                "watermark_section_id": self.watermark,
+                "backlog_oldest_age_seconds": self.backlog_age,
+                "lag_p50_seconds": lags[len(lags) // 2] if lags else 0.0,
+                "lag_p95_seconds": lags[min(len(lags) - 1, int(len(lags) * 0.95))] if lags else 0.0,
+                "throughput_rows_per_sec": sum(n for _, n in self.recent)
+                                           / max(1.0, min(THROUGHPUT_WINDOW_SEC, now - self.started)),
+                "uptime_seconds": now - self.started,
+            }
+
+    def prometheus(self) -> str:
+        return "".join(f"embedding_backfill_{key} {value}\n" for key, value in self.snapshot().items())
+
+    def log_line(self) -> str:
+        m = self.snapshot()
+        return (f"📈 저장 {m['written_total']}개 (실패 {m['failed_total']}), {m['throughput_rows_per_sec']:.2f}개/s, "
+                f"지연 p50 {m['lag_p50_seconds']:.1f}s / p95 {m['lag_p95_seconds']:.1f}s, "
+                f"대기 중 최고령 {m['backlog_oldest_age_seconds']:.1f}s, 워터마크 {m['watermark_section_id']}")
+
+
+def serve_metrics(metrics: DaemonMetrics, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("/metrics", ""):
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📡 지표: http://0.0.0.0:{port}/metrics")
+    return server
+
+
+def run_daemon(
+    client,
+    target: Optional[EmbeddingConfig] = None,
+    batch_size: int = DAEMON_BATCH_SIZE,
+    poll_interval: float = DAEMON_POLL_SEC,
+    sweep_interval: float = DAEMON_SWEEP_SEC,
+    metrics_interval: float = DAEMON_METRICS_SEC,
+    metrics_port: int = DAEMON_METRICS_PORT,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    stop: Optional[threading.Event] = None,
+    state_path: Path = STATE_PATH,
+) -> DaemonMetrics:
+    """
+    stop이 set될 때까지 빈 임베딩 행을 micro-batch로 채움 (워터마크는 state_path에 column별로 저장).
+    target을 안 주면 현재 검색 설정(embedding_config)을 따라감 — 모델이 전환되면 새 컬럼/모델로 바뀜.
+    """
+    limiter = limiter or AdaptiveRateLimiter(BACKFILL_RPS, max_rate=BACKFILL_MAX_RPS)
+    current = target or get_embedding_config(client)
+    report = IngestionReport(label=f"daemon {current.column}")
+    metrics = DaemonMetrics()
+    state_key = f"daemon:{current.column}"
+    watermark = load_checkpoint(state_key, state_path)
+
+    if stop is None:
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            def request_stop(signum, frame):
+                print(f"\n🛑 종료 신호({signal.Signals(signum).name}) → 처리 중인 배치까지 저장하고 종료합니다.")
+                stop.set()
+            signal.signal(signal.SIGINT, request_stop)
+            signal.signal(signal.SIGTERM, request_stop)
+
+    server = serve_metrics(metrics, metrics_port) if metrics_port else None
+    print(f"🔁 임베딩 데몬 시작: {current.column} ({current.model}), 워터마크 section_id > {watermark}, "
+          f"배치 {batch_size}개, 대기 {poll_interval:g}s, 전체 재확인 {sweep_interval:g}s마다")
+    last_sweep = last_log = time.monotonic()
+    failures = 0
+
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if now - last_sweep >= sweep_interval:
+                watermark, last_sweep = 0, now
+            if now - last_log >= metrics_interval:
+                print(metrics.log_line())
+                last_log = now
 
-        vector = get_embedding(text_content)
-        
-        if vector:
             try:
-                # 🚨 수정된 부분: 업데이트 조건도 section_id 기준입니다.
-                supabase.table("manual_sections") \
-                    .update({"embedding_vector": vector}) \
-                    .eq("section_id", current_id) \
-                    .execute()
-                print(" -> ✅ 저장 완료")
-                success_count += 1
+                latest = target or get_embedding_config(client)
+                if latest != current:
+                    print(f"🔀 임베딩 설정 전환 감지: {current.column} → {latest.column} ({latest.model})")
+                    current = latest
+                    state_key = f"daemon:{current.column}"
+                    watermark = load_checkpoint(state_key, state_path)
+                rows = fetch_page(client, current.column, watermark, batch_size)
+                metrics.set_backlog(rows, watermark)
+                if rows:
+                    before_ok, before_failed = report.sections, report.failed
+                    embed_and_write(client, rows, current, limiter, report, concurrency=1)
+                    watermark = rows[-1]["section_id"]
+                    save_checkpoint(state_key, watermark, state_path)
+                    metrics.record_batch(rows, report.sections - before_ok, report.failed - before_failed)
+                    metrics.set_backlog([], watermark)
+                failures = 0
             except Exception as e:
-                print(f" -> ❌ DB 업데이트 실패: {e}")
-        else:
-            print(" -> ⚠️ 임베딩 생성 실패 (텍스트 확인 필요)")
+                failures += 1
+                metrics.record_error()
+                delay = min(60.0, poll_interval * (2 ** failures))
+                print(f"  ⚠️ 데몬 배치 실패 ({failures}회 연속): {e} → {delay:.0f}초 후 재시도")
+                stop.wait(delay)
+                continue
+
+            # 배치가 꽉 찼으면 밀린 행이 더 있으므로 바로 다음 배치
+            if len(rows) < batch_size:
+                stop.wait(poll_interval)
+    finally:
+        if server:
+            server.shutdown()
+        print(metrics.log_line())
+        print(f"👋 임베딩 데몬 종료 (워터마크 section_id {watermark})")
+    return metrics
 
-    print(f"\n🎉 완료! 총 {success_count}개의 행이 업데이트되었습니다.")
 
 if __name__ == "__main__":
-    process_existing_db_rows()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="manual_sections 빈 임베딩 채우기")
+    parser.add_argument("--restart", action="store_true", help="저장된 진행 위치/워터마크를 무시하고 처음부터")
+    parser.add_argument("--daemon", action="store_true", help="계속 돌면서 새로 생긴 빈 행을 채움")
+    args = parser.parse_args()
+
+    if args.daemon:
+        if args.restart:
+            save_checkpoint(f"daemon:{get_embedding_config(get_supabase()).column}", None)
+        run_daemon(get_supabase())
+    else:
+        process_existing_db_rows(restart=args.restart)
@@ -0,0 +1,160 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from firebase_admin import firestore
+
+# 영상 프롬프트용 대화 맥락을 "최근 N개 + 이전 대화 요약" 으로 제한해서 가져오는 모듈
+#
+# - 방 전체 메시지를 stream() 하던 방식 → order_by(DESC).limit(N) 로 마지막 N개만 읽음
+# - 토큰 예산(max_tokens)을 넘으면 오래된 메시지부터 잘라냄
+# - 윈도우 밖으로 밀려난 옛 대화는 chat_rooms/{room_id} 문서의 context_summary 에 누적 요약으로 캐시
+#   (이미 요약된 메시지는 다시 읽지 않음 → Firestore 읽기/프롬프트 토큰이 대화 길이와 무관하게 일정)
+
+DEFAULT_LAST_N = 20
+DEFAULT_MAX_TOKENS = 1500
+SUMMARY_FIELD = "context_summary"
+SUMMARY_UNTIL_FIELD = "context_summary_until"  # 요약에 포함된 마지막 메시지의 timestamp
+SUMMARY_BATCH = 50                              # 요약 갱신 1회에 읽는 최대 메시지 수
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (한국어 기준 2글자 ≈ 1토큰 정도로 보수적으로 계산)"""
+    return max(1, len(text) // 2)
+
+
+def format_message(msg: Dict) -> str:
+    sender = msg.get("sender", "unknown")
+    content = msg.get("text", "")
+    return f"[{sender}]: {content}"
+
+
+def fetch_recent_messages(db_client, room_id: str, last_n: int = DEFAULT_LAST_N) -> List[Dict]:
+    """방의 마지막 last_n개 메시지를 시간순으로 반환 (읽기 횟수 = last_n 이하)"""
+    messages_ref = db_client.collection("chat_rooms").document(room_id).collection("messages")
+    docs = messages_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(last_n).stream()
+    messages = [d.to_dict() for d in docs]
+    messages.reverse()
+    return messages
+
+
+def find_latest_room_id(db_client) -> Optional[str]:
+    """room_id가 없을 때만: 전체 메시지 중 가장 최근 메시지가 속한 방을 찾습니다. (1건만 조회)"""
+    # 'messages' 컬렉션 그룹에서 timestamp 내림차순으로 1개만 가져옴
+    # 주의: 이를 위해서는 Firestore 콘솔에서 'messages' 컬렉션 그룹에 대한 복합 색인이 필요할 수 있습니다.
+    # 만약 색인 에러가 나면 콘솔에 출력된 URL을 클릭해서 생성해야 합니다.
+    print("🔎 전체 채팅 내역에서 가장 최근 메시지를 검색합니다...")
+    latest_msg_query = db_client.collection_group("messages")\
+        .order_by("timestamp", direction=firestore.Query.DESCENDING).limit(1)
+    latest_msgs = list(latest_msg_query.stream())
+    if not latest_msgs:
+        return None
+    # 이 메시지의 부모 컬렉션(messages) -> 그 부모 문서(room_user_XXX)
+    session_doc_ref = latest_msgs[0].reference.parent.parent
+    return session_doc_ref.id if session_doc_ref else None
+
+
+def trim_to_token_budget(lines: List[str], max_tokens: int) -> Tuple[List[str], int]:
+    """최신 줄부터 거꾸로 채워서 예산 안에 들어가는 줄만 남김. (남은 줄, 잘린 줄 수) 반환"""
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if kept and used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    kept.reverse()
+    return kept, len(lines) - len(kept)
+
+
+def summarize_previous_turns(client, previous_summary: str, new_turns: str, model: str = SUMMARY_MODEL) -> str:
+    """윈도우 밖으로 밀려난 옛 대화를 기존 요약에 이어서 짧게 요약 (client: google.genai Client)"""
+    response = client.models.generate_content(
+        model=model,
+        contents=f"""
+    아래는 세탁기 문제에 관한 사용자와 AI의 이전 대화 요약과, 그 뒤에 이어진 대화입니다.
+    두 내용을 합쳐 사용자의 문제 상황과 지금까지 시도한 해결책을 3문장 이내로 요약해.
+
+    [기존 요약]
+    {previous_summary or "(없음)"}
+
+    [이어진 대화]
+    {new_turns}
+    """
+    )
+    return response.text
+
+
+def make_summarizer(client, model: str = SUMMARY_MODEL) -> Callable[[str, str], str]:
+    """build_conversation_context(summarize_fn=...)에 넘길 요약 함수"""
+    return lambda previous_summary, new_turns: summarize_previous_turns(client, previous_summary, new_turns, model)
+
+
+def update_rolling_summary(
+    db_client,
+    room_id: str,
+    window_start_ts,
+    summarize_fn: Callable[[str, str], str],
+) -> str:
+    """
+    윈도우 시작 시각(window_start_ts) 이전이면서 아직 요약되지 않은 메시지만 읽어서
+    기존 요약에 이어 붙임. summarize_fn(이전 요약, 새 대화 텍스트) -> 새 요약
+    """
+    room_ref = db_client.collection("chat_rooms").document(room_id)
+    room_doc = room_ref.get()
+    room_data = room_doc.to_dict() if room_doc.exists else {}
+    summary = (room_data or {}).get(SUMMARY_FIELD, "") or ""
+    summary_until = (room_data or {}).get(SUMMARY_UNTIL_FIELD)
+
+    query = room_ref.collection("messages").order_by("timestamp")
+    if summary_until is not None:
+        query = query.where("timestamp", ">", summary_until)
+    query = query.where("timestamp", "<", window_start_ts).limit(SUMMARY_BATCH)
+
+    pending = [d.to_dict() for d in query.stream()]
+    if not pending:
+        return summary
+
+    new_text = "\n".join(format_message(m) for m in pending)
+    try:
+        summary = summarize_fn(summary, new_text).strip()
+    except Exception as e:
+        print(f"⚠️ 이전 대화 요약 실패 (기존 요약 유지): {e}")
+        return summary
+
+    room_ref.set({
+        SUMMARY_FIELD: summary,
+        SUMMARY_UNTIL_FIELD: pending[-1].get("timestamp"),
+    }, merge=True)
+    print(f"🧾 이전 대화 요약 갱신: 메시지 {len(pending)}개 반영")
+    return summary
+
+
+def build_conversation_context(
+    db_client,
+    room_id: str,
+    last_n: int = DEFAULT_LAST_N,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    summarize_fn: Optional[Callable[[str, str], str]] = None,
+) -> Optional[str]:
+    """
+    [이전 대화 요약] + 최근 대화 윈도우 문자열을 만들어 반환. 대화가 없으면 None.
+    summarize_fn이 없으면 요약 없이 윈도우만 사용.
+    """
+    messages = fetch_recent_messages(db_client, room_id, last_n)
+    if not messages:
+        return None
+
+    lines = [format_message(m) for m in messages]
+    lines, dropped = trim_to_token_budget(lines, max_tokens)
+    window_start_ts = messages[dropped].get("timestamp")
+
+    summary = ""
+    # 윈도우가 꽉 찼거나 잘린 메시지가 있을 때만 더 오래된 대화가 존재할 수 있음
+    if summarize_fn and (dropped or len(messages) >= last_n) and window_start_ts is not None:
+        summary = update_rolling_summary(db_client, room_id, window_start_ts, summarize_fn)
+
+    body = "\n".join(lines)
+    if summary:
+        return f"[이전 대화 요약]: {summary}\n{body}"
+    return body
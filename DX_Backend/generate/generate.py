@@ -1,4 +1,5 @@
 import os
+import sys
 import io
 import pathlib
 from pathlib import Path
@@ -15,6 +16,10 @@ import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
 from firebase_admin import storage
+from video_providers import build_provider
+from operation_manager import run_generation
+from storage_upload import resolve_bucket, forget_bucket, upload_video_file
+from conversation_context import build_conversation_context, find_latest_room_id, make_summarizer
 
 ##################### 영상 생성 1초에 천원이니까 신중하게 돌릴 것 #######################
 # 1. 환경 설정 (.env 파일 로드)
@@ -23,6 +28,8 @@ project_root = Path(__file__).resolve().parents[1]
 load_dotenv(project_root / ".env")
 API_KEY = os.getenv("google_api")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# 영상 공급자: sora(기본) | veo | fake(오프라인) | auto(라우터)
+VIDEO_PROVIDER = os.getenv("VIDEO_PROVIDER", "sora").lower()
 
 # Firebase 설정 (vision.py와 동일한 키 사용)
 # serviceAccountKey.json은 프로젝트 루트에 위치함
@@ -51,13 +58,14 @@ if not FIREBASE_KEY_PATH.exists():
 if not API_KEY:
     print("❌ API 키가 없습니다. .env 파일을 확인하거나 코드를 수정하세요.")
     exit()
-if not OPENAI_API_KEY:
+if not OPENAI_API_KEY and VIDEO_PROVIDER == "sora":
     print("❌ OPENAI_API_KEY가 없습니다. .env 파일에 OpenAI 키를 추가하세요.")
     exit()
 
 # 클라이언트 초기화
 client = genai.Client(api_key=API_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+video_provider = build_provider(VIDEO_PROVIDER, genai_client=client, openai_client=openai_client)
 
 def get_host_ip():
     """현재 서버의 로컬 IP 주소를 반환합니다."""
@@ -84,73 +92,37 @@ def init_firebase():
     except Exception as e:
         print(f"❌ Firebase 초기화 오류: {e}")
 
-def get_latest_conversation_context():
+
+def get_latest_conversation_context(room_id=None, last_n=20, max_tokens=1500):
     """
-    Firebase Firestore에서 가장 최근 세션의 대화 내용을 가져옵니다.
+    Firebase Firestore에서 대화 내용을 가져옵니다.
+    - room_id가 주어지면 그 방의 마지막 last_n개 메시지만 읽음 (토큰 예산 max_tokens)
+    - 더 오래된 대화는 방 문서에 캐시된 누적 요약으로 대체
     """
     init_firebase()
     
     try:
         db_client = firestore.client()
-        # 1. collection_group을 사용하여 모든 'messages' 컬렉션에서 가장 최근 메시지를 찾습니다.
-        # 이 방식은 상위 문서(Ghost Document) 존재 여부와 상관없이 메시지 자체만으로 찾습니다.
-        print("🔎 전체 채팅 내역에서 가장 최근 메시지를 검색합니다...")
-        
-        # 'messages' 컬렉션 그룹에서 timestamp 내림차순으로 1개만 가져옴
-        # 주의: 이를 위해서는 Firestore 콘솔에서 'messages' 컬렉션 그룹에 대한 복합 색인이 필요할 수 있습니다.
-        # 만약 색인 에러가 나면 콘솔에 출력된 URL을 클릭해서 생성해야 합니다.
-        latest_msg_query = db_client.collection_group('messages')\
-            .order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1)
-            
-        latest_msgs = list(latest_msg_query.stream())
+        session_id = room_id or find_latest_room_id(db_client)
         
-        # if not latest_msgs:
-        #      # 메시지가 하나도 없으면 기존 방식대로 특정 ID 확인
-        #     print("⚠️ 메시지를 찾지 못했습니다. 기본 ID('room_user_001')를 확인합니다.")
-        #     doc_ref = db_client.collection('chat_rooms').document('room_user_001')
-        #     doc = doc_ref.get()
-        #     if doc.exists:
-        #         latest_session = doc
-        #         session_id = doc.id
-        #         # 빈 방이라도 session_id는 반환
-        #         print(f"📖 대화 내용이 없는 기본 세션(ID: {session_id})을 사용합니다.")
-        #         return session_id, "" 
-        #     else:
-        #         print("❌ 저장된 대화 세션이 없습니다.")
-        #         return None, None
-
-        # 가장 최근 메시지 찾음
-        last_msg = latest_msgs[0]
-        # 이 메시지의 부모 컬렉션(messages) -> 그 부모 문서(room_user_XXX)
-        session_doc_ref = last_msg.reference.parent.parent
-        
-        if not session_doc_ref:
+        if not session_id:
             print("❌ 세션 문서를 찾을 수 없습니다.")
             return None, None
             
-        session_id = session_doc_ref.id
-        print(f"📖 최근 대화 세션(ID: {session_id})을 불러옵니다...")
-        
-        # 2. 해당 세션의 메시지 가져오기
-        messages_ref = session_doc_ref.collection('messages')
-        messages_docs = messages_ref.order_by('timestamp').stream()
-        
-        messages_list = []
-        for m in messages_docs:
-            messages_list.append(m.to_dict())
+        print(f"📖 대화 세션(ID: {session_id})의 최근 메시지 {last_n}개를 불러옵니다...")
+        conversation_text = build_conversation_context(
+            db_client,
+            session_id,
+            last_n=last_n,
+            max_tokens=max_tokens,
+            summarize_fn=make_summarizer(client),
+        )
             
-        if not messages_list:
+        if not conversation_text:
             print("❌ 이 세션에는 대화 내용이 없습니다.")
             return session_id, None
-        
-        # 3. 대화 내용 포맷팅
-        conversation_text = ""
-        for msg_data in messages_list:
-            sender = msg_data.get('sender', 'unknown')
-            content = msg_data.get('text', '')
-            conversation_text += f"[{sender}]: {content}\n"
             
-        return session_id, conversation_text.strip()
+        return session_id, conversation_text
 
     except Exception as e:
         print(f"❌ Firebase 읽기 오류: {e}")
@@ -199,44 +171,18 @@ def upload_video_to_firebase(file_path):
         if not firebase_admin._apps:
             init_firebase()
             
-        bucket = storage.bucket(name=FIREBASE_STORAGE_BUCKET) # 버킷 이름 명시
-        
-        # 1. chat_rooms 폴더 내의 기존 파일들을 스캔하여 다음 번호 결정
-        blobs = list(bucket.list_blobs(prefix="chat_rooms/"))
-        max_num = 0
-        
-        for b in blobs:
-            name = b.name
-            # chat_rooms/video_001.mp4 형태 파싱
-            if name.startswith("chat_rooms/video_") and name.endswith(".mp4"):
-                try:
-                    # "chat_rooms/video_" (17글자) 이후부터 ".mp4" (-4) 이전까지 추출
-                    num_part = name[17:-4]
-                    num = int(num_part)
-                    if num > max_num:
-                        max_num = num
-                except ValueError:
-                    continue
-                    
-        next_num = max_num + 1
-        new_filename = f"video_{next_num:05d}.mp4"
-        storage_path = f"chat_rooms/{new_filename}"
-        
-        print(f"🔢 다음 파일명 결정: {storage_path}")
-        
-        blob = bucket.blob(storage_path)
-        
-        # 메타데이터 설정
-        blob.metadata = {"contentType": "video/mp4"}
-        
-        blob.upload_from_filename(file_path)
+        bucket = resolve_bucket([FIREBASE_STORAGE_BUCKET]) # 버킷 이름 명시 (확인 결과는 캐시)
+        if bucket is None:
+            print("❌ 업로드 실패: 사용할 수 있는 버킷이 없습니다.")
+            return None
         
-        # 공개 URL 생성 (Make public)
-        blob.make_public()
-        print(f"✅ 업로드 완료! URL: {blob.public_url}")
-        return blob.public_url
+        # 파일명은 Firestore 카운터로 발급 (chat_rooms/ 전체 스캔 없음), 청크 단위 재개 가능 업로드
+        public_url = upload_video_file(bucket, file_path)
+        print(f"✅ 업로드 완료! URL: {public_url}")
+        return public_url
         
     except Exception as e:
+        forget_bucket()
         print(f"❌ 업로드 실패: {e}")
         return None
 
@@ -260,32 +206,31 @@ def save_video_message_to_firestore(session_id, video_url):
         print(f"❌ Firestore 저장 실패: {e}")
 
 
-def generate_solution_video(visual_prompt, output_filename="solution.mp4"):
-    print("🎥 비디오 생성 중... (시간이 소요될 수 있습니다)")
-    try:
-        video = openai_client.videos.create(
-            model="sora-2",
-            prompt=visual_prompt,
-            seconds='4',             
-            )
+def publish_video_result(session_id, saved_path):
+    """생성된 영상의 로컬 URL을 해당 방(session_id)에 비디오 메시지로 저장합니다."""
+    if not session_id:
+        print("⚠️ 세션 ID가 없어 Firestore에 저장하지 못했습니다. (로컬 파일만 생성됨)")
+        return
+    # video_url = upload_video_to_firebase(saved_path) # Firebase 업로드 생략
 
-        # 상태 폴링
-        while video.status in ("in_progress", "queued"):
-            time.sleep(3)
-            video = openai_client.videos.retrieve(video.id)
-            progress = getattr(video, "progress", 0)
-            print(f"⏳ 상태: {video.status}, 진행률: {progress}%")
+    # 로컬 URL 생성 (서버 IP 기반)
+    server_ip = get_host_ip()
+    filename = pathlib.Path(saved_path).name
+    video_url = f"http://{server_ip}:8000/assets/{filename}"
 
-        if video.status == "failed":
-            message = getattr(getattr(video, "error", None), "message", "Video generation failed")
-            print(f"❌ 생성 실패: {message}")
-            return None
+    print(f"🔗 로컬 비디오 URL 생성: {video_url}")
+    save_video_message_to_firestore(session_id, video_url)
 
-        # 완료 시 다운로드
-        content = openai_client.videos.download_content(video.id, variant="video")
-        content.write_to_file(output_filename)
-        print(f"✅ Generated video saved to {output_filename}")
-        return output_filename
+
+def generate_solution_video(visual_prompt, output_filename="solution.mp4", session_id=None):
+    print(f"🎥 비디오 생성 중... (공급자: {VIDEO_PROVIDER}, 시간이 소요될 수 있습니다)")
+    try:
+        # operation id는 .video_state/operations.db에 저장되어 크래시 후에도 재개됨
+        # 이전 실행에서 이어받아 완료된 영상은 원래 요청한 방으로 보냄
+        return run_generation(
+            video_provider, visual_prompt, output_filename, seconds=4, session_id=session_id,
+            on_recovered=publish_video_result,
+        )
 
     except Exception as e:
         print(f"❌ 비디오 생성 오류: {e}")
@@ -298,8 +243,9 @@ if __name__ == "__main__":
     # 사용자 시나리오 테스트
     print("--- 🛠️ AI 해결책 생성기 ---")
     
-    # 1. 대화 내용 가져오기
-    result = get_latest_conversation_context()
+    # 1. 대화 내용 가져오기 (인자 또는 CHAT_ROOM_ID로 방을 지정하면 전체 검색 생략)
+    target_room_id = sys.argv[1] if len(sys.argv) > 1 else os.getenv("CHAT_ROOM_ID")
+    result = get_latest_conversation_context(target_room_id)
     
     if result:
         session_id, conversation_context = result
@@ -326,20 +272,8 @@ if __name__ == "__main__":
 
         # 영상 생성
         video_filename = output_dir / f"result_solution_{timestamp}.mp4"
-        saved_path = generate_solution_video(prompt, str(video_filename))
+        saved_path = generate_solution_video(prompt, str(video_filename), session_id=session_id)
         
         # 4. Firebase 업로드 대신 로컬 URL 사용
-        if saved_path and session_id:
-            # video_url = upload_video_to_firebase(saved_path) # Firebase 업로드 생략
-            
-            # 로컬 URL 생성 (서버 IP 기반)
-            server_ip = get_host_ip()
-            filename = pathlib.Path(saved_path).name
-            video_url = f"http://{server_ip}:8000/assets/{filename}"
-            
-            print(f"🔗 로컬 비디오 URL 생성: {video_url}")
-            
-            if video_url:
-                save_video_message_to_firestore(session_id, video_url)
-        elif saved_path:
-            print("⚠️ 세션 ID가 없어 Firestore에 저장하지 못했습니다. (로컬 파일만 생성됨)")
\ No newline at end of file
+        if saved_path:
+            publish_video_result(session_id, saved_path)
\ No newline at end of file
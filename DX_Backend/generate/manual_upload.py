@@ -8,9 +8,13 @@ from firebase_admin import storage, credentials, firestore
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
+from storage_upload import resolve_bucket, forget_bucket, upload_video_file
+
 # We'll use the correct key file now
 PROJECT_ROOT = Path("/Users/harry/LG DX SCHOOL/lgdx_backend")
 KEY_PATH = PROJECT_ROOT / "vision/FirebaseAdmin.json"
+# Cache key for the working bucket name (storage_upload.resolve_bucket / forget_bucket)
+BUCKET_CACHE_KEY = "lgdx-6054d"
 
 def init_firebase_custom():
     if not firebase_admin._apps:
@@ -45,46 +49,22 @@ def get_latest_session_id():
         print(f"❌ Error getting session: {e}")
         return None, None
 
-def upload_video_custom(file_path, bucket_name):
-    print(f"   Trying bucket: {bucket_name}")
+def upload_video_custom(file_path, bucket_names):
     try:
         # Ensure app is initialized
         init_firebase_custom()
-            
-        bucket = storage.bucket(name=bucket_name)
-        
-        # Check if bucket exists/accessible by listing blobs
-        blobs_iter = bucket.list_blobs(prefix="chat_rooms/", max_results=1)
-        _ = list(blobs_iter) 
-        
-        # If we are here, bucket exists. Proceed with logic.
-        blobs = list(bucket.list_blobs(prefix="chat_rooms/"))
-        max_num = 0
-        for b in blobs:
-            name = b.name
-            if name.startswith("chat_rooms/video_") and name.endswith(".mp4"):
-                try:
-                    num_part = name[17:-4]
-                    num = int(num_part)
-                    if num > max_num:
-                        max_num = num
-                except ValueError:
-                    continue
-        
-        next_num = max_num + 1
-        new_filename = f"video_{next_num:05d}.mp4"
-        storage_path = f"chat_rooms/{new_filename}"
-        
-        print(f"   🔢 Filename: {storage_path}")
-        blob = bucket.blob(storage_path)
-        blob.metadata = {"contentType": "video/mp4"}
-        blob.upload_from_filename(file_path)
-        blob.make_public()
-        
-        return blob.public_url
+
+        # Probes candidates only once; the working bucket name is cached in .video_state/
+        bucket = resolve_bucket(bucket_names, cache_key=BUCKET_CACHE_KEY)
+        if bucket is None:
+            return None
+
+        # Counter-based name (no list_blobs scan) + resumable chunked upload
+        return upload_video_file(bucket, file_path)
 
     except Exception as e:
-        print(f"   ❌ Failed with {bucket_name}: {e}")
+        forget_bucket(BUCKET_CACHE_KEY)
+        print(f"   ❌ Upload failed: {e}")
         return None
 
 def save_video_message(session_id, collection_type, video_url):
@@ -136,14 +116,10 @@ def manual_upload_flow(file_path):
         "staging.lgdx-6054d.appspot.com"
     ]
     
-    video_url = None
-    for b in candidate_buckets:
-        video_url = upload_video_custom(file_path, b)
-        if video_url:
-            print(f"✅ Upload successful! URL: {video_url}")
-            break
-            
-    if not video_url:
+    video_url = upload_video_custom(file_path, candidate_buckets)
+    if video_url:
+        print(f"✅ Upload successful! URL: {video_url}")
+    else:
         print("❌ All bucket attempts failed.")
         return
 
@@ -0,0 +1,433 @@
+import os
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from video_providers import (
+    STATE_DIR,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    PENDING_STATUSES,
+    ProviderRouter,
+    VideoJob,
+    VideoProvider,
+)
+
+##################### 영상 생성 1초에 천원이니까 신중하게 돌릴 것 #######################
+# Sora / Veo 장기 실행 작업을 asyncio로 한 번에 여러 개 추적하는 매니저
+#
+# - time.sleep(3) 고정 폴링 대신 backoff-with-cap 폴링 스케줄
+# - 제출 즉시 operation id를 SQLite(job registry)에 저장 → 크래시 나도 결제된 렌더를 잃지 않음
+# - 진행률은 같은 registry에 기록 → 서버(/check-video-status)가 읽어서 앱에 전달
+# - /generate-video 요청마다 generate.py 프로세스가 따로 뜨므로 작업마다 임대(owner + heartbeat)를 둠
+#   → 다른 프로세스가 추적 중인 작업은 건드리지 않고, heartbeat가 LEASE_SEC 넘게 끊긴 작업만 이어받음
+
+OPERATIONS_DB_PATH = STATE_DIR / "operations.db"
+
+# registry 전용 상태 (공급자 상태 외에 "다운로드까지 끝남"을 구분)
+STATUS_DOWNLOADED = "downloaded"
+
+LEASE_SEC = 120.0            # heartbeat가 이보다 오래 끊기면 다른 프로세스가 이어받을 수 있음 (폴링 간격 cap보다 충분히 길게)
+MAX_RESUME_FAILURES = 3      # 복원이 이만큼 연속 실패하면 (공급자 쪽에서 만료 등) 실패 처리
+RESUME_GRACE_SEC = 30.0      # 새 작업이 끝난 뒤 이어받은 작업을 더 기다려 주는 시간 (나머지는 다음 실행에서)
+
+
+def make_owner_id() -> str:
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def backoff_schedule(
+    initial: float = 2.0,
+    factor: float = 1.5,
+    cap: float = 20.0,
+    jitter: float = 0.1,
+) -> Iterator[float]:
+    """2s → 3s → 4.5s ... 최대 cap 초까지 늘어나는 폴링 간격 (± jitter 비율)"""
+    delay = initial
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(cap, delay * factor)
+
+
+# =========================================
+# 1. Job Registry (SQLite)
+# =========================================
+class JobRegistry:
+    """
+    영상 생성 작업 상태 저장소.
+    generate.py(작업 프로세스)와 mod_chatbot_server.py(조회)가 같은 파일을 공유함.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = OPERATIONS_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS operations (
+                job_id       TEXT PRIMARY KEY,
+                provider     TEXT NOT NULL,
+                prompt       TEXT,
+                output_path  TEXT,
+                session_id   TEXT,
+                seconds      INTEGER DEFAULT 0,
+                status       TEXT NOT NULL,
+                progress     INTEGER DEFAULT 0,
+                error        TEXT,
+                submitted_at REAL,
+                updated_at   REAL,
+                owner        TEXT,
+                heartbeat_at REAL,
+                resume_failures INTEGER DEFAULT 0
+            )
+            """
+        )
+        self.conn.commit()
+
+    def add(
+        self,
+        job: VideoJob,
+        prompt: str,
+        output_path: str,
+        session_id: Optional[str] = None,
+        owner: Optional[str] = None,
+    ):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO operations
+                (job_id, provider, prompt, output_path, session_id, seconds, status, progress, error,
+                 submitted_at, updated_at, owner, heartbeat_at, resume_failures)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                (job.job_id, job.provider, prompt, output_path, session_id, job.seconds,
+                 job.status, job.progress, job.error, job.submitted_at, now, owner, now if owner else None),
+            )
+            self.conn.commit()
+
+    def update(self, job_id: str, status: str, progress: int, error: Optional[str] = None):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE operations SET status = ?, progress = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, progress, error, time.time(), job_id),
+            )
+            self.conn.commit()
+
+    # ---------- 임대 (여러 generate.py 프로세스가 같은 작업을 중복 추적하지 않게) ----------
+    def claim(self, job_id: str, owner: str, lease_sec: float = LEASE_SEC) -> bool:
+        """비어 있거나 heartbeat가 끊긴 작업만 가져옴 (원자적 UPDATE). 성공하면 True"""
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                """
+                UPDATE operations SET owner = ?, heartbeat_at = ?
+                 WHERE job_id = ?
+                   AND (owner IS NULL OR owner = ? OR heartbeat_at IS NULL OR heartbeat_at < ?)
+                """,
+                (owner, now, job_id, owner, now - lease_sec),
+            )
+            self.conn.commit()
+            return cur.rowcount == 1
+
+    def heartbeat(self, job_id: str, owner: str):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE operations SET heartbeat_at = ? WHERE job_id = ? AND owner = ?",
+                (time.time(), job_id, owner),
+            )
+            self.conn.commit()
+
+    def release(self, job_id: str, owner: str):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE operations SET owner = NULL, heartbeat_at = NULL WHERE job_id = ? AND owner = ?",
+                (job_id, owner),
+            )
+            self.conn.commit()
+
+    def record_resume_failure(self, job_id: str, error: str, max_failures: int = MAX_RESUME_FAILURES) -> bool:
+        """복원 실패 횟수 +1, max_failures에 닿으면 실패 처리. 실패 처리했으면 True"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE operations SET resume_failures = COALESCE(resume_failures, 0) + 1 WHERE job_id = ?",
+                (job_id,),
+            )
+            failures = self.conn.execute(
+                "SELECT resume_failures FROM operations WHERE job_id = ?", (job_id,),
+            ).fetchone()[0]
+            if failures >= max_failures:
+                self.conn.execute(
+                    "UPDATE operations SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                    (STATUS_FAILED, f"복원 {failures}회 실패: {error}", time.time(), job_id),
+                )
+            self.conn.commit()
+            return failures >= max_failures
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM operations WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest(self, session_id: Optional[str] = None) -> Optional[Dict]:
+        if session_id:
+            row = self.conn.execute(
+                "SELECT * FROM operations WHERE session_id = ? ORDER BY submitted_at DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+        else:
+            row = self.conn.execute("SELECT * FROM operations ORDER BY submitted_at DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> List[Dict]:
+        """아직 다운로드까지 끝나지 않은 작업 (크래시 복구 대상)"""
+        placeholders = ",".join("?" for _ in PENDING_STATUSES + (STATUS_COMPLETED,))
+        rows = self.conn.execute(
+            f"SELECT * FROM operations WHERE status IN ({placeholders}) ORDER BY submitted_at",
+            PENDING_STATUSES + (STATUS_COMPLETED,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+# =========================================
+# 2. Operation Manager (asyncio)
+# =========================================
+class OperationManager:
+    """
+    여러 영상 생성 작업을 동시에 추적.
+    공급자 SDK는 동기 함수라서 submit/poll/download는 스레드에서 실행하고,
+    대기는 asyncio.sleep으로 처리해 작업 수가 늘어도 프로세스를 막지 않음.
+    """
+
+    def __init__(
+        self,
+        provider: Union[VideoProvider, ProviderRouter],
+        registry: Optional[JobRegistry] = None,
+        max_concurrent_calls: int = 4,
+        initial_delay: float = 2.0,
+        backoff_factor: float = 1.5,
+        max_delay: float = 20.0,
+        timeout: float = 15 * 60,
+    ):
+        if isinstance(provider, ProviderRouter):
+            self.router: Optional[ProviderRouter] = provider
+            self.providers: Dict[str, VideoProvider] = dict(provider.providers)
+        else:
+            self.router = None
+            self.providers = {provider.name: provider}
+        self.registry = registry or JobRegistry()
+        self.initial_delay = initial_delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._api_slots = asyncio.Semaphore(max_concurrent_calls)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._sessions: Dict[str, Optional[str]] = {}   # 이어받은 작업 job_id → 요청한 방(session_id)
+        self.owner = make_owner_id()
+
+    async def _call(self, fn, *args):
+        # 동시 API 호출 수 제한
+        async with self._api_slots:
+            return await asyncio.to_thread(fn, *args)
+
+    def _candidates(self, seconds: Optional[int]) -> List[VideoProvider]:
+        if self.router:
+            return self.router.ranked(seconds)
+        return list(self.providers.values())
+
+    async def submit(
+        self,
+        prompt: str,
+        output_path: str,
+        seconds: Optional[int] = None,
+        session_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """작업 제출 + registry 저장 + 백그라운드 추적 시작. job_id 반환"""
+        for provider in self._candidates(seconds):
+            try:
+                job = await self._call(provider.submit, prompt, seconds)
+            except Exception as e:
+                print(f"❌ [{provider.name}] 제출 실패: {e}")
+                if self.router:
+                    self.router.record_error(provider.name)
+                continue
+
+            # 폴링 전에 먼저 저장 (여기서 죽어도 job_id는 남음)
+            self.registry.add(job, prompt, output_path, session_id, owner=self.owner)
+            print(f"📝 작업 등록: {job.job_id} ({provider.name})")
+            self._track(job, provider, output_path)
+            return job.job_id
+
+        print("❌ 모든 공급자 제출 실패")
+        return None
+
+    def _track(self, job: VideoJob, provider: VideoProvider, output_path: str):
+        self._tasks[job.job_id] = asyncio.create_task(self._poll_until_done(job, provider, output_path))
+
+    async def _poll_until_done(self, job: VideoJob, provider: VideoProvider, output_path: str) -> Optional[str]:
+        deadline = time.time() + self.timeout
+        schedule = backoff_schedule(self.initial_delay, self.backoff_factor, self.max_delay)
+        last_state = None
+
+        try:
+            while not job.done:
+                if time.time() > deadline:
+                    # 타임아웃이어도 registry에는 남겨 둠 → 다음 실행 때 resume_pending()으로 재개
+                    print(f"⌛ [{provider.name}] {job.job_id} 대기 시간 초과 (다음 실행 때 재개)")
+                    return None
+                await asyncio.sleep(next(schedule))
+                job = await self._call(provider.poll, job)
+                self.registry.heartbeat(job.job_id, self.owner)
+                # 진행률이 0%인 채로 queued → in_progress 가 되는 경우도 기록
+                if (job.status, job.progress) != last_state:
+                    last_state = (job.status, job.progress)
+                    self.registry.update(job.job_id, job.status, job.progress)
+                    print(f"⏳ [{provider.name}] {job.job_id} 상태: {job.status}, 진행률: {job.progress}%")
+
+            if self.router:
+                self.router.record(job)
+
+            if job.status == STATUS_FAILED:
+                self.registry.update(job.job_id, STATUS_FAILED, job.progress, job.error)
+                print(f"❌ [{provider.name}] 생성 실패: {job.error}")
+                return None
+
+            self.registry.update(job.job_id, STATUS_COMPLETED, 100)
+            self.registry.heartbeat(job.job_id, self.owner)
+            saved = await self._call(provider.download, job, output_path)
+            self.registry.update(job.job_id, STATUS_DOWNLOADED, 100)
+            return saved
+
+        except Exception as e:
+            # 네트워크 오류 등: 상태는 그대로 두고 다음 실행에서 재개 가능하게 함
+            print(f"⚠️ [{provider.name}] {job.job_id} 추적 오류: {e}")
+            return None
+        finally:
+            # 끝났든 중단됐든(타임아웃/취소) 임대 해제 → 미완료면 다른 실행이 바로 이어받을 수 있음
+            self.registry.release(job.job_id, self.owner)
+
+    async def resume_pending(self) -> List[str]:
+        """
+        registry에 남아 있는 미완료 작업 중 추적하는 프로세스가 없는 것만 이어받음 (크래시 복구).
+        복원이 MAX_RESUME_FAILURES번 연속 실패한 작업은 실패로 기록.
+        """
+        resumed = []
+        for row in self.registry.unfinished():
+            provider = self.providers.get(row["provider"])
+            if not provider or row["job_id"] in self._tasks:
+                continue
+            if not self.registry.claim(row["job_id"], self.owner):
+                continue   # 다른 프로세스가 추적 중
+            try:
+                job = await self._call(provider.resume, row["job_id"], row["seconds"] or 0)
+            except Exception as e:
+                self.registry.release(row["job_id"], self.owner)
+                if self.registry.record_resume_failure(row["job_id"], str(e)):
+                    print(f"❌ [{row['provider']}] {row['job_id']} 복원 불가 → 실패 처리: {e}")
+                else:
+                    print(f"⚠️ [{row['provider']}] {row['job_id']} 복원 실패: {e}")
+                continue
+            print(f"♻️ 이전 작업 재개: {row['job_id']} ({row['provider']}, {job.status})")
+            self._track(job, provider, row["output_path"])
+            self._sessions[row["job_id"]] = row["session_id"]
+            resumed.append(row["job_id"])
+        return resumed
+
+    def resumed_results(self) -> List[Tuple[Optional[str], str]]:
+        """이어받아 이번 실행에서 다운로드까지 끝난 작업의 (session_id, 저장 경로) 목록"""
+        results = []
+        for job_id, session_id in self._sessions.items():
+            task = self._tasks.get(job_id)
+            if task and task.done() and not task.cancelled() and task.result():
+                results.append((session_id, task.result()))
+        return results
+
+    async def wait(self, job_id: str) -> Optional[str]:
+        task = self._tasks.get(job_id)
+        return await task if task else None
+
+    async def wait_others(self, exclude: Optional[str] = None, timeout: Optional[float] = None):
+        """exclude 외 작업을 timeout초까지만 기다림 (남은 작업은 종료 시 임대 해제 → 다음 실행이 이어받음)"""
+        others = [t for i, t in self._tasks.items() if i != exclude and not t.done()]
+        if others:
+            await asyncio.wait(others, timeout=timeout)
+
+    async def wait_all(self) -> Dict[str, Optional[str]]:
+        ids = list(self._tasks)
+        results = await asyncio.gather(*(self._tasks[i] for i in ids))
+        return dict(zip(ids, results))
+
+
+def run_generation(
+    provider: Union[VideoProvider, ProviderRouter],
+    prompt: str,
+    output_path: str,
+    seconds: Optional[int] = None,
+    session_id: Optional[str] = None,
+    on_recovered: Optional[Callable[[Optional[str], str], None]] = None,
+) -> Optional[str]:
+    """
+    스크립트용 진입점: 추적하는 프로세스가 없는 이전 작업을 이어받고, 새 작업을 제출해
+    새 작업이 끝날 때까지만 기다린 뒤 저장 경로를 반환.
+    이어받은 작업은 RESUME_GRACE_SEC까지만 더 기다리고 나머지는 다음 실행에 넘김.
+    이어받은 작업 중 완료된 것은 on_recovered(그 작업을 요청한 session_id, 저장 경로)로 넘김
+    (새 작업 결과만 반환하므로, 호출부가 원래 방에 따로 올려야 함).
+    """
+    async def _run():
+        manager = OperationManager(provider)
+        try:
+            await manager.resume_pending()
+            job_id = await manager.submit(prompt, output_path, seconds=seconds, session_id=session_id)
+            result = await manager.wait(job_id) if job_id else None
+            await manager.wait_others(exclude=job_id, timeout=RESUME_GRACE_SEC)
+            for task in manager._tasks.values():
+                task.cancel()
+            await asyncio.gather(*manager._tasks.values(), return_exceptions=True)
+            if on_recovered:
+                for recovered_session, saved in manager.resumed_results():
+                    try:
+                        on_recovered(recovered_session, saved)
+                    except Exception as e:
+                        print(f"⚠️ 복구된 영상 전달 실패 ({recovered_session}): {e}")
+            return result
+        finally:
+            manager.registry.close()
+
+    return asyncio.run(_run())
+
+
+# =========================================
+# 3. 오프라인 동시 추적 데모 (API 호출 없음)
+# =========================================
+if __name__ == "__main__":
+    import tempfile
+    from video_providers import FakeVideoProvider
+
+    async def _demo():
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = JobRegistry(Path(tmp) / "operations.db")
+            manager = OperationManager(
+                FakeVideoProvider(queue_delay=0.5, render_delay=2.0),
+                registry=registry,
+                initial_delay=0.2,
+                max_delay=1.0,
+            )
+            start = time.time()
+            for i in range(20):
+                await manager.submit(f"demo prompt {i}", str(Path(tmp) / f"demo_{i}.mp4"))
+            results = await manager.wait_all()
+            ok = sum(1 for r in results.values() if r)
+            print(f"\n✅ {ok}/{len(results)}건 완료, {time.time() - start:.2f}s (작업 1건 렌더 2.5s)")
+            registry.close()
+
+    asyncio.run(_demo())
@@ -0,0 +1,277 @@
+import os
+import json
+import uuid
+import datetime
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import requests
+from firebase_admin import firestore
+from firebase_admin import storage
+
+from video_providers import STATE_DIR
+
+# Firebase Storage 업로드 공통 모듈
+# (generate.py / Geminigenerate.py / manual_upload.py 가 같이 사용)
+#
+# - 파일명: chat_rooms/ 전체를 list_blobs로 훑던 방식 → Firestore 카운터 문서(트랜잭션)로 O(1) 발급
+#           카운터를 못 쓰면 UUID 기반 이름으로 대체 (어느 쪽이든 동시 업로드에도 충돌 없음)
+# - 버킷: 후보 버킷을 매번 차례로 찌르던 방식 → 한 번 성공한 버킷 이름을 캐시
+# - 업로드: 재개 가능한(resumable) 청크 업로드, 큰 파일은 병렬 파트 업로드
+#   병렬 파트 업로드는 진행 상태를 저장하지 않음 → 실패하면 같은 실행 안에서 resumable로 다시 올리고,
+#   그 뒤로는 저장된 세션이 있으므로 다음 실행도 resumable로 이어서 올림
+#   (병렬 업로드 도중 프로세스가 죽으면 그 파일은 처음부터 다시 올라감)
+
+VIDEO_PREFIX = "chat_rooms"
+COUNTER_COLLECTION = "counters"
+COUNTER_DOC = "chat_room_videos"
+
+BUCKET_CACHE_PATH = STATE_DIR / "bucket_cache.json"
+UPLOAD_SESSIONS_PATH = STATE_DIR / "upload_sessions.json"
+
+CHUNK_SIZE = 8 * 1024 * 1024               # resumable 청크 크기 (256KB 배수여야 함)
+PARALLEL_THRESHOLD = 32 * 1024 * 1024      # 이 크기 이상이면 병렬 파트 업로드
+PARALLEL_WORKERS = 4
+
+_bucket_cache = {}
+_state_lock = threading.Lock()
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"⚠️ 상태 파일 읽기 실패 ({path.name}): {e}")
+    return {}
+
+
+def _write_json(path: Path, data: dict):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    except Exception as e:
+        print(f"⚠️ 상태 파일 저장 실패 ({path.name}): {e}")
+
+
+# =========================================
+# 1. 버킷 확인 + 캐시
+# =========================================
+def resolve_bucket(candidates: List[str], cache_key: str = "default"):
+    """
+    후보 버킷 중 접근 가능한 첫 번째 버킷을 반환.
+    성공한 이름은 프로세스 메모리 + BUCKET_CACHE_PATH에 저장해서 다음 실행부터는 확인 없이 바로 사용.
+    """
+    candidates = [c for c in candidates if c]
+
+    name = _bucket_cache.get(cache_key) or _read_json(BUCKET_CACHE_PATH).get(cache_key)
+    if name and name in candidates:
+        return storage.bucket(name=name)
+
+    for name in candidates:
+        print(f"   Trying bucket: {name}")
+        try:
+            bucket = storage.bucket(name=name)
+            # 접근 가능 여부만 확인 (1개만 조회)
+            list(bucket.list_blobs(max_results=1))
+        except Exception as e:
+            print(f"   ❌ Failed with {name}: {e}")
+            continue
+
+        with _state_lock:
+            _bucket_cache[cache_key] = name
+            cache = _read_json(BUCKET_CACHE_PATH)
+            cache[cache_key] = name
+            _write_json(BUCKET_CACHE_PATH, cache)
+        return bucket
+
+    return None
+
+
+def forget_bucket(cache_key: str = "default"):
+    """캐시된 버킷으로 업로드가 실패했을 때 호출 → 다음 번엔 후보를 다시 확인"""
+    with _state_lock:
+        _bucket_cache.pop(cache_key, None)
+        cache = _read_json(BUCKET_CACHE_PATH)
+        if cache.pop(cache_key, None):
+            _write_json(BUCKET_CACHE_PATH, cache)
+
+
+# =========================================
+# 2. 충돌 없는 파일명 발급
+# =========================================
+def _scan_max_video_number(bucket, prefix: str = VIDEO_PREFIX) -> int:
+    """
+    카운터 문서가 아직 없을 때 한 번만 쓰는 초기값 계산 (기존 video_NNNNN 중 최댓값).
+    """
+    head = f"{prefix}/video_"
+    max_num = 0
+    for b in bucket.list_blobs(prefix=head):
+        name = b.name
+        if name.endswith(".mp4"):
+            try:
+                max_num = max(max_num, int(name[len(head):-4]))
+            except ValueError:
+                continue
+    return max_num
+
+
+def next_video_storage_path(bucket, prefix: str = VIDEO_PREFIX) -> str:
+    """
+    Firestore 카운터(counters/chat_room_videos.next)를 트랜잭션으로 1 증가시켜 번호 발급.
+    기존과 같은 chat_rooms/video_00001.mp4 형식을 유지함.
+    Firestore를 쓸 수 없으면 UUID 기반 이름으로 대체.
+    """
+    try:
+        db = firestore.client()
+        counter_ref = db.collection(COUNTER_COLLECTION).document(COUNTER_DOC)
+
+        seed = None
+        if not counter_ref.get().exists:
+            seed = _scan_max_video_number(bucket, prefix)
+            print(f"🔢 카운터 문서가 없어 기존 파일 기준으로 초기화합니다 (현재 최댓값: {seed})")
+
+        @firestore.transactional
+        def _allocate(transaction):
+            snap = counter_ref.get(transaction=transaction)
+            current = snap.get("next") if snap.exists else (seed or 0) + 1
+            transaction.set(counter_ref, {"next": current + 1}, merge=True)
+            return current
+
+        num = _allocate(db.transaction())
+        return f"{prefix}/video_{num:05d}.mp4"
+
+    except Exception as e:
+        print(f"⚠️ 카운터 발급 실패, UUID 파일명 사용: {e}")
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{prefix}/video_{stamp}_{uuid.uuid4().hex[:8]}.mp4"
+
+
+# =========================================
+# 3. 재개 가능한 청크 업로드
+# =========================================
+def _session_key(file_path: str) -> str:
+    st = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{st.st_size}|{int(st.st_mtime)}"
+
+
+def _pending_storage_path(file_path: str) -> Optional[str]:
+    """같은 파일의 끊긴 업로드가 있으면 그때 발급받은 storage 경로를 재사용"""
+    entry = _read_json(UPLOAD_SESSIONS_PATH).get(_session_key(file_path))
+    return entry.get("storage_path") if entry else None
+
+
+def _query_offset(session_url: str, total: int) -> Optional[int]:
+    """서버에 이미 올라간 바이트 수. 세션이 만료됐으면 None"""
+    resp = requests.put(session_url, headers={"Content-Range": f"bytes */{total}"}, timeout=30)
+    if resp.status_code in (200, 201):
+        return total
+    if resp.status_code == 308:
+        rng = resp.headers.get("Range")
+        return int(rng.split("-")[1]) + 1 if rng else 0
+    return None
+
+
+def _resumable_upload(blob, file_path: str, storage_path: str, content_type: str, chunk_size: int):
+    """
+    resumable 세션 URL을 UPLOAD_SESSIONS_PATH에 저장해 두고 청크 단위로 PUT.
+    중간에 프로세스가 죽어도 다음 실행에서 서버에 이미 올라간 offset부터 이어서 올림.
+    """
+    total = os.path.getsize(file_path)
+    key = _session_key(file_path)
+
+    entry = _read_json(UPLOAD_SESSIONS_PATH).get(key) or {}
+    session_url = entry.get("session_url") if entry.get("storage_path") == storage_path else None
+    offset = 0
+
+    if session_url:
+        offset = _query_offset(session_url, total)
+        if offset is None:
+            session_url, offset = None, 0  # 만료된 세션 → 새로 시작
+        else:
+            print(f"♻️ 이전 업로드 이어서 진행: {offset}/{total} bytes")
+
+    if not session_url:
+        session_url = blob.create_resumable_upload_session(content_type=content_type, size=total)
+        with _state_lock:
+            sessions = _read_json(UPLOAD_SESSIONS_PATH)
+            sessions[key] = {"storage_path": storage_path, "session_url": session_url}
+            _write_json(UPLOAD_SESSIONS_PATH, sessions)
+
+    with open(file_path, "rb") as f:
+        while offset < total:
+            f.seek(offset)
+            data = f.read(chunk_size)
+            end = offset + len(data) - 1
+            resp = requests.put(
+                session_url,
+                data=data,
+                headers={"Content-Range": f"bytes {offset}-{end}/{total}"},
+                timeout=120,
+            )
+            if resp.status_code in (200, 201):
+                offset = total
+            elif resp.status_code == 308:
+                rng = resp.headers.get("Range")
+                offset = int(rng.split("-")[1]) + 1 if rng else 0
+            else:
+                raise RuntimeError(f"청크 업로드 실패 ({resp.status_code}): {resp.text[:200]}")
+
+    with _state_lock:
+        sessions = _read_json(UPLOAD_SESSIONS_PATH)
+        sessions.pop(key, None)
+        _write_json(UPLOAD_SESSIONS_PATH, sessions)
+
+
+def _has_resumable_session(file_path: str, storage_path: str) -> bool:
+    entry = _read_json(UPLOAD_SESSIONS_PATH).get(_session_key(file_path)) or {}
+    return bool(entry.get("session_url")) and entry.get("storage_path") == storage_path
+
+
+def _parallel_upload(blob, file_path: str, content_type: str, chunk_size: int, workers: int):
+    """큰 파일: XML multipart 병렬 파트 업로드 (google-cloud-storage transfer_manager, 이어 올리기 없음)"""
+    from google.cloud.storage import transfer_manager
+
+    blob.content_type = content_type
+    transfer_manager.upload_chunks_concurrently(
+        file_path,
+        blob,
+        chunk_size=chunk_size,
+        max_workers=workers,
+    )
+
+
+def upload_video_file(
+    bucket,
+    file_path: str,
+    storage_path: Optional[str] = None,
+    content_type: str = "video/mp4",
+    make_public: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+    parallel_threshold: int = PARALLEL_THRESHOLD,
+    workers: int = PARALLEL_WORKERS,
+) -> str:
+    """
+    파일 하나를 업로드하고 public URL(또는 gs 경로)을 반환.
+    실패 시 예외를 그대로 올림 (호출부에서 기존처럼 print 후 None 처리).
+    """
+    storage_path = storage_path or _pending_storage_path(file_path) or next_video_storage_path(bucket)
+    print(f"🔢 다음 파일명 결정: {storage_path}")
+
+    blob = bucket.blob(storage_path)
+    size = os.path.getsize(file_path)
+
+    if size >= parallel_threshold and not _has_resumable_session(file_path, storage_path):
+        try:
+            _parallel_upload(blob, file_path, content_type, chunk_size, workers)
+        except Exception as e:
+            print(f"⚠️ 병렬 업로드 실패, 이어 올리기 가능한 청크 업로드로 다시 시도: {e}")
+            _resumable_upload(blob, file_path, storage_path, content_type, chunk_size)
+    else:
+        _resumable_upload(blob, file_path, storage_path, content_type, chunk_size)
+
+    if make_public:
+        blob.make_public()
+        return blob.public_url
+    return f"gs://{bucket.name}/{storage_path}"
@@ -26,6 +26,12 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
+# /ws/chat 바이너리 프레임 (ws_frames.py)
+try:
+    from ws_frames import FRAME_AUDIO_IN, FRAME_AUDIO_OUT, FRAME_IMAGE, SeqCounter, SeqTracker, pack_frame, unpack_frame
+except ImportError:
+    from vision.ws_frames import FRAME_AUDIO_IN, FRAME_AUDIO_OUT, FRAME_IMAGE, SeqCounter, SeqTracker, pack_frame, unpack_frame
+
 
 # [Firebase 라이브러리 추가]
 try:
@@ -309,15 +315,43 @@ class SupabaseRAG:
         else:
             print("❌ Supabase URL 또는 Key(supbase_service_role)를 찾을 수 없습니다.")
 
-    def get_embedding(self, text):
+    # 임베딩 모델/차원/검색 함수 (DB embedding_config 한 줄, RAG/embedding_config.py와 같은 값)
+    # 모델 전환(RAG/reembed.py flip) 후 CONFIG_TTL초 안에 따라감. 테이블이 없으면 기본값
+    DEFAULT_EMBEDDING_CONFIG = {
+        "model": "text-embedding-004",
+        "dim": 768,
+        "search_function": "hybrid_search",
+    }
+    CONFIG_TTL = float(os.getenv("EMBEDDING_CONFIG_TTL", "30"))
+    _embedding_config = None
+    _embedding_config_at = 0.0
+
+    def get_embedding_config(self):
+        if self._embedding_config and time.monotonic() - self._embedding_config_at < self.CONFIG_TTL:
+            return self._embedding_config
+        config = dict(self.DEFAULT_EMBEDDING_CONFIG)
+        try:
+            res = self.client.table("embedding_config") \
+                .select("model, dim, search_function").eq("id", 1).limit(1).execute()
+            if res.data:
+                config.update(res.data[0])
+        except Exception as e:
+            print(f"⚠️ embedding_config 조회 실패 (기본 설정 사용): {e}")
+        self._embedding_config = config
+        self._embedding_config_at = time.monotonic()
+        return config
+
+    def get_embedding(self, text, config=None):
         if not self.gemini_client: return None
+        config = config or self.DEFAULT_EMBEDDING_CONFIG
         try:
             # 텍스트 임베딩 생성 (Gemini)
             response = self.gemini_client.models.embed_content(
-                model="text-embedding-004",
+                model=config["model"],
                 contents=text,
                 config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_QUERY"
+                    task_type="RETRIEVAL_QUERY",
+                    output_dimensionality=config["dim"],
                 )
             )
             if hasattr(response, 'embeddings') and response.embeddings:
@@ -330,12 +364,13 @@ class SupabaseRAG:
     def search(self, query, k=3):
         if not self.client: return []
         
-        # 1. 벡터 생성
-        embedding = self.get_embedding(query)
+        # 1. 벡터 생성 (질의 모델과 검색 함수는 같은 설정에서 꺼냄)
+        config = self.get_embedding_config()
+        embedding = self.get_embedding(query, config)
         
         # 임베딩 실패 시 0으로 채운 더미 벡터 사용
         if not embedding: 
-            embedding = [0.0] * 768 
+            embedding = [0.0] * config["dim"]
 
         # 2. 하이브리드 검색 요청
         # (SQL 함수 파라미터 이름과 정확히 일치해야 합니다)
@@ -347,8 +382,8 @@ class SupabaseRAG:
         }
         
         try:
-            # RPC 호출: hybrid_search
-            response = self.client.rpc("hybrid_search", params).execute()
+            # RPC 호출: hybrid_search (모델 전환 후에는 hybrid_search_next)
+            response = self.client.rpc(config["search_function"], params).execute()
             
             results = []
             seen_content = set()
@@ -535,6 +570,21 @@ async def websocket_endpoint(websocket: WebSocket):
     latest_image = {"data": None}
     last_send_time = {"ts": 0.0}
 
+    # 오디오 프레임 방식 (ws_frames.py): ?audio=binary 로 접속했거나 헤더 있는 바이너리를 받으면 바이너리로 응답
+    # 그 전(예전 클라이언트)에는 base64 JSON으로 응답
+    binary_audio = {"enabled": websocket.query_params.get("audio") == "binary"}
+    uplink_seq = SeqTracker()
+    downlink_seq = SeqCounter()
+
+    async def send_audio_to_flutter(audio_bytes: bytes):
+        if binary_audio["enabled"]:
+            await websocket.send_bytes(pack_frame(FRAME_AUDIO_OUT, downlink_seq.next(), audio_bytes))
+        else:
+            await websocket.send_json({
+                "type": "audio",
+                "data": base64.b64encode(audio_bytes).decode('utf-8')
+            })
+
     # 사용자 발화 누적 버퍼 (끊어진 텍스트를 합쳐서 Firebase에 한 번에 저장)
     buffer_path = Path(__file__).parent / "user_buffer.txt"
     try:
@@ -588,6 +638,18 @@ async def websocket_endpoint(websocket: WebSocket):
     async with client.aio.live.connect(model=MODEL_ID, config=config) as session:
         print("✅ Gemini Live Session Started")
 
+        # 16kHz PCM 오디오를 Gemini로 전달 (바이너리 프레임/예전 base64 JSON 공통)
+        async def forward_audio(audio_bytes: bytes):
+            if len(audio_bytes) < 320:  # 160 samples * 2 bytes
+                return
+            try:
+                await session.send_realtime_input(
+                    audio=types.Blob(data=audio_bytes, mime_type="audio/pcm;rate=16000")
+                )
+            except Exception as e:
+                print(f"⚠️ [Receive] 오디오 전송 실패: {e}")
+                raise
+
         # [Task 1] WebSocket -> Gemini (Receive from Flutter, binary 우선)
         async def receive_from_flutter():
             print("👂 [Receive] 코루틴 시작 - Flutter 바이너리/텍스트 수신 대기")
@@ -596,38 +658,33 @@ async def websocket_endpoint(websocket: WebSocket):
                     try:
                         msg = await asyncio.wait_for(websocket.receive(), timeout=300.0)
 
-                        # 바이너리(주로 JPEG 프레임) 처리: 최신 프레임 컨테이너에 덮어쓰기만
+                        # 바이너리 처리: 헤더 있는 프레임(오디오/JPEG) 또는 예전 클라이언트의 헤더 없는 JPEG
                         if msg.get("type") == "websocket.receive" and msg.get("bytes") is not None:
-                            image_bytes = msg["bytes"]
-                            latest_image["data"] = image_bytes
-                            # 디버그: 크기/해시 확인 (과도한 로그 주의)
-                            # print(f"[DBG] recv binary image bytes={len(image_bytes)}, md5={hashlib.md5(image_bytes).hexdigest()[:10]}")
+                            frame = unpack_frame(msg["bytes"])
+                            if frame is None:
+                                # 예전 클라이언트: 최신 프레임 컨테이너에 덮어쓰기만
+                                latest_image["data"] = msg["bytes"]
+                                continue
+                            frame_type, seq, payload = frame
+                            if not binary_audio["enabled"]:
+                                binary_audio["enabled"] = True
+                                print("✅ [Receive] 바이너리 프레임 클라이언트 - 오디오 응답도 바이너리로 전송")
+                            lost = uplink_seq.observe(seq)
+                            if lost:
+                                print(f"⚠️ [Receive] 프레임 누락 {lost}개 (seq {seq})")
+                            if frame_type == FRAME_AUDIO_IN:
+                                await forward_audio(payload)
+                            elif frame_type == FRAME_IMAGE:
+                                latest_image["data"] = payload
                             continue
 
-                        # 텍스트(JSON) 메시지 처리 (오디오/제어 신호)
+                        # 텍스트(JSON) 메시지 처리 (제어 신호, 예전 클라이언트의 base64 오디오)
                         if msg.get("type") == "websocket.receive" and msg.get("text") is not None:
                             data = msg["text"]
                             message = json.loads(data)
 
                             if message.get('type') == 'audio':
-                                audio_bytes = base64.b64decode(message['data'])
-
-                                if len(audio_bytes) < 320:  # 160 samples * 2 bytes
-                                    continue
-
-                                try:
-                                    await session.send_realtime_input(
-                                        audio=types.Blob(data=audio_bytes, mime_type="audio/pcm;rate=16000")
-                                    )
-                                    if not hasattr(receive_from_flutter, 'last_audio_log_time'):
-                                        receive_from_flutter.last_audio_log_time = time.time()
-                                    current_time = time.time()
-                                    # if current_time - receive_from_flutter.last_audio_log_time >= 1.0:
-                                    #     print(f"🎤 [Receive] 오디오 수신 및 전송: {len(audio_bytes)} bytes (16kHz PCM)")
-                                    #     receive_from_flutter.last_audio_log_time = current_time
-                                except Exception as e:
-                                    print(f"⚠️ [Receive] 오디오 전송 실패: {e}")
-                                    raise
+                                await forward_audio(base64.b64decode(message['data']))
 
                             elif message.get('type') == 'text':
                                 # 텍스트 메시지 (필요 시 활용)
@@ -757,15 +814,8 @@ async def websocket_endpoint(websocket: WebSocket):
                                 # 공식 문서: "Output is 24kHz" - response.data는 24kHz PCM 오디오
                                 if response.data is not None:
                                     try:
-                                        audio_b64 = base64.b64encode(response.data).decode('utf-8')
                                         send_to_flutter.total_audio_bytes += len(response.data)
-                                        await asyncio.wait_for(
-                                            websocket.send_json({
-                                                "type": "audio",
-                                                "data": audio_b64
-                                            }),
-                                            timeout=5.0
-                                        )
+                                        await asyncio.wait_for(send_audio_to_flutter(response.data), timeout=5.0)
                                         print(f"🔊 [Send] 오디오 전송 (24kHz PCM): {len(response.data)} bytes (누적: {send_to_flutter.total_audio_bytes} bytes)")
                                     except asyncio.TimeoutError:
                                         print(f"⚠️ [Send] 오디오 전송 타임아웃")
@@ -839,15 +889,11 @@ async def websocket_endpoint(websocket: WebSocket):
                                                 # response.data로 이미 처리되었으면 스킵
                                                 # 하지만 response.data가 없을 경우를 대비해 fallback
                                                 try:
-                                                    audio_b64 = base64.b64encode(part.inline_data.data).decode('utf-8')
                                                     if not hasattr(send_to_flutter, 'total_audio_bytes'):
                                                         send_to_flutter.total_audio_bytes = 0
                                                     send_to_flutter.total_audio_bytes += len(part.inline_data.data)
                                                     await asyncio.wait_for(
-                                                        websocket.send_json({
-                                                            "type": "audio",
-                                                            "data": audio_b64
-                                                        }),
+                                                        send_audio_to_flutter(part.inline_data.data),
                                                         timeout=5.0
                                                     )
                                                     print(f"🔊 [Send] 오디오 전송 (fallback): {len(part.inline_data.data)} bytes (누적: {send_to_flutter.total_audio_bytes} bytes)")
@@ -1035,6 +1081,8 @@ async def websocket_endpoint(websocket: WebSocket):
             import traceback
             traceback.print_exc()
         finally:
+            if uplink_seq.received:
+                print(f"📦 [Main] 바이너리 프레임 {uplink_seq.summary()}")
             print("🛑 [Main] 세 코루틴 종료됨")
 
 
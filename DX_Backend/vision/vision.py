@@ -19,6 +19,12 @@ import json
 import asyncio
 import hashlib
 
+# /ws/chat 바이너리 프레임 (ws_frames.py)
+try:
+    from ws_frames import FRAME_AUDIO_IN, FRAME_AUDIO_OUT, FRAME_IMAGE, SeqCounter, SeqTracker, pack_frame, unpack_frame
+except ImportError:
+    from vision.ws_frames import FRAME_AUDIO_IN, FRAME_AUDIO_OUT, FRAME_IMAGE, SeqCounter, SeqTracker, pack_frame, unpack_frame
+
 
 # [Firebase 라이브러리 추가]
 try:
@@ -268,15 +274,43 @@ class SupabaseRAG:
         else:
             print("❌ Supabase URL 또는 Key(supbase_service_role)를 찾을 수 없습니다.")
 
-    def get_embedding(self, text):
+    # 임베딩 모델/차원/검색 함수 (DB embedding_config 한 줄, RAG/embedding_config.py와 같은 값)
+    # 모델 전환(RAG/reembed.py flip) 후 CONFIG_TTL초 안에 따라감. 테이블이 없으면 기본값
+    DEFAULT_EMBEDDING_CONFIG = {
+        "model": "text-embedding-004",
+        "dim": 768,
+        "search_function": "hybrid_search",
+    }
+    CONFIG_TTL = float(os.getenv("EMBEDDING_CONFIG_TTL", "30"))
+    _embedding_config = None
+    _embedding_config_at = 0.0
+
+    def get_embedding_config(self):
+        if self._embedding_config and time.monotonic() - self._embedding_config_at < self.CONFIG_TTL:
+            return self._embedding_config
+        config = dict(self.DEFAULT_EMBEDDING_CONFIG)
+        try:
+            res = self.client.table("embedding_config") \
+                .select("model, dim, search_function").eq("id", 1).limit(1).execute()
+            if res.data:
+                config.update(res.data[0])
+        except Exception as e:
+            print(f"⚠️ embedding_config 조회 실패 (기본 설정 사용): {e}")
+        self._embedding_config = config
+        self._embedding_config_at = time.monotonic()
+        return config
+
+    def get_embedding(self, text, config=None):
         if not self.gemini_client: return None
+        config = config or self.DEFAULT_EMBEDDING_CONFIG
         try:
             # 텍스트 임베딩 생성 (Gemini)
             response = self.gemini_client.models.embed_content(
-                model="text-embedding-004",
+                model=config["model"],
                 contents=text,
                 config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_QUERY"
+                    task_type="RETRIEVAL_QUERY",
+                    output_dimensionality=config["dim"],
                 )
             )
             if hasattr(response, 'embeddings') and response.embeddings:
@@ -289,12 +323,13 @@ class SupabaseRAG:
     def search(self, query, k=3):
         if not self.client: return []
         
-        # 1. 벡터 생성
-        embedding = self.get_embedding(query)
+        # 1. 벡터 생성 (질의 모델과 검색 함수는 같은 설정에서 꺼냄)
+        config = self.get_embedding_config()
+        embedding = self.get_embedding(query, config)
         
         # 임베딩 실패 시 0으로 채운 더미 벡터 사용
         if not embedding: 
-            embedding = [0.0] * 768 
+            embedding = [0.0] * config["dim"]
 
         # 2. 하이브리드 검색 요청
         # (SQL 함수 파라미터 이름과 정확히 일치해야 합니다)
@@ -306,8 +341,8 @@ class SupabaseRAG:
         }
         
         try:
-            # RPC 호출: hybrid_search
-            response = self.client.rpc("hybrid_search", params).execute()
+            # RPC 호출: hybrid_search (모델 전환 후에는 hybrid_search_next)
+            response = self.client.rpc(config["search_function"], params).execute()
             
             results = []
             seen_content = set()
@@ -482,6 +517,11 @@ async def websocket_endpoint(websocket: WebSocket):
     # 큐 생성
     video_queue = asyncio.Queue()
     audio_queue = asyncio.Queue()
+
+    # 오디오 프레임 방식 (ws_frames.py): ?audio=binary 로 접속했거나 헤더 있는 바이너리를 받으면 바이너리로 응답
+    binary_audio = {"enabled": websocket.query_params.get("audio") == "binary"}
+    uplink_seq = SeqTracker()
+    downlink_seq = SeqCounter()
     
     async with client.aio.live.connect(model=MODEL_ID, config=config) as session:
         print("✅ Gemini Live Session Started")
@@ -490,9 +530,38 @@ async def websocket_endpoint(websocket: WebSocket):
         async def receive_from_flutter():
             try:
                 while True:
-                    # 텍스트(JSON)로 수신 (이미지/오디오는 Base64 인코딩됨)
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
+                    msg = await websocket.receive()
+                    if msg.get("type") == "websocket.disconnect":
+                        raise WebSocketDisconnect(msg.get("code", 1000))
+
+                    # 바이너리 프레임 (헤더 + 16kHz PCM / JPEG): base64/JSON 파싱 없이 바로 Gemini로
+                    if msg.get("bytes") is not None:
+                        frame = unpack_frame(msg["bytes"])
+                        if frame is None:
+                            # 헤더 없는 바이너리는 JPEG로 간주 (예전 클라이언트)
+                            await session.send_realtime_input(
+                                video=types.Blob(data=msg["bytes"], mime_type="image/jpeg")
+                            )
+                            continue
+                        frame_type, seq, payload = frame
+                        binary_audio["enabled"] = True
+                        lost = uplink_seq.observe(seq)
+                        if lost:
+                            print(f"⚠️ 프레임 누락 {lost}개 (seq {seq})")
+                        if frame_type == FRAME_AUDIO_IN:
+                            await session.send_realtime_input(
+                                audio=types.Blob(data=payload, mime_type="audio/pcm;rate=16000")
+                            )
+                        elif frame_type == FRAME_IMAGE:
+                            await session.send_realtime_input(
+                                video=types.Blob(data=payload, mime_type="image/jpeg")
+                            )
+                        continue
+                    if msg.get("text") is None:
+                        continue
+
+                    # 텍스트(JSON): 제어 메시지, 예전 클라이언트의 Base64 이미지/오디오
+                    message = json.loads(msg["text"])
                     
                     if message['type'] == 'audio':
                         # Base64 -> Bytes -> Gemini
@@ -518,6 +587,9 @@ async def websocket_endpoint(websocket: WebSocket):
                 print("🔌 Client Disconnected")
             except Exception as e:
                 print(f"Receive Error: {e}")
+            finally:
+                if uplink_seq.received:
+                    print(f"📦 바이너리 프레임 {uplink_seq.summary()}")
 
         # [Task 2] Gemini -> WebSocket (Send to Flutter)
         async def send_to_flutter():
@@ -530,11 +602,16 @@ async def websocket_endpoint(websocket: WebSocket):
                                 for part in model_turn.parts:
                                     # 오디오 데이터
                                     if part.inline_data:
-                                        audio_b64 = base64.b64encode(part.inline_data.data).decode('utf-8')
-                                        await websocket.send_json({
-                                            "type": "audio",
-                                            "data": audio_b64
-                                        })
+                                        if binary_audio["enabled"]:
+                                            await websocket.send_bytes(
+                                                pack_frame(FRAME_AUDIO_OUT, downlink_seq.next(), part.inline_data.data)
+                                            )
+                                        else:
+                                            audio_b64 = base64.b64encode(part.inline_data.data).decode('utf-8')
+                                            await websocket.send_json({
+                                                "type": "audio",
+                                                "data": audio_b64
+                                            })
                                     
                                     # 텍스트 데이터
                                     if part.text:
@@ -0,0 +1,77 @@
+import struct
+from typing import Optional, Tuple
+
+
+# =========================================
+# /ws/chat 바이너리 프레임 (오디오/이미지용, 제어 메시지는 계속 JSON 텍스트)
+#   [type 1B][version 1B][seq 4B big-endian][payload]
+#   - FRAME_AUDIO_IN  (0x01): Flutter → 서버, 16kHz 16bit mono PCM
+#   - FRAME_AUDIO_OUT (0x02): 서버 → Flutter, 24kHz 16bit mono PCM
+#   - FRAME_IMAGE     (0x03): Flutter → 서버, JPEG
+#   - seq는 방향/종류와 상관없이 보내는 쪽에서 프레임마다 1씩 증가 (2^32에서 0으로)
+#   예전 클라이언트 호환:
+#   - 헤더 없는 바이너리(JPEG는 0xFF 0xD8로 시작)는 이미지로 처리
+#   - {"type": "audio", "data": base64} JSON 오디오도 계속 받음
+#   - 서버 → 클라이언트 오디오는 ?audio=binary 로 접속했거나 헤더 있는 프레임을 받은 뒤부터 바이너리,
+#     그 전에는 예전처럼 base64 JSON
+# =========================================
+FRAME_HEADER = struct.Struct(">BBI")
+FRAME_VERSION = 1
+FRAME_AUDIO_IN = 0x01
+FRAME_AUDIO_OUT = 0x02
+FRAME_IMAGE = 0x03
+FRAME_TYPES = (FRAME_AUDIO_IN, FRAME_AUDIO_OUT, FRAME_IMAGE)
+SEQ_MOD = 1 << 32
+
+
+def pack_frame(frame_type: int, seq: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(frame_type, FRAME_VERSION, seq % SEQ_MOD) + payload
+
+
+def unpack_frame(data: bytes) -> Optional[Tuple[int, int, bytes]]:
+    """(type, seq, payload). 헤더가 없는 예전 바이너리면 None"""
+    if len(data) < FRAME_HEADER.size or data[0] not in FRAME_TYPES or data[1] != FRAME_VERSION:
+        return None
+    frame_type, _, seq = FRAME_HEADER.unpack_from(data)
+    # Blob(data=...)은 bytes만 받으므로 헤더 뒤 payload 슬라이스 한 번이 유일한 복사
+    return frame_type, seq, data[FRAME_HEADER.size:]
+
+
+class SeqCounter:
+    """보내는 쪽 seq (프레임마다 1 증가)"""
+
+    def __init__(self):
+        self.value = 0
+
+    def next(self) -> int:
+        seq = self.value
+        self.value = (self.value + 1) % SEQ_MOD
+        return seq
+
+
+class SeqTracker:
+    """받는 쪽 seq 확인: 빠진 프레임 수/순서 어긋남 집계 (로그용)"""
+
+    def __init__(self):
+        self.expected: Optional[int] = None
+        self.received = 0
+        self.lost = 0
+        self.out_of_order = 0
+
+    def observe(self, seq: int) -> int:
+        """빠진 프레임 수 반환 (순서가 어긋난 프레임은 0)"""
+        self.received += 1
+        gap = 0
+        if self.expected is not None and seq != self.expected:
+            diff = (seq - self.expected) % SEQ_MOD
+            if diff < SEQ_MOD // 2:
+                gap = diff
+                self.lost += gap
+            else:
+                self.out_of_order += 1
+                return 0
+        self.expected = (seq + 1) % SEQ_MOD
+        return gap
+
+    def summary(self) -> str:
+        return f"수신 {self.received}개, 누락 {self.lost}개, 순서 어긋남 {self.out_of_order}개"
@@ -18,7 +18,18 @@ class LiveCameraService {
   //    - Android 핫스팟: 192.168.43.x 또는 192.168.137.x
   //    - 일반 Wi-Fi: 192.168.0.x 또는 192.168.1.x
   static const String REAL_DEVICE_IP = "192.168.0.20"; // PC IP 주소 (ipconfig로 확인)
-  static const String WS_URL = "ws://$REAL_DEVICE_IP:8001/ws/chat"; // test.py는 포트 8001 사용
+  // audio=binary: 오디오를 base64 JSON 대신 바이너리 프레임으로 주고받음 (서버 vision/ws_frames.py)
+  static const String WS_URL = "ws://$REAL_DEVICE_IP:8001/ws/chat?audio=binary"; // test.py는 포트 8001 사용
+
+  // 바이너리 프레임: [type 1B][version 1B][seq 4B big-endian][payload]
+  // 제어 메시지(user_speech_end, turn_complete 등)는 계속 JSON 텍스트
+  static const int FRAME_HEADER_SIZE = 6;
+  static const int FRAME_VERSION = 1;
+  static const int FRAME_AUDIO_IN = 0x01; // 앱 → 서버, 16kHz PCM
+  static const int FRAME_AUDIO_OUT = 0x02; // 서버 → 앱, 24kHz PCM
+  static const int FRAME_IMAGE = 0x03; // 앱 → 서버, JPEG
+  int _uplinkSeq = 0;
+  int? _expectedDownlinkSeq;
 
   CameraController? _cameraController;
   WebSocketChannel? _channel;
@@ -404,6 +415,8 @@ class LiveCameraService {
       print("🌐 [LiveCamera] 4단계: WebSocket 연결");
       try {
         _channel = WebSocketChannel.connect(Uri.parse(WS_URL));
+        _uplinkSeq = 0;
+        _expectedDownlinkSeq = null;
         await Future.delayed(const Duration(milliseconds: 500));
 
         if (_channel != null) {
@@ -527,6 +540,14 @@ class LiveCameraService {
         _websocketSubscription = _channel!.stream.listen(
           (message) {
             try {
+              // 바이너리 프레임 (오디오): base64 디코딩 없이 헤더 뒤를 그대로 버퍼에 이어붙임
+              if (message is List<int>) {
+                _handleBinaryFrame(
+                  message is Uint8List ? message : Uint8List.fromList(message),
+                );
+                return;
+              }
+
               final data = jsonDecode(message);
 
               // 녹음 중지 신호 처리 (AI 응답 시작)
@@ -555,7 +576,7 @@ class LiveCameraService {
                 }
               }
 
-              // 오디오 메시지 처리 (공식 예제 패턴: response.data를 끝까지 이어붙임)
+              // 오디오 메시지 처리 (예전 서버: base64 JSON, 공식 예제 패턴: response.data를 끝까지 이어붙임)
               if (data['type'] == 'audio' && data['data'] != null) {
                 try {
                   final audioBase64 = data['data'] as String;
@@ -690,7 +711,7 @@ class LiveCameraService {
       final jpegBytes = await _encodeYuv420ToJpeg(image,
           targetWidth: FRAME_TARGET_WIDTH, quality: FRAME_JPEG_QUALITY);
       if (jpegBytes != null && _isStreaming && _channel != null) {
-        _channel!.sink.add(jpegBytes);
+        _channel!.sink.add(_packFrame(FRAME_IMAGE, jpegBytes));
       }
     } catch (e) {
       print("⚠️ [LiveCamera] 프레임 인코딩/전송 실패: $e");
@@ -762,6 +783,37 @@ class LiveCameraService {
     return val;
   }
   
+  // 바이너리 프레임 만들기: 헤더 6바이트 + payload
+  Uint8List _packFrame(int type, Uint8List payload) {
+    final frame = Uint8List(FRAME_HEADER_SIZE + payload.length);
+    ByteData.sublistView(frame, 0, FRAME_HEADER_SIZE)
+      ..setUint8(0, type)
+      ..setUint8(1, FRAME_VERSION)
+      ..setUint32(2, _uplinkSeq, Endian.big);
+    _uplinkSeq = (_uplinkSeq + 1) & 0xFFFFFFFF;
+    frame.setRange(FRAME_HEADER_SIZE, frame.length, payload);
+    return frame;
+  }
+
+  // 서버 → 앱 바이너리 프레임 처리 (현재는 24kHz 오디오만)
+  void _handleBinaryFrame(Uint8List bytes) {
+    if (bytes.length < FRAME_HEADER_SIZE || bytes[1] != FRAME_VERSION) {
+      print("⚠️ [LiveCamera] 알 수 없는 바이너리 메시지: ${bytes.length} bytes");
+      return;
+    }
+    final seq = ByteData.sublistView(bytes, 0, FRAME_HEADER_SIZE)
+        .getUint32(2, Endian.big);
+    if (_expectedDownlinkSeq != null && seq != _expectedDownlinkSeq) {
+      print("⚠️ [LiveCamera] 오디오 프레임 순서 불일치: 기대 $_expectedDownlinkSeq, 수신 $seq");
+    }
+    _expectedDownlinkSeq = (seq + 1) & 0xFFFFFFFF;
+
+    if (bytes[0] == FRAME_AUDIO_OUT) {
+      // 복사 없이 헤더 뒤만 가리키는 view (_appendAudioChunk에서 턴 버퍼로 복사됨)
+      _appendAudioChunk(Uint8List.sublistView(bytes, FRAME_HEADER_SIZE));
+    }
+  }
+
   // 공식 예제 패턴: 오디오 청크를 현재 턴 버퍼에 계속 이어붙임
   // Python 예제의 wf.writeframes(response.data)와 동일한 패턴
   void _appendAudioChunk(Uint8List audioBytes) {
@@ -1222,10 +1274,7 @@ class LiveCameraService {
                 return;
               }
 
-              final base64Audio = base64Encode(data);
-              _channel!.sink.add(
-                jsonEncode({'type': 'audio', 'data': base64Audio}),
-              );
+              _channel!.sink.add(_packFrame(FRAME_AUDIO_IN, data));
 
               // 사용자 말하기 감지: 마지막 오디오 전송 시간 업데이트
               _lastAudioSentTime = DateTime.now();